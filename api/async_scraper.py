@@ -0,0 +1,346 @@
+"""
+===============================================================================
+⚡ ASYNC SCRAPER v1.0 — asyncio + aiohttp zamiast 6 wątków per request
+===============================================================================
+Wcześniej fetch_serp_sources otwierał własny ThreadPoolExecutor(6) na KAŻDY
+request S1 — przy kilku równoległych analizach wątki stały na 8-sekundowych
+timeoutach, a limity połączeń nie były wspólne.
+
+Teraz jedna pętla asyncio na proces (wątek w tle) i jedna aiohttp.ClientSession:
+  - globalny budżet połączeń SCRAPE_CONCURRENCY — wspólny dla wszystkich
+    równoległych requestów S1 w workerze,
+  - limit per domena SCRAPE_PER_DOMAIN (politeness — max N połączeń naraz
+    do jednego hosta),
+  - body czytane strumieniowo i ucinane po SCRAPE_MAX_BYTES,
+  - deadline na CAŁY scraping requestu (SCRAPE_DEADLINE): po nim niedokończone
+    pobrania są anulowane, zwracamy to, co już jest,
+  - ekstrakcja treści (trafilatura — CPU) w osobnej puli wątków, żeby nie
+    blokować pętli.
+
+v1.2: Walidatory HTTP (ETag / Last-Modified) w FetchedPage, a `headers`
+może być funkcją item → nagłówki (conditional GET z page_cache.py).
+
+v1.1: Pobieranie strumieniowe (także ścieżka sync — fetch_page_sync):
+  - typ treści sprawdzany z NAGŁÓWKÓW przed odczytem body — nie-HTML
+    (PDF, obrazy, binaria) odrzucany bez pobierania,
+  - body czytane do budżetu SCRAPE_MAX_BYTES, potem połączenie zamykane,
+  - H2 wyciągane przyrostowo z kolejnych chunków (H2Collector) w trakcie
+    pobierania, zamiast regexem po całym zdekodowanym HTML.
+
+scrape_pages_async() jest wywoływane synchronicznie z handlera Flask
+i zwraca wyniki w kolejności ukończenia (jak as_completed);
+iter_scrape_pages_async() oddaje je pojedynczo, gdy tylko są gotowe.
+Callback `process(item, FetchedPage)` to ta sama ekstrakcja co w ścieżce
+sync (_extract_scraped_page w index.py).
+
+Konfiguracja (env):
+  ASYNC_SCRAPER_ENABLED    — "true"/"false" (domyślnie true, jeśli jest aiohttp)
+  SCRAPE_CONCURRENCY       — globalny limit połączeń na proces (domyślnie 16)
+  SCRAPE_PER_DOMAIN        — limit połączeń per host (domyślnie 2)
+  SCRAPE_MAX_BYTES         — budżet bajtów body per strona (domyślnie 2 MB)
+  SCRAPE_DEADLINE          — deadline scrapingu per request w s (domyślnie 20)
+  SCRAPE_EXTRACT_WORKERS   — wątki ekstrakcji treści (domyślnie 4)
+===============================================================================
+"""
+
+import os
+import re
+import time
+import queue
+import asyncio
+import threading
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Iterator, List, Optional
+
+try:
+    import aiohttp
+    AIOHTTP_AVAILABLE = True
+except ImportError:
+    aiohttp = None
+    AIOHTTP_AVAILABLE = False
+
+ASYNC_SCRAPER_ENABLED = (
+    AIOHTTP_AVAILABLE and os.getenv("ASYNC_SCRAPER_ENABLED", "true").lower() == "true"
+)
+SCRAPE_CONCURRENCY = int(os.getenv("SCRAPE_CONCURRENCY", "16"))
+SCRAPE_PER_DOMAIN = int(os.getenv("SCRAPE_PER_DOMAIN", "2"))
+SCRAPE_MAX_BYTES = int(os.getenv("SCRAPE_MAX_BYTES", str(2 * 1024 * 1024)))
+SCRAPE_DEADLINE = float(os.getenv("SCRAPE_DEADLINE", "20"))
+SCRAPE_EXTRACT_WORKERS = int(os.getenv("SCRAPE_EXTRACT_WORKERS", "4"))
+
+_CHUNK_SIZE = 64 * 1024
+
+# Wynik pobrania — wspólny format dla ścieżki sync i async
+# h2_raw: surowe (bajtowe) wnętrza <h2> zebrane w trakcie pobierania
+# etag / last_modified: walidatory do rewalidacji wpisu w page_cache
+FetchedPage = namedtuple(
+    "FetchedPage",
+    ["url", "status", "content_type", "body", "truncated", "started_at", "h2_raw",
+     "etag", "last_modified"],
+    defaults=(None, None),
+)
+
+# Ten sam wzorzec co wcześniej na str — na bajtach daje identyczne dopasowania
+# (znaczniki są ASCII, a bajt '>' nie występuje wewnątrz znaków UTF-8/cp1250)
+_H2_BYTES_RE = re.compile(rb'<h2[^>]*>(.*?)</h2>', re.IGNORECASE | re.DOTALL)
+_H2_OPEN_RE = re.compile(rb'<h2', re.IGNORECASE)
+
+
+class H2Collector:
+    """Przyrostowe wyciąganie <h2>…</h2> z kolejnych chunków body."""
+
+    def __init__(self):
+        self.headings: List[bytes] = []
+        self._buf = b""
+
+    def feed(self, chunk: bytes) -> None:
+        buf = self._buf + chunk
+        pos = 0
+        for match in _H2_BYTES_RE.finditer(buf):
+            self.headings.append(match.group(1))
+            pos = match.end()
+        # Niedomknięty <h2 po ostatnim dopasowaniu czeka na kolejne chunki;
+        # bez niego zostawiamy tylko ogon, w którym może zaczynać się "<h2"
+        pending = _H2_OPEN_RE.search(buf, pos)
+        self._buf = buf[pending.start():] if pending else buf[max(pos, len(buf) - 2):]
+
+
+def is_text_content_type(content_type: str) -> bool:
+    """HTML/XHTML/tekst (albo brak nagłówka) — wszystko inne odrzucamy przed body."""
+    ct = (content_type or "").split(";")[0].strip().lower()
+    return not ct or ct.startswith("text/") or "html" in ct or "xml" in ct
+
+
+class RejectedContent(Exception):
+    """Odpowiedź odrzucona na podstawie nagłówków (przed odczytem body)."""
+
+_STATS_LOCK = threading.Lock()
+_STATS = {
+    "pages": 0, "errors": 0, "timeouts": 0, "truncated": 0, "rejected": 0, "deadline_hits": 0,
+    "cancelled": 0, "requests": 0, "new_connections": 0, "reused_connections": 0,
+}
+
+
+def _count(field: str, value: int = 1) -> None:
+    with _STATS_LOCK:
+        _STATS[field] += value
+
+
+# ── Pętla w tle (jedna na proces, nowa po forku) ────────────────────────────
+class _Runtime:
+    def __init__(self):
+        self.pid = os.getpid()
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self._run, name="async-scraper", daemon=True)
+        self.thread.start()
+        self.extract_pool = ThreadPoolExecutor(
+            max_workers=SCRAPE_EXTRACT_WORKERS, thread_name_prefix="scrape-extract"
+        )
+        self.session = asyncio.run_coroutine_threadsafe(self._make_session(), self.loop).result()
+
+    def _run(self):
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_forever()
+
+    async def _make_session(self):
+        trace = aiohttp.TraceConfig()
+        trace.on_request_start.append(_on_request_start)
+        trace.on_connection_create_end.append(_on_connection_create)
+        trace.on_connection_reuseconn.append(_on_connection_reuse)
+        connector = aiohttp.TCPConnector(
+            limit=SCRAPE_CONCURRENCY,
+            limit_per_host=SCRAPE_PER_DOMAIN,
+            ttl_dns_cache=300,
+        )
+        return aiohttp.ClientSession(connector=connector, trace_configs=[trace])
+
+
+async def _on_request_start(session, ctx, params):
+    _count("requests")
+
+
+async def _on_connection_create(session, ctx, params):
+    _count("new_connections")
+
+
+async def _on_connection_reuse(session, ctx, params):
+    _count("reused_connections")
+
+
+_RUNTIME: Optional[_Runtime] = None
+_RUNTIME_LOCK = threading.Lock()
+
+
+def _get_runtime() -> _Runtime:
+    global _RUNTIME
+    if _RUNTIME is not None and _RUNTIME.pid == os.getpid():
+        return _RUNTIME
+    with _RUNTIME_LOCK:
+        if _RUNTIME is None or _RUNTIME.pid != os.getpid():
+            _RUNTIME = _Runtime()
+            print(f"[ASYNC_SCRAPER] ✅ Event loop started (pid {_RUNTIME.pid}, "
+                  f"{SCRAPE_CONCURRENCY} conns, {SCRAPE_PER_DOMAIN}/host)")
+    return _RUNTIME
+
+
+# ── Pobranie jednej strony ──────────────────────────────────────────────────
+def _check_headers(url: str, status: int, content_type: str) -> None:
+    if status == 200 and not is_text_content_type(content_type):
+        _count("rejected")
+        raise RejectedContent(f"non-HTML content-type '{content_type}'")
+
+
+def _finish(url, status, resp_headers, chunks, collector, truncated, t0) -> FetchedPage:
+    if truncated:
+        _count("truncated")
+        print(f"[S1] ✂️ Body capped at {SCRAPE_MAX_BYTES // 1024} KB: {url[:40]}")
+    return FetchedPage(
+        url, status, resp_headers.get("Content-Type", ""), b"".join(chunks), truncated, t0,
+        collector.headings, resp_headers.get("ETag"), resp_headers.get("Last-Modified"),
+    )
+
+
+async def fetch_page(session, url: str, headers: Dict, timeout: float,
+                     max_bytes: int = SCRAPE_MAX_BYTES) -> FetchedPage:
+    """GET ze strumieniowym odczytem body (do max_bytes) i przyrostowym H2."""
+    t0 = time.time()
+    client_timeout = aiohttp.ClientTimeout(sock_connect=timeout, sock_read=timeout)
+    async with session.get(url, headers=headers, timeout=client_timeout) as resp:
+        content_type = resp.headers.get("Content-Type", "")
+        _check_headers(url, resp.status, content_type)
+        chunks, size, truncated = [], 0, False
+        collector = H2Collector()
+        if resp.status == 200:
+            async for chunk in resp.content.iter_chunked(_CHUNK_SIZE):
+                chunk = chunk[:max_bytes - size]
+                chunks.append(chunk)
+                collector.feed(chunk)
+                size += len(chunk)
+                if size >= max_bytes:
+                    truncated = True
+                    break
+        return _finish(url, resp.status, resp.headers, chunks, collector, truncated, t0)
+
+
+def fetch_page_sync(http_get: Callable, url: str, headers: Dict, timeout: float,
+                    max_bytes: int = SCRAPE_MAX_BYTES) -> FetchedPage:
+    """Blokujący odpowiednik fetch_page (requests, stream=True)."""
+    t0 = time.time()
+    with http_get(url, timeout=timeout, headers=headers, stream=True) as resp:
+        content_type = resp.headers.get("Content-Type", "")
+        _check_headers(url, resp.status_code, content_type)
+        chunks, size, truncated = [], 0, False
+        collector = H2Collector()
+        if resp.status_code == 200:
+            for chunk in resp.iter_content(_CHUNK_SIZE):
+                chunk = chunk[:max_bytes - size]
+                chunks.append(chunk)
+                collector.feed(chunk)
+                size += len(chunk)
+                if size >= max_bytes:
+                    truncated = True
+                    break
+        return _finish(url, resp.status_code, resp.headers, chunks, collector, truncated, t0)
+
+
+async def scrape_one_async(item: Dict, process: Callable, headers, timeout: float):
+    """
+    Async odpowiednik _scrape_one: pobranie + ekstrakcja w puli wątków.
+    headers: dict albo funkcja item → dict (np. nagłówki conditional GET).
+    """
+    runtime = _get_runtime()
+    url = item.get("link", "")
+    request_headers = headers(item) if callable(headers) else headers
+    try:
+        page = await fetch_page(runtime.session, url, request_headers, timeout)
+        page = page._replace(url=url)  # źródło raportujemy pod URL-em z SERP
+        _count("pages")
+        return await runtime.loop.run_in_executor(runtime.extract_pool, process, item, page)
+    except RejectedContent as e:
+        print(f"[S1] ⏭️ Skipping {url[:40]}: {e}")
+        return None
+    except asyncio.TimeoutError:
+        _count("timeouts")
+        print(f"[S1] ⏱️ Timeout for {url[:40]} (>{timeout}s)")
+        return None
+    except asyncio.CancelledError:
+        _count("cancelled")
+        raise
+    except Exception as e:
+        _count("errors")
+        print(f"[S1] ⚠️ Scrape error for {url[:40]}: {e}")
+        return None
+
+
+async def _scrape_all(items, process, headers, timeout, deadline, on_result: Callable) -> None:
+    tasks = [asyncio.ensure_future(scrape_one_async(item, process, headers, timeout)) for item in items]
+    try:
+        for next_done in asyncio.as_completed(tasks, timeout=deadline):
+            on_result(await next_done)
+    except asyncio.TimeoutError:
+        pending = sum(1 for t in tasks if not t.done())
+        _count("deadline_hits")
+        print(f"[S1] ⏱️ Scrape deadline {deadline:g}s reached — {pending} pages cancelled")
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
+_DONE = object()
+
+
+def iter_scrape_pages_async(items: List[Dict], process: Callable, headers, timeout: float,
+                            deadline: float = SCRAPE_DEADLINE) -> Iterator:
+    """
+    Generator dla wątku Flask: scrapuje `items` na wspólnej pętli i oddaje
+    wyniki process() W MOMENCIE ukończenia (bez anulowanych) — konsument
+    może przetwarzać pierwsze strony, gdy wolniejsze wciąż się pobierają.
+    """
+    if not items:
+        return
+    runtime = _get_runtime()
+    results = queue.Queue()
+    future = asyncio.run_coroutine_threadsafe(
+        _scrape_all(items, process, headers, timeout, deadline, results.put), runtime.loop
+    )
+    future.add_done_callback(lambda _f: results.put(_DONE))
+    # Zapas ponad deadline: ekstrakcja ostatnich stron kończy się już po nim
+    wait_until = time.time() + deadline + timeout + 5
+    try:
+        while True:
+            try:
+                result = results.get(timeout=max(0.0, wait_until - time.time()))
+            except queue.Empty:
+                raise TimeoutError(f"async scrape exceeded {deadline + timeout + 5:g}s")
+            if result is _DONE:
+                break
+            yield result
+    finally:
+        # Timeout, błąd konsumenta albo close() (GeneratorExit — klient się
+        # rozłączył): pobieranie reszty stron na pętli nie ma już odbiorcy
+        if not future.done():
+            future.cancel()
+    future.result()  # błędy samej korutyny (nie pojedynczych stron)
+
+
+def scrape_pages_async(items: List[Dict], process: Callable, headers, timeout: float,
+                       deadline: float = SCRAPE_DEADLINE) -> List:
+    """Blokujące wywołanie: wszystkie wyniki process() w kolejności ukończenia."""
+    return list(iter_scrape_pages_async(items, process, headers, timeout, deadline))
+
+
+def async_scraper_stats() -> Dict:
+    """Statystyki dla /health."""
+    with _STATS_LOCK:
+        stats = dict(_STATS)
+    stats.update({
+        "enabled": ASYNC_SCRAPER_ENABLED,
+        "aiohttp_available": AIOHTTP_AVAILABLE,
+        "concurrency": SCRAPE_CONCURRENCY,
+        "per_domain": SCRAPE_PER_DOMAIN,
+        "max_bytes": SCRAPE_MAX_BYTES,
+        "deadline_s": SCRAPE_DEADLINE,
+        "loop_running": _RUNTIME is not None and _RUNTIME.pid == os.getpid(),
+    })
+    return stats
@@ -25,6 +25,11 @@ logger = logging.getLogger(__name__)
 
 try:
     import requests as _requests
+    # v56.4: współdzielona pula połączeń (keep-alive do API LLM)
+    try:
+        from .http_client import http_post as _http_post
+    except ImportError:
+        from http_client import http_post as _http_post
 except ImportError:
     _requests = None
 
@@ -135,7 +140,7 @@ def _call_anthropic(prompt: str) -> str:
         return ""
 
     try:
-        resp = _requests.post(
+        resp = _http_post(
             "https://api.anthropic.com/v1/messages",
             headers={
                 "x-api-key": api_key,
@@ -173,7 +178,7 @@ def _call_openai(prompt: str) -> str:
         return ""
 
     try:
-        resp = _requests.post(
+        resp = _http_post(
             "https://api.openai.com/v1/chat/completions",
             headers={
                 "Authorization": f"Bearer {oai_key}",
@@ -0,0 +1,285 @@
+"""
+===============================================================================
+🗂️ COMPLIANCE SESSION v1.0 — stanowe sesje compliance po article_id
+===============================================================================
+Wcześniej każdy batch artykułu (20+ wywołań) przesyłał pełny keyword_state,
+serwer parsował go od nowa, lematyzował WSZYSTKIE frazy i odsyłał pełny nowy
+stan, który klient musiał odesłać przy kolejnym batchu.
+
+Teraz stan żyje po stronie serwera, kluczowany article_id:
+  - pierwsze wywołanie (z keyword_state) zakłada sesję: parsuje stan RAZ,
+    lematyzuje frazy RAZ i zapisuje lematy razem ze stanem,
+  - kolejne wywołania wysyłają tylko article_id + text — lematyzowany jest
+    wyłącznie nowy batch, a odpowiedź zawiera tylko delty (frazy trafione
+    w batchu) + skrót sesji.
+
+Sesja jest plikiem JSON na dysku (atomowy zapis, flock na read-modify-write),
+bo workery gunicorna nie dzielą pamięci — kolejny batch może trafić do
+innego workera. Automat KeywordMatcher trzymany jest w procesowym LRU.
+
+v1.1: Sprzątanie usuwa tylko wygasłe <klucz>.json — plik .lock sesji znika
+razem z nią, pod jej blokadą (_locked sprawdza po flock, czy plik blokady
+wciąż jest tym samym i-węzłem). Sprzątanie także przy kontynuacji sesji.
+delete_session usuwa też .lock (disk_store.remove_lock_if_idle — tylko gdy
+wolny i nikt w międzyczasie nie założył sesji od nowa).
+
+Konfiguracja (env):
+  COMPLIANCE_SESSION_DIR  — katalog sesji (domyślnie <tmp>/ngram_compliance_sessions)
+  COMPLIANCE_SESSION_TTL  — czas życia sesji bez aktywności w s (domyślnie 86400)
+
+Integracja: index.py → /api/generate_compliance_report (article_id),
+            /api/compliance_session/<article_id>
+===============================================================================
+"""
+
+import os
+import time
+import hashlib
+import tempfile
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional
+
+try:
+    from .generate_compliance_report import (
+        _parse_keyword_state, _lemmatize_keywords, _lemmatize_text_to_list,
+        _score_batch_lemmas,
+    )
+    from .keyword_matcher import KeywordMatcher
+    from .disk_store import file_lock, read_json, remove_lock_if_idle, remove_quietly, write_json
+except ImportError:
+    from generate_compliance_report import (
+        _parse_keyword_state, _lemmatize_keywords, _lemmatize_text_to_list,
+        _score_batch_lemmas,
+    )
+    from keyword_matcher import KeywordMatcher
+    from disk_store import file_lock, read_json, remove_lock_if_idle, remove_quietly, write_json
+
+COMPLIANCE_SESSION_DIR = os.getenv(
+    "COMPLIANCE_SESSION_DIR", os.path.join(tempfile.gettempdir(), "ngram_compliance_sessions")
+)
+COMPLIANCE_SESSION_TTL = int(os.getenv("COMPLIANCE_SESSION_TTL", "86400"))
+
+# Ile automatów trzymać w pamięci procesu (jeden na aktywny artykuł)
+_MATCHER_CACHE_MAX = 256
+_MATCHER_CACHE: "OrderedDict[str, KeywordMatcher]" = OrderedDict()
+_MATCHER_LOCK = threading.Lock()
+
+# Sprzątanie wygasłych sesji — nie częściej niż raz na godzinę per proces
+_PURGE_INTERVAL = 3600
+_last_purge = 0.0
+_PURGE_LOCK = threading.Lock()
+
+
+# ── Pliki sesji ─────────────────────────────────────────────────────────────
+def _session_key(article_id: str) -> str:
+    return hashlib.sha1(str(article_id).encode("utf-8")).hexdigest()
+
+
+def _session_path(article_id: str) -> str:
+    return os.path.join(COMPLIANCE_SESSION_DIR, f"{_session_key(article_id)}.json")
+
+
+def _lock_path(key: str) -> str:
+    return os.path.join(COMPLIANCE_SESSION_DIR, f"{key}.lock")
+
+
+def _locked_key(key: str):
+    """
+    flock na <klucz>.lock (disk_store.file_lock — po uzyskaniu blokady
+    sprawdza i-węzeł, bo sprzątanie mogło usunąć plik, gdy czekaliśmy).
+    """
+    return file_lock(_lock_path(key))
+
+
+def _locked(article_id: str):
+    """Blokada read-modify-write sesji (flock na pliku .lock)."""
+    return _locked_key(_session_key(article_id))
+
+
+def _read(article_id: str) -> Optional[Dict]:
+    session = read_json(_session_path(article_id), label="COMPLIANCE_SESSION")
+    if session is None:
+        return None
+    if time.time() - session.get("updated_at", 0) > COMPLIANCE_SESSION_TTL:
+        return None  # wygasła — traktujemy jak brak sesji
+    return session
+
+
+def _write(session: Dict) -> None:
+    """Zapis atomowy: tmp + os.replace."""
+    write_json(_session_path(session["article_id"]), session)
+
+
+def _purge_expired() -> None:
+    """
+    Usuwa wygasłe sesje (<klucz>.json) razem z ich .lock — pod blokadą sesji,
+    z ponownym sprawdzeniem mtime (batch mógł ją właśnie odświeżyć).
+    Pliki .lock / .tmp same w sobie nie wygasają: .lock nie dostaje nowego
+    mtime przy otwarciu, a .tmp istnieje tylko na czas zapisu (sieroty po
+    crashu usuwamy dopiero po TTL).
+    """
+    global _last_purge
+    now = time.time()
+    with _PURGE_LOCK:
+        if now - _last_purge < _PURGE_INTERVAL:
+            return
+        _last_purge = now
+    try:
+        names = os.listdir(COMPLIANCE_SESSION_DIR)
+    except OSError:
+        return
+    for name in names:
+        full = os.path.join(COMPLIANCE_SESSION_DIR, name)
+        try:
+            if name.endswith(".tmp"):
+                if now - os.path.getmtime(full) > COMPLIANCE_SESSION_TTL:
+                    os.remove(full)
+                continue
+            if not name.endswith(".json") or now - os.path.getmtime(full) <= COMPLIANCE_SESSION_TTL:
+                continue
+            key = name[:-len(".json")]
+            with _locked_key(key):
+                if time.time() - os.path.getmtime(full) <= COMPLIANCE_SESSION_TTL:
+                    continue  # odświeżona, gdy czekaliśmy na blokadę
+                os.remove(full)
+                remove_quietly(_lock_path(key))  # wciąż trzymamy flock — nowi czekający sprawdzą i-węzeł
+        except OSError:
+            pass
+
+
+# ── Automat fraz (procesowe LRU) ────────────────────────────────────────────
+def _get_matcher(session: Dict) -> KeywordMatcher:
+    """Automat dla lematów fraz sesji; klucz = article_id + created_at."""
+    cache_key = f"{session['article_id']}\0{session['created_at']}"
+    with _MATCHER_LOCK:
+        matcher = _MATCHER_CACHE.get(cache_key)
+        if matcher is not None:
+            _MATCHER_CACHE.move_to_end(cache_key)
+            return matcher
+    matcher = KeywordMatcher(session["keyword_lemmas"])
+    with _MATCHER_LOCK:
+        _MATCHER_CACHE[cache_key] = matcher
+        while len(_MATCHER_CACHE) > _MATCHER_CACHE_MAX:
+            _MATCHER_CACHE.popitem(last=False)
+    return matcher
+
+
+# ── API ─────────────────────────────────────────────────────────────────────
+def start_session(article_id: str, keyword_state_input) -> Dict:
+    """Zakłada (albo resetuje) sesję: parsuje stan i lematyzuje frazy RAZ."""
+    keyword_state = _parse_keyword_state(keyword_state_input)
+    keyword_lemmas = _lemmatize_keywords(list(keyword_state.keys()))
+    now = time.time()
+    session = {
+        "article_id": str(article_id),
+        "keyword_state": keyword_state,
+        "keyword_lemmas": keyword_lemmas,
+        "counts": {kw: 0 for kw in keyword_state},
+        "batches": 0,
+        "created_at": now,
+        "updated_at": now,
+    }
+    with _locked(article_id):
+        _write(session)
+    _purge_expired()
+    return session
+
+
+def get_session(article_id: str) -> Optional[Dict]:
+    return _read(article_id)
+
+
+def delete_session(article_id: str) -> bool:
+    path = _session_path(article_id)
+    with _locked(article_id):
+        deleted = remove_quietly(path)
+    # .lock usuwany dopiero po zwolnieniu flock — pominięty, jeśli ktoś go już
+    # trzyma albo zdążył założyć nową sesję
+    remove_lock_if_idle(_lock_path(_session_key(article_id)),
+                        still_needed=lambda: os.path.exists(path))
+    return deleted
+
+
+def session_summary(session: Dict) -> Dict:
+    """Skrót sesji do odpowiedzi (bez pełnego stanu)."""
+    state = session["keyword_state"]
+    return {
+        "article_id": session["article_id"],
+        "batches": session["batches"],
+        "keywords": len(state),
+        # Frazy, które wciąż potrzebują wystąpień (min > 0)
+        "pending_min": sum(1 for v in state.values() if v["min"] > 0),
+        "exhausted": sum(1 for v in state.values() if v["max"] == 0),
+    }
+
+
+def generate_compliance_report_session(article_id: str, text_to_process: str,
+                                       keyword_state_input=None) -> Dict:
+    """
+    Batch compliance w ramach sesji artykułu.
+    - keyword_state_input podany → nowa sesja (reset stanu),
+    - brak → kontynuacja zapisanej sesji.
+    Zwraca tylko delty: frazy trafione w tym batchu.
+    """
+    if keyword_state_input:
+        try:
+            session = start_session(article_id, keyword_state_input)
+        except Exception as e:
+            return {"error": str(e)}
+    else:
+        session = _read(article_id)
+        if session is None:
+            return {"error": f"No active compliance session for article_id '{article_id}' "
+                             "— send keyword_state to start one", "session_missing": True}
+
+    if not text_to_process:
+        return {
+            "compliance_report": [],
+            "keyword_deltas": {},
+            "session": session_summary(session),
+        }
+
+    # Lematyzacja TYLKO nowego batcha (poza blokadą — najdroższa część)
+    text_lemmas = _lemmatize_text_to_list(text_to_process)
+    matcher = _get_matcher(session)
+
+    with _locked(article_id):
+        # Świeży odczyt pod blokadą — równoległe batche tego samego artykułu
+        current = _read(article_id)
+        if current is None or current["created_at"] != session["created_at"]:
+            return {"error": f"Compliance session for article_id '{article_id}' was reset or expired",
+                    "session_missing": True}
+        session = current
+
+        report, new_state = _score_batch_lemmas(
+            text_lemmas, session["keyword_state"], session["keyword_lemmas"], matcher=matcher
+        )
+
+        deltas = {}
+        changed_report = []
+        for entry in report:
+            used = entry["actual_in_batch"]
+            if not used:
+                continue
+            kw = entry["keyword"]
+            session["counts"][kw] = session["counts"].get(kw, 0) + used
+            deltas[kw] = {
+                "used": used,
+                "total": session["counts"][kw],
+                "min": new_state[kw]["min"],
+                "max": new_state[kw]["max"],
+            }
+            changed_report.append(entry)
+
+        session["keyword_state"] = new_state
+        session["batches"] += 1
+        session["updated_at"] = time.time()
+        _write(session)
+
+    _purge_expired()
+    return {
+        "compliance_report": changed_report,
+        "keyword_deltas": deltas,
+        "session": session_summary(session),
+    }
@@ -8,6 +8,12 @@ import json
 import base64
 import requests
 
+# v56.4: współdzielona pula połączeń (keep-alive do api.dataforseo.com)
+try:
+    from .http_client import http_post
+except ImportError:
+    from http_client import http_post
+
 DATAFORSEO_LOGIN = os.getenv("DATAFORSEO_LOGIN")
 DATAFORSEO_PASSWORD = os.getenv("DATAFORSEO_PASSWORD")
 
@@ -82,7 +88,7 @@ def fetch_serp_data(keyword, num_results=10, location_code=2616, language_code="
             }
         ]
 
-        resp = requests.post(
+        resp = http_post(
             "https://api.dataforseo.com/v3/serp/google/organic/live/advanced",
             headers={
                 "Authorization": _DATAFORSEO_AUTH,
@@ -380,7 +386,7 @@ def fetch_raw_debug(keyword, location_code=2616, language_code="pl"):
     ]
 
     try:
-        resp = requests.post(
+        resp = http_post(
             "https://api.dataforseo.com/v3/serp/google/organic/live/advanced",
             headers={
                 "Authorization": _DATAFORSEO_AUTH,
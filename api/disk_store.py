@@ -0,0 +1,234 @@
+"""
+===============================================================================
+💽 DISK STORE v1.0 — wspólne prymitywy plikowych store'ów
+===============================================================================
+Workery gunicorna nie dzielą pamięci, więc cache i stany współdzielone
+trzymamy na dysku. parse_cache, page_cache, serp_cache, s1_jobs,
+compliance_session i metrics powielały te same kawałki: atomowy zapis,
+flock na pliku .lock, eviction LRU po mtime, liczniki statystyk. Tutaj
+jedna implementacja każdego z nich:
+
+  - atomic_write / write_json — tmp (pid + wątek w nazwie) + os.replace,
+    opcjonalnie z mtime ustawionym przed podmianą (np. mtime = wygaśnięcie),
+  - read_json — None dla brakującego / uszkodzonego pliku,
+  - file_lock — flock na pliku .lock; po uzyskaniu blokady sprawdzane jest,
+    czy plik pod ścieżką to wciąż ten sam i-węzeł (sprzątanie mogło go
+    usunąć, gdy czekaliśmy — wtedy blokujemy nowy plik),
+  - remove_lock_if_idle — usuwa .lock tylko pod nieblokującą blokadą
+    (para do file_lock),
+  - LruDir — limit rozmiaru katalogu z eviction LRU po mtime (odczyt
+    odświeża mtime przez touch),
+  - Counters — thread-safe liczniki dla /health,
+  - pid_alive — czy proces-właściciel pliku jeszcze żyje.
+
+Integracja: parse_cache.py, page_cache.py, serp_cache.py, s1_jobs.py,
+compliance_session.py, metrics.py
+===============================================================================
+"""
+
+import os
+import json
+import threading
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, Optional
+
+try:
+    import fcntl
+except ImportError:  # Windows — bez blokady międzyprocesowej
+    fcntl = None
+
+
+# ── Zapis / odczyt ──────────────────────────────────────────────────────────
+def atomic_write(path: str, data, mtime: Optional[float] = None) -> int:
+    """Zapis atomowy (tmp + os.replace), katalog tworzony w razie potrzeby. Zwraca liczbę bajtów."""
+    if isinstance(data, str):
+        data = data.encode("utf-8")
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        if mtime is not None:
+            os.utime(tmp_path, (mtime, mtime))
+        os.replace(tmp_path, path)
+    except BaseException:
+        remove_quietly(tmp_path)
+        raise
+    return len(data)
+
+
+def write_json(path: str, obj, mtime: Optional[float] = None, **dump_kwargs) -> int:
+    """atomic_write dla JSON (ensure_ascii=False, jak w całym repo)."""
+    dump_kwargs.setdefault("ensure_ascii", False)
+    return atomic_write(path, json.dumps(obj, **dump_kwargs), mtime=mtime)
+
+
+def read_json(path: str, label: str = "DISK_STORE"):
+    """Zawartość pliku JSON albo None (brak pliku / uszkodzony — z ostrzeżeniem)."""
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        print(f"[{label}] ⚠️ Corrupt file {os.path.basename(path)}: {e}")
+        return None
+
+
+def remove_quietly(path: str) -> bool:
+    try:
+        os.remove(path)
+        return True
+    except OSError:
+        return False
+
+
+def touch(path: str) -> None:
+    try:
+        os.utime(path)
+    except OSError:
+        pass
+
+
+# ── Blokady między workerami ────────────────────────────────────────────────
+@contextmanager
+def file_lock(lock_path: str, touch_on_acquire: bool = False):
+    """
+    Wyłączny flock na `lock_path` (tworzony w razie potrzeby). Po uzyskaniu
+    blokady sprawdzamy i-węzeł — jeśli plik usunięto, gdy czekaliśmy,
+    blokujemy nowy. touch_on_acquire: mtime .lock = ostatnie użycie.
+    """
+    os.makedirs(os.path.dirname(lock_path), exist_ok=True)
+    while True:
+        lock_file = open(lock_path, "a")
+        if fcntl is None:
+            break
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            if os.stat(lock_path).st_ino == os.fstat(lock_file.fileno()).st_ino:
+                break
+        except FileNotFoundError:
+            pass
+        lock_file.close()  # zamknięcie zwalnia flock
+    try:
+        if touch_on_acquire:
+            touch(lock_path)
+        yield lock_file
+    finally:
+        if fcntl is not None:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+        lock_file.close()
+
+
+def remove_lock_if_idle(lock_path: str, still_needed: Callable[[], bool] = lambda: False) -> bool:
+    """
+    Usuwa .lock, jeśli nikt go nie trzyma (LOCK_NB) i still_needed() jest
+    fałszywe — sprawdzane już pod blokadą. Czekający w file_lock przejdą
+    na nowy plik (kontrola i-węzła).
+    """
+    if fcntl is None:
+        return False
+    try:
+        lock_file = open(lock_path, "a")
+    except OSError:
+        return False
+    with lock_file:
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            return False  # blokada w użyciu
+        try:
+            if still_needed():
+                return False
+            return remove_quietly(lock_path)
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+# ── Limit rozmiaru (LRU po mtime) ───────────────────────────────────────────
+# Po eviction zostawiamy zapas, żeby nie skanować katalogu przy każdym zapisie
+EVICT_TARGET_RATIO = 0.9
+
+
+class LruDir:
+    """Rozmiar plików `suffix` w katalogu; po przekroczeniu max_bytes usuwa najstarsze (mtime)."""
+
+    def __init__(self, directory: str, max_bytes: int, suffix: str):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.suffix = suffix
+        self.evictions = 0
+        self._approx_bytes = None  # liczone leniwie przy pierwszym zapisie
+        self._lock = threading.Lock()
+
+    @property
+    def size_bytes(self) -> int:
+        return self._approx_bytes or 0
+
+    def _scan(self):
+        entries = []
+        for root, _dirs, files in os.walk(self.directory):
+            for name in files:
+                if not name.endswith(self.suffix):
+                    continue
+                full = os.path.join(root, name)
+                try:
+                    st = os.stat(full)
+                except OSError:
+                    continue
+                entries.append((st.st_mtime, st.st_size, full))
+        return entries
+
+    def account(self, added: int) -> int:
+        """Dolicza zapisane bajty; po przekroczeniu limitu evict do EVICT_TARGET_RATIO. Zwraca liczbę usuniętych."""
+        with self._lock:
+            if self._approx_bytes is None:
+                self._approx_bytes = sum(size for _, size, _ in self._scan())
+            else:
+                self._approx_bytes += added
+            if self._approx_bytes <= self.max_bytes:
+                return 0
+            entries = sorted(self._scan())
+            total = sum(size for _, size, _ in entries)
+            target = int(self.max_bytes * EVICT_TARGET_RATIO)
+            evicted = 0
+            for _mtime, size, full in entries:
+                if total <= target:
+                    break
+                if remove_quietly(full):
+                    total -= size
+                    evicted += 1
+            self._approx_bytes = total
+            self.evictions += evicted
+            return evicted
+
+
+# ── Statystyki ──────────────────────────────────────────────────────────────
+class Counters:
+    """Thread-safe liczniki (hits, misses, writes…) dla /health."""
+
+    def __init__(self, fields: Iterable[str]):
+        self._values: Dict[str, int] = {field: 0 for field in fields}
+        self._lock = threading.Lock()
+
+    def count(self, field: str, value: int = 1) -> int:
+        with self._lock:
+            self._values[field] += value
+            return self._values[field]
+
+    def __getitem__(self, field: str) -> int:
+        return self._values[field]
+
+    def snapshot(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self._values)
+
+
+def pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
@@ -0,0 +1,139 @@
+"""
+===============================================================================
+📚 DOC STORE v1.0 — jeden parse spaCy per źródło per request
+===============================================================================
+Jeden request S1 przepuszczał ten sam tekst konkurencji przez nlp(...) do
+pięciu razy (n-gramy, NER, topical entities, salience, co-occurrence).
+DocStore parsuje każde źródło RAZ (wsadowo przez nlp.pipe) i udostępnia
+gotowe Doc-i wszystkim analizatorom.
+
+Tekst kanoniczny = _clean_text_for_nlp(text)[:limit] — ten sam, który
+wcześniej trafiał do NER/salience/co-occurrence.
+ZMIANA wejścia dla dwóch analizatorów (świadoma — inaczej dwa parse):
+  - n-gramy: tokeny z oczyszczonego Doc-a w oryginalnej wielkości liter,
+    lowercase per token (wcześniej osobny parse text.lower()),
+  - topical entities: oczyszczony tekst zamiast surowego text[:50000] —
+    bez śmieci nawigacji/stopki z _clean_text_for_nlp, a limit 50K liczony
+    po czyszczeniu (długie strony dają więcej treści niż wcześniej).
+
+v1.1: Przed nlp.pipe sprawdzany jest trwały ParseCache (parse_cache.py).
+v1.2: Brakujące teksty parsowane w puli procesów NLP (nlp_pool.py), jeśli
+      włączona — fallback do nlp.pipe w procesie.
+v1.3: release(texts) — zwalnia Doc-i, gdy store żyje dłużej niż jeden
+      keyword (bulk S1: wspólny korpus dla klastra keywordów).
+v1.4: Czasy przebiegów spaCy (pula / w procesie) i odczytów ParseCache
+      → metrics.py (spacy_parse, spacy_cache_load).
+
+Integracja: index.py → perform_ngram_analysis() → perform_entity_seo_analysis()
+===============================================================================
+"""
+
+import time
+from typing import Dict, List, Optional
+
+try:
+    try:
+        from .entity_extractor import _clean_text_for_nlp
+    except ImportError:
+        from entity_extractor import _clean_text_for_nlp
+except ImportError:
+    _clean_text_for_nlp = None  # Fallback: no cleaning
+
+try:
+    try:
+        from .parse_cache import get_parse_cache
+    except ImportError:
+        from parse_cache import get_parse_cache
+except ImportError:
+    get_parse_cache = None
+
+try:
+    try:
+        from .nlp_pool import parse_docs
+    except ImportError:
+        from nlp_pool import parse_docs
+except ImportError:
+    parse_docs = None
+
+try:
+    from .metrics import observe, timed
+except ImportError:
+    from metrics import observe, timed
+
+# Limit znaków per źródło (ten sam co wcześniej w każdym analizatorze)
+DOC_TEXT_LIMIT = 50000
+
+
+class DocStore:
+    """Per-request cache sparsowanych Doc-ów spaCy, kluczowany tekstem."""
+
+    def __init__(self, nlp, limit: int = DOC_TEXT_LIMIT, clean: bool = True, cache=None):
+        self.nlp = nlp
+        self.limit = limit
+        self.clean = clean
+        self.cache = cache if cache is not None else (get_parse_cache() if get_parse_cache else None)
+        self._docs: Dict[str, object] = {}
+        self._prepared: Dict[tuple, str] = {}
+        self.parsed_count = 0
+        self.cached_count = 0
+
+    def prepare(self, text: str, limit: Optional[int] = None, clean: Optional[bool] = None) -> str:
+        """Zwraca tekst kanoniczny (oczyszczony + przycięty), który trafia do nlp."""
+        limit = self.limit if limit is None else limit
+        clean = self.clean if clean is None else clean
+        key = (text, limit, clean)
+        prepared = self._prepared.get(key)
+        if prepared is None:
+            prepared = text or ""
+            if clean and _clean_text_for_nlp is not None:
+                prepared = _clean_text_for_nlp(prepared) or ""
+            prepared = prepared[:limit]
+            self._prepared[key] = prepared
+        return prepared
+
+    def parse(self, texts: List[str], limit: Optional[int] = None, clean: Optional[bool] = None) -> List:
+        """Zwraca Doc-i wyrównane z `texts`; brakujące parsuje jednym nlp.pipe."""
+        prepared = [self.prepare(t, limit=limit, clean=clean) for t in texts]
+        missing = [p for p in dict.fromkeys(prepared) if p not in self._docs]
+        if missing and self.cache is not None:
+            still_missing = []
+            with timed("spacy_cache_load", detail=f"{len(missing)} texts"):
+                for text in missing:
+                    doc = self.cache.get(self.nlp, text)
+                    if doc is None:
+                        still_missing.append(text)
+                    else:
+                        self._docs[text] = doc
+                        self.cached_count += 1
+            missing = still_missing
+        if missing:
+            t0 = time.perf_counter()
+            docs = None
+            if parse_docs is not None:
+                docs = parse_docs(self.nlp, missing, disable=getattr(self.nlp, "disable", ()))
+            mode = "inline" if docs is None else "pool"
+            if docs is None:
+                docs = self.nlp.pipe(missing)
+            for text, doc in zip(missing, docs):
+                self._docs[text] = doc
+                if self.cache is not None:
+                    self.cache.put(self.nlp, text, doc)
+            self.parsed_count += len(missing)
+            observe("spacy_parse", time.perf_counter() - t0,
+                    detail=f"{len(missing)} texts, {sum(len(t) for t in missing)} chars", mode=mode)
+        return [self._docs[p] for p in prepared]
+
+    def get(self, text: str, limit: Optional[int] = None, clean: Optional[bool] = None):
+        """Zwraca pojedynczy Doc dla tekstu (parsuje jeśli trzeba)."""
+        return self.parse([text], limit=limit, clean=clean)[0]
+
+    def release(self, texts: List[str], limit: Optional[int] = None, clean: Optional[bool] = None) -> int:
+        """Usuwa Doc-i tekstów z pamięci (ParseCache na dysku zostaje). Zwraca liczbę zwolnionych."""
+        released = 0
+        for text in texts:
+            prepared = self.prepare(text, limit=limit, clean=clean)
+            self._prepared.pop((text, self.limit if limit is None else limit,
+                                self.clean if clean is None else clean), None)
+            if self._docs.pop(prepared, None) is not None:
+                released += 1
+        return released
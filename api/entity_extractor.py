@@ -30,6 +30,12 @@ except ImportError:
     _is_entity_garbage_v2 = None
     print("[ENTITY] ⚠️ web_garbage_filter not found, using inline fallback")
 
+# ⏱️ v3.2: Czasy kroków Entity SEO (NER, salience, co-occurrence) → metrics.py
+try:
+    from .metrics import timed
+except ImportError:
+    from metrics import timed
+
 # Legacy fallback blacklist (used only if web_garbage_filter.py is missing)
 _CSS_ENTITY_BLACKLIST_LEGACY = {
     "where", "not", "root", "before", "after", "hover", "focus", "active",
@@ -281,10 +287,12 @@ def calculate_entity_importance(entity: ExtractedEntity, total_sources: int) ->
 def extract_entities(
     nlp,
     texts: List[str],
-    urls: List[str] = None
+    urls: List[str] = None,
+    docs: List = None,
 ) -> List[ExtractedEntity]:
     """
     Wyciąga encje z listy tekstów konkurencji.
+    v3.1: `docs` — gotowe Doc-i z DocStore (wyrównane z texts), bez ponownego nlp().
     """
     if not texts:
         return []
@@ -303,12 +311,15 @@ def extract_entities(
         if not text or len(text) < 100:
             continue
         
-        # v2.2: Clean CSS/JS artifacts BEFORE spaCy NER
-        text_clean = _clean_text_for_nlp(text) if text else text
-        text_sample = text_clean[:50000]
-
         try:
-            doc = nlp(text_sample)
+            if docs is not None:
+                doc = docs[idx]
+                text_sample = doc.text
+            else:
+                # v2.2: Clean CSS/JS artifacts BEFORE spaCy NER
+                text_clean = _clean_text_for_nlp(text) if text else text
+                text_sample = text_clean[:50000]
+                doc = nlp(text_sample)
             
             for ent in doc.ents:
                 ent_text = ent.text.strip()
@@ -535,9 +546,14 @@ def perform_entity_seo_analysis(
     nlp,
     sources: List[Dict],
     main_keyword: str,
-    h2_patterns: List[str] = None
+    h2_patterns: List[str] = None,
+    doc_store=None,
 ) -> Dict[str, Any]:
-    """Wykonuje analizę Entity SEO."""
+    """
+    Wykonuje analizę Entity SEO.
+    v3.1: `doc_store` — współdzielony DocStore z perform_ngram_analysis;
+    każde źródło jest parsowane raz i trafia do wszystkich analizatorów.
+    """
     
     # 🆕 v2.0: Import topical entities
     try:
@@ -567,8 +583,18 @@ def perform_entity_seo_analysis(
     
     print(f"[ENTITY] 🔍 Analyzing {len(texts)} sources for: {main_keyword}")
     
+    # v3.1: Jeden parse spaCy per źródło (nlp.pipe) — współdzielony przez wszystkie kroki
+    if doc_store is None:
+        try:
+            from .doc_store import DocStore
+        except ImportError:
+            from doc_store import DocStore
+        doc_store = DocStore(nlp)
+    docs = doc_store.parse(texts)
+    
     # 1️⃣ Ekstrakcja encji (NER)
-    entities = extract_entities(nlp, texts, urls)
+    with timed("entity_ner"):
+        entities = extract_entities(nlp, texts, urls, docs=docs)
     print(f"[ENTITY] ✅ Extracted {len(entities)} entities")
     
     # 2️⃣ 🆕 Topical/Concept Entities (before relationships, so we can feed them)
@@ -584,6 +610,7 @@ def perform_entity_seo_analysis(
                 max_entities=30,
                 min_frequency=2,
                 min_sources=1,
+                docs=docs,
             )
             topical_entities_data = generate_topical_summary(
                 entities=concept_entities_obj,
@@ -637,26 +664,30 @@ def perform_entity_seo_analysis(
                     all_h2.extend(h2_list_src)
             
             # 6a. Salience scoring
-            salience_results = compute_salience(
-                nlp=nlp,
-                texts=texts,
-                urls=urls,
-                entities=entities,
-                h2_patterns=all_h2,
-                h1_patterns=all_h1,
-                main_keyword=main_keyword,
-            )
+            with timed("salience"):
+                salience_results = compute_salience(
+                    nlp=nlp,
+                    texts=texts,
+                    urls=urls,
+                    entities=entities,
+                    h2_patterns=all_h2,
+                    h1_patterns=all_h1,
+                    main_keyword=main_keyword,
+                    docs=docs,
+                )
             salience_data = [s.to_dict() for s in salience_results[:20]]
             print(f"[ENTITY] ✅ Salience: computed for {len(salience_results)} entities")
             
             # 6b. Co-occurrence pairs
-            cooccurrence_results = extract_cooccurrence(
-                nlp=nlp,
-                texts=texts,
-                entities=entities,
-                max_pairs=20,
-                min_cooccurrences=2,
-            )
+            with timed("cooccurrence"):
+                cooccurrence_results = extract_cooccurrence(
+                    nlp=nlp,
+                    texts=texts,
+                    entities=entities,
+                    max_pairs=20,
+                    min_cooccurrences=2,
+                    docs=docs,
+                )
             cooccurrence_data = [p.to_dict() for p in cooccurrence_results]
             print(f"[ENTITY] ✅ Co-occurrence: {len(cooccurrence_results)} pairs found")
             
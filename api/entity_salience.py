@@ -125,6 +125,7 @@ def compute_salience(
     h2_patterns: List[str] = None,
     h1_patterns: List[str] = None,
     main_keyword: str = "",
+    docs: List = None,
 ) -> List[SalienceSignals]:
     """
     Oblicza Entity Salience Score dla każdej encji.
@@ -135,6 +136,8 @@ def compute_salience(
     3. Rola gramatyczna — podmiot (nsubj) > dopełnienie (obj)  
     4. Distribution — w ilu źródłach, IDF
     5. Keyword overlap — powiązanie z main keyword
+
+    `docs` — opcjonalne Doc-i z DocStore (wyrównane z texts), bez ponownego nlp().
     """
     if not entities or not texts:
         return []
@@ -170,16 +173,19 @@ def compute_salience(
         if not text or len(text) < 100:
             continue
         
-        # v2.1: Clean text before NER
-        text_clean = _clean_text_for_nlp(text) if _clean_text_for_nlp else text
-        text_sample = text_clean[:50000]
-        text_len = len(text_sample)
-        
         # Track first positions per source
         first_positions_this_source: Dict[str, float] = {}
         
         try:
-            doc = nlp(text_sample)
+            if docs is not None:
+                doc = docs[src_idx]
+                text_sample = doc.text
+            else:
+                # v2.1: Clean text before NER
+                text_clean = _clean_text_for_nlp(text) if _clean_text_for_nlp else text
+                text_sample = text_clean[:50000]
+                doc = nlp(text_sample)
+            text_len = len(text_sample)
             
             for ent in doc.ents:
                 key = ent.text.strip().lower()
@@ -326,6 +332,7 @@ def extract_cooccurrence(
     entities: List,          # ExtractedEntity objects
     max_pairs: int = 20,
     min_cooccurrences: int = 2,
+    docs: List = None,
 ) -> List[CoOccurrencePair]:
     """
     Wyciąga pary encji współwystępujących w zdaniach i akapitach.
@@ -335,6 +342,8 @@ def extract_cooccurrence(
     
     Dokument: "Encje pojawiające się w tym samym akapicie/zdaniu 
     tworzą silniejsze asocjacje niż encje oddalone o setki słów."
+
+    `docs` — opcjonalne Doc-i z DocStore (wyrównane z texts), bez ponownego nlp().
     """
     if not texts or not entities:
         return []
@@ -357,12 +366,15 @@ def extract_cooccurrence(
         if not text or len(text) < 100:
             continue
         
-        # v2.1: Clean text before NER
-        text_clean = _clean_text_for_nlp(text) if _clean_text_for_nlp else text
-        text_sample = text_clean[:50000]
-        
         try:
-            doc = nlp(text_sample)
+            if docs is not None:
+                doc = docs[src_idx]
+                text_sample = doc.text
+            else:
+                # v2.1: Clean text before NER
+                text_clean = _clean_text_for_nlp(text) if _clean_text_for_nlp else text
+                text_sample = text_clean[:50000]
+                doc = nlp(text_sample)
             
             # ── Sentence-level co-occurrence ──
             for sent in doc.sents:
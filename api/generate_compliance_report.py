@@ -1,30 +1,71 @@
+import os
 import re
-import spacy
 import json
-from rapidfuzz import fuzz  # nowa biblioteka do fuzzy matchy
+
+import numpy as np
+from rapidfuzz import fuzz, process  # nowa biblioteka do fuzzy matchy
+from rapidfuzz.distance import LCSseq
+
+# Model: współdzielony rejestr (nlp_models), widok tylko-lematyzujący
+try:
+    from .nlp_models import get_lemmatizer
+    from .keyword_matcher import KeywordMatcher
+except ImportError:
+    from nlp_models import get_lemmatizer
+    from keyword_matcher import KeywordMatcher
 
 # --- Stałe dla fuzzy-matching ---
 FUZZY_SIMILARITY_THRESHOLD = 90  # próg podobieństwa 0–100
 MAX_FUZZY_WINDOW_EXPANSION = 2   # max ile dodatkowych lematów może wejść „w środek” frazy
+# Prefiltr okien fuzzy (_FuzzyIndex): okno bez wspólnego tokenu z frazą dostaje
+# token_set_ratio = 200·LCS(A, B) / (|A| + |B|) (A, B — posortowane unikalne tokeny
+# złączone spacją), a LCS(A, B) ≤ spacje + Σ LCS(A, lemat okna). Okna, dla których
+# ta górna granica jest poniżej progu, pomijamy — wynik się nie zmienia. Pozostałe
+# (wspólny token, powtórzony lemat, lemat pusty / ze spacją) oceniamy w całości.
 
+# --- Batch endpoint: nlp.pipe z wieloma procesami tylko dla większych paczek ---
+# (fork + serializacja Doc-ów kosztuje więcej niż zysk przy kilku krótkich tekstach)
+COMPLIANCE_BATCH_PROCESSES = int(os.getenv("COMPLIANCE_BATCH_PROCESSES", "2"))
+COMPLIANCE_BATCH_MP_MIN = int(os.getenv("COMPLIANCE_BATCH_MP_MIN", "8"))
+COMPLIANCE_BATCH_MAX_TEXTS = int(os.getenv("COMPLIANCE_BATCH_MAX_TEXTS", "100"))
 
-# --- Ładowanie modelu ---
-try:
-    NLP = spacy.load("pl_core_news_sm")
-except OSError:
-    print("Pobieranie modelu pl_core_news_sm...")
-    from spacy.cli import download
-    download("pl_core_news_sm")
-    NLP = spacy.load("pl_core_news_sm")
+# --- Memo lematów fraz kluczowych (lista fraz jest ta sama dla każdego batcha artykułu) ---
+KEYWORD_LEMMA_CACHE_MAX = 20000
+_KEYWORD_LEMMA_CACHE = {}
 
 
 # --- Funkcja pomocnicza (Lematyzacja) ---
 def _lemmatize_text_to_list(text):
     """Zwraca listę lematów z tekstu (tylko tokeny alfabetyczne)."""
-    doc = NLP(text.lower())
+    doc = get_lemmatizer()(text.lower())
     return [token.lemma_ for token in doc if token.is_alpha]
 
 
+def _lemmatize_texts_to_lists(texts):
+    """
+    Lematy wielu tekstów jednym nlp.pipe; przy >= COMPLIANCE_BATCH_MP_MIN
+    tekstach — z n_process=COMPLIANCE_BATCH_PROCESSES.
+    """
+    n_process = COMPLIANCE_BATCH_PROCESSES if len(texts) >= COMPLIANCE_BATCH_MP_MIN else 1
+    docs = get_lemmatizer().pipe([t.lower() for t in texts], n_process=max(1, n_process))
+    return [[token.lemma_ for token in doc if token.is_alpha] for doc in docs]
+
+
+def _lemmatize_keywords(keywords):
+    """
+    Zwraca {fraza: [lematy]} dla listy fraz.
+    Brakujące w memo lematyzuje jednym nlp.pipe (zamiast nlp() per fraza).
+    """
+    missing = [kw for kw in dict.fromkeys(keywords) if kw not in _KEYWORD_LEMMA_CACHE]
+    if missing:
+        if len(_KEYWORD_LEMMA_CACHE) + len(missing) > KEYWORD_LEMMA_CACHE_MAX:
+            _KEYWORD_LEMMA_CACHE.clear()
+        docs = get_lemmatizer().pipe([kw.lower() for kw in missing])
+        for kw, doc in zip(missing, docs):
+            _KEYWORD_LEMMA_CACHE[kw] = [token.lemma_ for token in doc if token.is_alpha]
+    return {kw: _KEYWORD_LEMMA_CACHE[kw] for kw in keywords}
+
+
 # --- NOWA FUNKCJA: parser stanu ---
 def _parse_keyword_state(keyword_state_input):
     """
@@ -89,6 +130,112 @@ def _parse_keyword_state(keyword_state_input):
         )
 
 
+# --- Indeks fuzzy: lematy batcha + LCS lematów z frazami ---
+def _token_set_key(keyword_lemmas):
+    """Tokeny frazy tak, jak widzi je token_set_ratio: (set, posortowane i złączone spacją)."""
+    tokens = set(" ".join(keyword_lemmas).split())
+    return tokens, " ".join(sorted(tokens))
+
+
+class _FuzzyIndex:
+    """
+    Lematy batcha jako identyfikatory, współdzielone przez wszystkie frazy.
+    lcs[A] = LCS(A, lemat) dla każdego unikalnego lematu batcha (jedno
+    process.cdist dla wszystkich fraz naraz); z nich i z długości lematów
+    liczona jest górna granica token_set_ratio każdego okna.
+    """
+
+    def __init__(self, text_lemmas, keyword_lemma_lists):
+        self.text_len = len(text_lemmas)
+        ids = {}
+        self.lemma_ids = np.fromiter(
+            (ids.setdefault(lemma, len(ids)) for lemma in text_lemmas),
+            dtype=np.int64, count=self.text_len,
+        )
+        self.unique_text = list(ids)
+        self.lemma_lens = np.array([len(lemma) for lemma in self.unique_text], dtype=np.int64)
+        # Lemat pusty lub ze spacją rozbija się inaczej na tokeny — takie okna oceniamy w całości
+        self.irregular = np.array(
+            [not lemma or lemma.split() != [lemma] for lemma in self.unique_text], dtype=bool
+        )
+
+        # next_same[i] = następna pozycja z tym samym lematem (powtórzenie w oknie → ocena w całości)
+        self.next_same = np.full(self.text_len, self.text_len, dtype=np.int64)
+        last_seen = {}
+        for pos in range(self.text_len - 1, -1, -1):
+            lemma_id = int(self.lemma_ids[pos])
+            if lemma_id in last_seen:
+                self.next_same[pos] = last_seen[lemma_id]
+            last_seen[lemma_id] = pos
+
+        self.lcs = {}
+        self._add_keywords(keyword_lemma_lists)
+
+    def _add_keywords(self, keyword_lemma_lists):
+        missing = list(dict.fromkeys(
+            key for key in (_token_set_key(lemmas)[1] for lemmas in keyword_lemma_lists)
+            if key and key not in self.lcs
+        ))
+        if not missing:
+            return
+        if self.unique_text:
+            scores = process.cdist(
+                missing, self.unique_text, scorer=LCSseq.similarity, dtype=np.int64
+            )
+        else:
+            scores = np.zeros((len(missing), 0), dtype=np.int64)
+        for i, key in enumerate(missing):
+            self.lcs[key] = scores[i]
+
+    def candidate_windows(self, keyword_lemmas, threshold, max_expansion):
+        """
+        Okna (start, extra), których token_set_ratio z frazą może osiągnąć
+        próg, posortowane jak w pętli od lewej. Pozostałe na pewno mają wynik
+        poniżej progu (patrz komentarz przy stałych fuzzy).
+        """
+        kw_tokens, kw_joined = _token_set_key(keyword_lemmas)
+        kw_len = len(keyword_lemmas)
+        if not kw_tokens or self.text_len == 0:
+            return []
+        self._add_keywords([keyword_lemmas])
+
+        lemma_ids = self.lemma_ids
+        shared = np.array([lemma in kw_tokens for lemma in self.unique_text], dtype=bool)
+        forced = (shared | self.irregular)[lemma_ids]
+        lcs = self.lcs[kw_joined][lemma_ids]
+        lens = self.lemma_lens[lemma_ids]
+
+        def window_sums(values, width):
+            prefix = np.concatenate(([0], np.cumsum(values, dtype=np.int64)))
+            return prefix[width:] - prefix[:-width]
+
+        windows = []
+        for extra in range(max_expansion + 1):
+            width = kw_len + extra
+            if width > self.text_len:
+                break
+            count = self.text_len - width + 1
+            starts = np.arange(count)
+            # Najbliższe powtórzenie lematu w oknie: min next_same po pozycjach okna
+            next_repeat = np.minimum.reduce(
+                [self.next_same[offset:offset + count] for offset in range(width)]
+            )
+            score_fully = (window_sums(forced, width) > 0) | (next_repeat < starts + width)
+
+            # Bez wspólnych tokenów i powtórzeń: |B| = Σ|lemat| + spacje
+            window_len = window_sums(lens, width) + (width - 1)
+            lcs_bound = window_sums(lcs, width) + min(width, len(kw_tokens)) - 1
+            lcs_bound = np.minimum(lcs_bound, np.minimum(window_len, len(kw_joined)))
+            total_len = window_len + len(kw_joined)
+            # Zapas na zaokrąglenia float w rapidfuzz
+            may_pass = 200 * lcs_bound >= (threshold - 1e-6) * total_len
+
+            selected = np.flatnonzero(score_fully | may_pass)
+            windows.extend((int(start), extra) for start in selected)
+        windows.sort()
+        return windows
+
+
 # --- NOWA FUNKCJA: fuzzy-match na lematyzowanym tekście ---
 def _count_fuzzy_matches(
     keyword_lemmas,
@@ -97,6 +244,7 @@ def _count_fuzzy_matches(
     max_hits,
     threshold=FUZZY_SIMILARITY_THRESHOLD,
     max_expansion=MAX_FUZZY_WINDOW_EXPANSION,
+    fuzzy_index=None,
 ):
     """
     Liczy dodatkowe (fuzzy) trafienia frazy w lematyzowanym tekście.
@@ -104,6 +252,11 @@ def _count_fuzzy_matches(
     - text_lemmas: lista lematów tekstu batcha
     - exact_spans: lista (start, end) dla exact matchy (żeby ich nie dublować)
     - max_hits: ile fuzzy trafień maksymalnie możemy jeszcze doliczyć
+    - fuzzy_index: _FuzzyIndex batcha (współdzielony między frazami)
+
+    Oceniane są tylko okna, których górna granica token_set_ratio sięga progu
+    (_FuzzyIndex), wszystkie naraz przez process.cdist; zachłanny wybór od
+    lewej jak wcześniej.
     """
     if max_hits <= 0:
         return 0
@@ -113,99 +266,77 @@ def _count_fuzzy_matches(
     if kw_len == 0 or text_len == 0:
         return 0
 
+    if fuzzy_index is None:
+        fuzzy_index = _FuzzyIndex(text_lemmas, [keyword_lemmas])
+    windows = fuzzy_index.candidate_windows(keyword_lemmas, threshold, max_expansion)
+    if not windows:
+        return 0
+
     kw_str = " ".join(keyword_lemmas)
+    window_strs = [" ".join(text_lemmas[start:start + kw_len + extra]) for start, extra in windows]
+    scores = process.cdist(
+        [kw_str], window_strs, scorer=fuzz.token_set_ratio, score_cutoff=threshold
+    )[0]
 
     # Zajęte pozycje (exact matche), nie dublujemy ich dla fuzzy
-    used_positions = set()
+    used = np.zeros(text_len, dtype=bool)
     for s, e in exact_spans:
-        used_positions.update(range(s, e))
+        used[s:e] = True
 
     fuzzy_count = 0
-
-    # Szukamy okien od długości kw_len do kw_len + max_expansion
-    for start in range(text_len):
-        # Minimalna długość okna to kw_len
-        for extra in range(max_expansion + 1):
-            end = start + kw_len + extra
-            if end > text_len:
-                break
-
-            window_positions = range(start, end)
-            # Jeśli okno nachodzi na exact match – pomijamy
-            if any(pos in used_positions for pos in window_positions):
-                continue
-
-            window_str = " ".join(text_lemmas[start:end])
-            score = fuzz.token_set_ratio(kw_str, window_str)
-
-            if score >= threshold:
-                fuzzy_count += 1
-                used_positions.update(window_positions)
-                # Nie przekraczamy maksymalnej liczby fuzzy-hits
-                if fuzzy_count >= max_hits:
-                    return fuzzy_count
-                # Jeżeli złapaliśmy match w tym starcie, nie badamy dłuższych okien
-                break
+    matched_start = -1
+    for (start, extra), score in zip(windows, scores):
+        # Jeżeli złapaliśmy match w tym starcie, nie badamy dłuższych okien
+        if start == matched_start:
+            continue
+        end = start + kw_len + extra
+        # Jeśli okno nachodzi na exact match (lub wcześniejszy fuzzy) – pomijamy
+        if used[start:end].any():
+            continue
+        if score >= threshold:
+            fuzzy_count += 1
+            used[start:end] = True
+            matched_start = start
+            # Nie przekraczamy maksymalnej liczby fuzzy-hits
+            if fuzzy_count >= max_hits:
+                return fuzzy_count
 
     return fuzzy_count
 
 
-# --- Główna funkcja (wersja STANOWA) ---
-def generate_compliance_report(text_to_process, keyword_state_input):
+# --- Rdzeń liczenia: lematy batcha + stan → raport i nowy stan ---
+def _score_batch_lemmas(text_lemmas, current_state, keyword_lemmas_map, matcher=None):
     """
-    Generuje raport zgodności i ZWRACA NOWY STAN.
-    Liczy słowa tylko w podanym 'text_to_process' (batchu).
-    Odejmuje policzone słowa od stanu 'keyword_state_input'.
-    Teraz:
-      - najpierw liczy exact match (na lematy),
-      - potem fuzzy match (rapidfuzz) na lematyzowanym tekście,
-        z limitem do pozostałego 'max'.
+    Liczy exact + fuzzy trafienia fraz w lematach batcha.
+    - matcher: gotowy KeywordMatcher dla keyword_lemmas_map (np. z sesji);
+      jeśli brak — budowany na miejscu.
+    Zwraca (compliance_report_batch, new_keyword_state).
     """
+    if matcher is None:
+        matcher = KeywordMatcher(keyword_lemmas_map)
 
-    # === 1. PARSOWANIE STANU ===
-    try:
-        # Wczytujemy pulę, jaka nam pozostała
-        current_state = _parse_keyword_state(keyword_state_input)
-    except Exception as e:
-        return {"error": str(e), "new_keyword_state": keyword_state_input}
+    # Exact match wszystkich fraz w JEDNYM przebiegu (Aho–Corasick nad lematami)
+    exact_spans_map = matcher.find_all(text_lemmas)
 
-    # Jeśli tekst jest pusty, nie rób nic, zwróć ten sam stan
-    if not text_to_process:
-        empty_report = [{
-            "keyword": kw,
-            "range_remaining": f"{v['min']}-{v['max']}",
-            "actual_in_batch": 0,
-            "status": "OK"  # nic się nie stało
-        } for kw, v in current_state.items()]
-        return {
-            "compliance_report": empty_report,
-            "new_keyword_state": current_state
-        }
-
-    # === 2. ANALIZA NLP (tylko bieżący batch) ===
-    text_lemmas = _lemmatize_text_to_list(text_to_process)
-    text_lemmas_len = len(text_lemmas)
+    # Indeks fuzzy batcha — budowany raz, współdzielony przez wszystkie frazy
+    fuzzy_index = _FuzzyIndex(text_lemmas, keyword_lemmas_map.values())
 
-    # === 3. LOGIKA LICZENIA (batch) i AKTUALIZACJA STANU ===
     compliance_report_batch = []
     new_keyword_state = {}
 
     for keyword, ranges in current_state.items():
         min_val, max_val = ranges["min"], ranges["max"]
 
-        # Lematyzacja frazy kluczowej
-        keyword_lemmas = _lemmatize_text_to_list(keyword)
+        # Lematy frazy kluczowej
+        keyword_lemmas = keyword_lemmas_map[keyword]
         kw_len = len(keyword_lemmas)
         actual_count_in_batch = 0  # licznik tylko dla tego batcha
 
-        exact_spans = []
+        exact_spans = exact_spans_map[keyword]
 
         if kw_len > 0:
-            # --- 3a. EXACT MATCH NA LEMATY ---
-            for i in range(text_lemmas_len - kw_len + 1):
-                if text_lemmas[i:i + kw_len] == keyword_lemmas:
-                    actual_count_in_batch += 1
-                    exact_spans.append((i, i + kw_len))
+            # --- 3a. EXACT MATCH NA LEMATY (spany z automatu) ---
+            actual_count_in_batch += len(exact_spans)
 
             # --- 3b. FUZZY MATCH (tylko jeśli mamy jeszcze „miejsce” w max) ---
             remaining_room = max_val - actual_count_in_batch
@@ -215,6 +346,7 @@ def generate_compliance_report(text_to_process, keyword_state_input):
                     text_lemmas=text_lemmas,
                     exact_spans=exact_spans,
                     max_hits=remaining_room,
+                    fuzzy_index=fuzzy_index,
                 )
                 actual_count_in_batch += fuzzy_hits
 
@@ -246,7 +378,113 @@ def generate_compliance_report(text_to_process, keyword_state_input):
             "max": new_max
         }
 
+    return compliance_report_batch, new_keyword_state
+
+
+def _empty_report(current_state):
+    """Raport dla pustego batcha — nic się nie zmieniło."""
+    return [{
+        "keyword": kw,
+        "range_remaining": f"{v['min']}-{v['max']}",
+        "actual_in_batch": 0,
+        "status": "OK"  # nic się nie stało
+    } for kw, v in current_state.items()]
+
+
+# --- Główna funkcja (wersja STANOWA) ---
+def generate_compliance_report(text_to_process, keyword_state_input):
+    """
+    Generuje raport zgodności i ZWRACA NOWY STAN.
+    Liczy słowa tylko w podanym 'text_to_process' (batchu).
+    Odejmuje policzone słowa od stanu 'keyword_state_input'.
+    Teraz:
+      - najpierw liczy exact match (na lematy),
+      - potem fuzzy match (rapidfuzz) na lematyzowanym tekście,
+        z limitem do pozostałego 'max'.
+    """
+
+    # === 1. PARSOWANIE STANU ===
+    try:
+        # Wczytujemy pulę, jaka nam pozostała
+        current_state = _parse_keyword_state(keyword_state_input)
+    except Exception as e:
+        return {"error": str(e), "new_keyword_state": keyword_state_input}
+
+    # Jeśli tekst jest pusty, nie rób nic, zwróć ten sam stan
+    if not text_to_process:
+        return {
+            "compliance_report": _empty_report(current_state),
+            "new_keyword_state": current_state
+        }
+
+    # === 2. ANALIZA NLP (tylko bieżący batch) ===
+    text_lemmas = _lemmatize_text_to_list(text_to_process)
+
+    # Lematyzacja wszystkich fraz kluczowych naraz (memo między batchami)
+    keyword_lemmas_map = _lemmatize_keywords(list(current_state.keys()))
+
+    # === 3. LOGIKA LICZENIA (batch) i AKTUALIZACJA STANU ===
+    compliance_report_batch, new_keyword_state = _score_batch_lemmas(
+        text_lemmas, current_state, keyword_lemmas_map
+    )
+
     return {
         "compliance_report": compliance_report_batch,
         "new_keyword_state": new_keyword_state  # zaktualizowana pula
     }
+
+
+# --- Wersja wsadowa: wiele tekstów, jeden stan ---
+def generate_compliance_report_batch(texts, keyword_state_input, chain=True):
+    """
+    Raport zgodności dla listy tekstów przy JEDNYM stanie fraz.
+    - frazy parsowane i lematyzowane raz, jeden KeywordMatcher dla wszystkich,
+    - teksty lematyzowane razem (nlp.pipe, wiele procesów dla dużych paczek),
+    - chain=True  → teksty to kolejne batche artykułu: każdy liczony od stanu
+                    po poprzednim (jak N kolejnych wywołań pojedynczych),
+    - chain=False → teksty to alternatywy (np. warianty przepisania): każdy
+                    liczony od stanu wejściowego, stan końcowy = wejściowy.
+    """
+    try:
+        current_state = _parse_keyword_state(keyword_state_input)
+    except Exception as e:
+        return {"error": str(e), "new_keyword_state": keyword_state_input}
+
+    if not isinstance(texts, list) or not all(isinstance(t, str) for t in texts):
+        return {"error": "Pole 'texts' musi być listą stringów.", "new_keyword_state": current_state}
+    if len(texts) > COMPLIANCE_BATCH_MAX_TEXTS:
+        return {
+            "error": f"Za dużo tekstów ({len(texts)}), limit: {COMPLIANCE_BATCH_MAX_TEXTS}.",
+            "new_keyword_state": current_state,
+        }
+
+    keyword_lemmas_map = _lemmatize_keywords(list(current_state.keys()))
+    matcher = KeywordMatcher(keyword_lemmas_map)
+
+    # Puste teksty nie trafiają do nlp.pipe
+    non_empty = [i for i, t in enumerate(texts) if t]
+    lemma_lists = dict(zip(non_empty, _lemmatize_texts_to_lists([texts[i] for i in non_empty])))
+
+    results = []
+    state = current_state
+    for idx, text in enumerate(texts):
+        base_state = state if chain else current_state
+        if idx in lemma_lists:
+            report, new_state = _score_batch_lemmas(
+                lemma_lists[idx], base_state, keyword_lemmas_map, matcher=matcher
+            )
+        else:
+            report, new_state = _empty_report(base_state), base_state
+        results.append({
+            "index": idx,
+            "compliance_report": report,
+            "new_keyword_state": new_state,
+        })
+        if chain:
+            state = new_state
+
+    return {
+        "results": results,
+        "chain": chain,
+        "new_keyword_state": state,  # chain=False → stan wejściowy bez zmian
+    }
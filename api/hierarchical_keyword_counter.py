@@ -52,7 +52,10 @@ def hierarchical_keyword_counter(raw_counts):
 
     # Try proxy first
     try:
-        import requests
+        try:
+            from .http_client import http_post
+        except ImportError:
+            from http_client import http_post
         from urllib.parse import urljoin
 
         # Fix #14 v4.2: Use env var, not localhost
@@ -63,7 +66,7 @@ def hierarchical_keyword_counter(raw_counts):
         proxy_url = f"{master_url}/api/count_keywords_inherited"
         timeout = 2  # Short timeout to fail fast if unavailable
 
-        response = requests.post(
+        response = http_post(
             proxy_url,
             json={"raw_counts": raw_counts},
             timeout=timeout,
@@ -0,0 +1,125 @@
+"""
+===============================================================================
+🧹 HTML EXTRACT v1.0 — jeden przebieg po HTML: boilerplate, nagłówki, tekst
+===============================================================================
+Wcześniej _extract_scraped_page robił 5 osobnych re.sub(..., DOTALL) (script,
+style, svg, noscript, komentarze), a fallback bez trafilatury kolejne 6
+(nav, footer, header, aside, klamry, tagi) + osobny findall na <h2> — każdy
+przebieg kopiował string do ~90K znaków.
+
+Teraz JEDEN skaner (skompilowany regex z alternatywą, iterowany raz):
+  - komentarze i poddrzewa script/style/svg/noscript → wycinane,
+  - poddrzewa nav/footer/header/aside → zostają w HTML dla trafilatury
+    (ona ma własne heurystyki), ale nie trafiają do tekstu fallbacku,
+  - <h1>/<h2>/<h3> → tekst nagłówków zbierany po drodze (także z wnętrza
+    header/nav/aside),
+  - reszta → segmenty tekstu; tagi inline zdejmowane dopiero przy budowie
+    tekstu (leniwie — tylko gdy fallback go potrzebuje).
+
+Dlaczego regex, a nie html.parser: HTMLParser woła Pythonowy callback na
+KAŻDY tag i na typowej stronie był ~4x wolniejszy od dotychczasowego łańcucha
+re.sub. Skaner zatrzymuje się w Pythonie tylko na elementach specjalnych,
+resztę przewija silnik regex w C.
+
+Użycie:
+    page = extract_html(raw_html)
+    page.html            # HTML bez script/style/svg/noscript/komentarzy
+    page.text            # widoczny tekst (bez nav/footer/header/aside)
+    page.headings["h2"]  # teksty nagłówków H2 w kolejności
+
+Integracja: index.py → _extract_scraped_page()
+===============================================================================
+"""
+
+import re
+from typing import Dict, List
+
+# Alternatywa skanera — grupy:
+#   heavy (1): poddrzewa wycinane całkowicie
+#   layout (2, 3): poddrzewa poza tekstem fallbacku
+#   heading (4, 5): nagłówki H1–H3
+_SPECIAL_RE = re.compile(
+    r'<!--.*?-->'
+    r'|<(script|style|svg|noscript)\b[^>]*>.*?</\1\s*>'
+    r'|<(nav|footer|header|aside)\b[^>]*>(.*?)</\2\s*>'
+    r'|<(h[1-3])\b[^>]*>(.*?)</\4\s*>',
+    re.DOTALL | re.IGNORECASE,
+)
+_HEAVY_RE = re.compile(
+    r'<!--.*?-->|<(script|style|svg|noscript)\b[^>]*>.*?</\1\s*>',
+    re.DOTALL | re.IGNORECASE,
+)
+_HEADING_RE = re.compile(r'<(h[1-3])\b[^>]*>(.*?)</\1\s*>', re.DOTALL | re.IGNORECASE)
+_TAG_RE = re.compile(r'<[^>]+>')
+# v56.2: Inline CSS/JS artifacts, które przeżyły usunięcie <style>/<script>
+_BRACES_RE = re.compile(r'\{[^}]{0,500}\}')
+
+
+class HtmlExtract:
+    """Wynik jednego przebiegu: oczyszczony HTML, nagłówki, (leniwie) tekst."""
+
+    def __init__(self, html: str, text_segments: List[str], headings: Dict[str, List[str]]):
+        self.html = html
+        self.headings = headings
+        self._text_segments = text_segments
+        self._text = None
+
+    @property
+    def text(self) -> str:
+        if self._text is None:
+            text = " ".join(self._text_segments)
+            if "{" in text:
+                text = _BRACES_RE.sub(" ", text)
+            text = _TAG_RE.sub(" ", text)
+            self._text = " ".join(text.split())
+        return self._text
+
+
+def _heading_text(inner: str) -> str:
+    return _TAG_RE.sub("", inner).strip()
+
+
+def _collect_headings(block: str, headings: Dict[str, List[str]]) -> None:
+    """Nagłówki z wnętrza poddrzewa layoutu (np. <h1> w <header>)."""
+    if "<h" not in block and "<H" not in block:
+        return
+    for match in _HEADING_RE.finditer(block):
+        headings[match.group(1).lower()].append(_heading_text(match.group(2)))
+
+
+def extract_html(html: str) -> HtmlExtract:
+    """Jeden przebieg skanera po HTML → HtmlExtract."""
+    html_parts: List[str] = []
+    text_segments: List[str] = []
+    headings: Dict[str, List[str]] = {"h1": [], "h2": [], "h3": []}
+    pos = 0
+
+    for match in _SPECIAL_RE.finditer(html):
+        start = match.start()
+        if start > pos:
+            segment = html[pos:start]
+            html_parts.append(segment)
+            text_segments.append(segment)
+        pos = match.end()
+
+        layout_tag, heading_tag = match.group(2), match.group(4)
+        if heading_tag:
+            html_parts.append(match.group(0))
+            inner = match.group(5)
+            headings[heading_tag.lower()].append(_heading_text(inner))
+            text_segments.append(inner)
+        elif layout_tag:
+            block = match.group(0)
+            # Layout zostaje w HTML, ale bez ciężkich poddrzew w środku
+            if "<" in match.group(3):
+                block = _HEAVY_RE.sub("", block)
+                _collect_headings(match.group(3), headings)
+            html_parts.append(block)
+        # komentarze / script / style / svg / noscript → pomijane
+
+    if pos < len(html):
+        tail = html[pos:]
+        html_parts.append(tail)
+        text_segments.append(tail)
+
+    return HtmlExtract("".join(html_parts), text_segments, headings)
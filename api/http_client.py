@@ -0,0 +1,144 @@
+"""
+===============================================================================
+🌐 HTTP CLIENT v1.0 — współdzielona pula połączeń (keep-alive) na proces
+===============================================================================
+Wcześniej scraping (_scrape_one), SerpAPI, DataForSEO i wywołania LLM
+używały modułowego requests.get/post — każde wywołanie = nowe TCP + TLS.
+Te same API SERP i te same domeny konkurencji były „handshake'owane”
+od nowa w każdym requeście S1.
+
+Teraz jedna requests.Session na proces (workery gunicorna tworzą własną
+po forku), z HTTPAdapterem:
+  - pool per host (HTTP_POOL_HOSTS hostów w LRU urllib3),
+  - limit połączeń per host (HTTP_POOL_PER_HOST); HTTP_POOL_BLOCK=true →
+    wątki czekają na wolne połączenie zamiast otwierać nadmiarowe,
+  - keep-alive: połączenie wraca do puli po odczycie odpowiedzi.
+
+v1.1: Sesja NIE przechowuje ciasteczek (polityka bez dozwolonych domen) —
+jak dawne jednorazowe requests.get. Inaczej słój rósłby o Set-Cookie z
+każdej scrapowanej domeny przez całe życie workera, a ciasteczka byłyby
+odsyłane przy kolejnych requestach (inne odpowiedzi serwerów). Ciasteczka
+w obrębie jednego requestu (przekierowania) działają jak wcześniej.
+
+HTTP/2: requests/urllib3 obsługują tylko HTTP/1.1 — reużycie połączeń
+keep-alive daje tu ten sam zysk (brak powtórnego TLS do tego samego hosta).
+
+Statystyki (requests vs nowe połączenia → reused) → /health ("http_pool").
+
+Konfiguracja (env):
+  HTTP_POOL_HOSTS     — ile pul hostów trzymać (domyślnie 64)
+  HTTP_POOL_PER_HOST  — maks. połączeń per host (domyślnie 8)
+  HTTP_POOL_BLOCK     — "true"/"false" (domyślnie true)
+===============================================================================
+"""
+
+import os
+import threading
+from http.cookiejar import DefaultCookiePolicy
+from typing import Dict, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+HTTP_POOL_HOSTS = int(os.getenv("HTTP_POOL_HOSTS", "64"))
+HTTP_POOL_PER_HOST = int(os.getenv("HTTP_POOL_PER_HOST", "8"))
+HTTP_POOL_BLOCK = os.getenv("HTTP_POOL_BLOCK", "true").lower() == "true"
+
+_STATS_LOCK = threading.Lock()
+_STATS = {"requests": 0, "new_connections": 0, "errors": 0}
+
+
+def _count(field: str) -> None:
+    with _STATS_LOCK:
+        _STATS[field] += 1
+
+
+# Pule liczące nowe połączenia — licznik przeżywa eviction puli z LRU urllib3
+class _CountingHTTPConnectionPool(HTTPConnectionPool):
+    def _new_conn(self):
+        _count("new_connections")
+        return super()._new_conn()
+
+
+class _CountingHTTPSConnectionPool(HTTPSConnectionPool):
+    def _new_conn(self):
+        _count("new_connections")
+        return super()._new_conn()
+
+
+class PooledAdapter(HTTPAdapter):
+    """HTTPAdapter z limitem per host i licznikami requestów/połączeń."""
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            "http": _CountingHTTPConnectionPool,
+            "https": _CountingHTTPSConnectionPool,
+        }
+
+    def send(self, request, **kwargs):
+        _count("requests")
+        try:
+            return super().send(request, **kwargs)
+        except Exception:
+            _count("errors")
+            raise
+
+
+_SESSION: Optional[requests.Session] = None
+_SESSION_PID: Optional[int] = None
+_SESSION_LOCK = threading.Lock()
+
+
+def get_session() -> requests.Session:
+    """Procesowa sesja HTTP (nowa po forku — gniazd nie dzielimy z masterem)."""
+    global _SESSION, _SESSION_PID
+    pid = os.getpid()
+    if _SESSION is not None and _SESSION_PID == pid:
+        return _SESSION
+    with _SESSION_LOCK:
+        if _SESSION is None or _SESSION_PID != pid:
+            session = requests.Session()
+            # v1.1: Bez trwałych ciasteczek między requestami (scraping + API na jednej sesji)
+            session.cookies.set_policy(DefaultCookiePolicy(allowed_domains=[]))
+            adapter = PooledAdapter(
+                pool_connections=HTTP_POOL_HOSTS,
+                pool_maxsize=HTTP_POOL_PER_HOST,
+                pool_block=HTTP_POOL_BLOCK,
+            )
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            _SESSION, _SESSION_PID = session, pid
+    return _SESSION
+
+
+def http_get(url: str, **kwargs) -> requests.Response:
+    return get_session().get(url, **kwargs)
+
+
+def http_post(url: str, **kwargs) -> requests.Response:
+    return get_session().post(url, **kwargs)
+
+
+def http_pool_stats() -> Dict:
+    """Statystyki puli dla /health."""
+    with _STATS_LOCK:
+        stats = dict(_STATS)
+    total = stats["requests"]
+    reused = max(0, total - stats["new_connections"])
+    open_pools = 0
+    if _SESSION is not None and _SESSION_PID == os.getpid():
+        adapter = _SESSION.get_adapter("https://")
+        open_pools = len(adapter.poolmanager.pools)
+    return {
+        "pool_hosts": HTTP_POOL_HOSTS,
+        "pool_per_host": HTTP_POOL_PER_HOST,
+        "pool_block": HTTP_POOL_BLOCK,
+        "open_host_pools": open_pools,
+        "requests": total,
+        "new_connections": stats["new_connections"],
+        "reused_connections": reused,
+        "reuse_ratio": round(reused / total, 3) if total else 0.0,
+        "errors": stats["errors"],
+    }
@@ -1,15 +1,10 @@
 import os
 import json
 import re
+import time
 import requests
-from collections import Counter, defaultdict
-from flask import Flask, request, jsonify
-try:
-    import spacy
-    SPACY_AVAILABLE = True
-except ImportError:
-    spacy = None
-    SPACY_AVAILABLE = False
+import numpy as np
+from flask import Flask, Response, request, jsonify, stream_with_context
 # v56.0: Removed google-generativeai — semantic keyphrases now extracted via TF-IDF (scikit-learn)
 from sklearn.feature_extraction.text import TfidfVectorizer
 import firebase_admin
@@ -115,12 +110,56 @@ print("[S1] ✅ Semantic keyphrases: TF-IDF extractor (scikit-learn)")
 # ======================================================
 try:
     from .synthesize_topics import synthesize_topics
-    from .generate_compliance_report import generate_compliance_report
+    from .generate_compliance_report import generate_compliance_report, generate_compliance_report_batch
+    from .compliance_session import (
+        generate_compliance_report_session, get_session, delete_session, session_summary,
+    )
     from .entity_extractor import perform_entity_seo_analysis
+    from .doc_store import DocStore
+    from .ngram_engine import NgramEngine, round4
+    from .parse_cache import parse_cache_stats
+    from .http_client import http_get, http_post, http_pool_stats
+    from .html_extract import extract_html
+    from .page_cache import PageCache, get_page_cache, page_cache_stats
+    from .serp_cache import cached_serp_fetch, serp_cache_stats
+    from .serp_hedge import SERP_HEDGE_ENABLED, SERP_HEDGE_MODE, hedged_fetch
+    from .source_pipeline import SOURCE_PIPELINE_ENABLED, SourcePipeline
+    from .nlp_pool import nlp_pool_stats
+    from .s1_jobs import JobQueueFull, get_job, jobs_stats, submit_job
+    from .s1_bulk import S1_BULK_MAX_KEYWORDS, S1_BULK_SERP_WORKERS, BulkCorpus
+    from .s1_stream import STREAM_FORMATS, STREAM_HEADERS, stream_format, stream_sections
+    from .metrics import bind, metrics_stats, observe, render_prometheus, request_timings, timed
+    from .async_scraper import (
+        ASYNC_SCRAPER_ENABLED, RejectedContent, fetch_page_sync, iter_scrape_pages_async,
+        async_scraper_stats,
+    )
+    from .nlp_models import get_nlp, model_info
 except ImportError:
     from synthesize_topics import synthesize_topics
-    from generate_compliance_report import generate_compliance_report
+    from generate_compliance_report import generate_compliance_report, generate_compliance_report_batch
+    from compliance_session import (
+        generate_compliance_report_session, get_session, delete_session, session_summary,
+    )
     from entity_extractor import perform_entity_seo_analysis
+    from doc_store import DocStore
+    from ngram_engine import NgramEngine, round4
+    from parse_cache import parse_cache_stats
+    from http_client import http_get, http_post, http_pool_stats
+    from html_extract import extract_html
+    from page_cache import PageCache, get_page_cache, page_cache_stats
+    from serp_cache import cached_serp_fetch, serp_cache_stats
+    from serp_hedge import SERP_HEDGE_ENABLED, SERP_HEDGE_MODE, hedged_fetch
+    from source_pipeline import SOURCE_PIPELINE_ENABLED, SourcePipeline
+    from nlp_pool import nlp_pool_stats
+    from s1_jobs import JobQueueFull, get_job, jobs_stats, submit_job
+    from s1_bulk import S1_BULK_MAX_KEYWORDS, S1_BULK_SERP_WORKERS, BulkCorpus
+    from s1_stream import STREAM_FORMATS, STREAM_HEADERS, stream_format, stream_sections
+    from metrics import bind, metrics_stats, observe, render_prometheus, request_timings, timed
+    from async_scraper import (
+        ASYNC_SCRAPER_ENABLED, RejectedContent, fetch_page_sync, iter_scrape_pages_async,
+        async_scraper_stats,
+    )
+    from nlp_models import get_nlp, model_info
 
 # Flag do włączania/wyłączania Entity SEO
 ENTITY_SEO_ENABLED = os.getenv("ENTITY_SEO_ENABLED", "true").lower() == "true"
@@ -175,16 +214,9 @@ def _require_api_key():
         return jsonify({"error": "Unauthorized"}), 401
 
 # ======================================================
-# 🧩 Load spaCy model (preinstalled lightweight version)
+# 🧩 spaCy model: v56.3 — współdzielony rejestr (nlp_models.get_nlp),
+# ładowany leniwie raz na proces zamiast osobnej kopii per moduł
 # ======================================================
-try:
-    nlp = spacy.load("pl_core_news_sm")
-    print("[S1] ✅ spaCy pl_core_news_sm loaded")
-except OSError:
-    from spacy.cli import download
-    download("pl_core_news_sm")
-    nlp = spacy.load("pl_core_news_sm")
-    print("[S1] ✅ spaCy model downloaded and loaded")
 
 # ======================================================
 # ⭐ v22.3 Helper: Check if URL should be skipped
@@ -405,7 +437,7 @@ def _paa_call_anthropic(prompt: str, keyword: str) -> str:
         print(f"[PAA_FALLBACK] ℹ️ ANTHROPIC_API_KEY not set, trying OpenAI...")
         return ""
     try:
-        resp = requests.post(
+        resp = http_post(
             "https://api.anthropic.com/v1/messages",
             headers={
                 "x-api-key": _key,
@@ -436,7 +468,7 @@ def _paa_call_openai(prompt: str, keyword: str) -> str:
         print(f"[PAA_FALLBACK] ⚠️ No API key available for PAA generation ('{keyword}')")
         return ""
     try:
-        resp = requests.post(
+        resp = http_post(
             "https://api.openai.com/v1/chat/completions",
             headers={
                 "Authorization": f"Bearer {_key}",
@@ -505,7 +537,7 @@ def _fetch_serpapi_data(keyword, num_results=10):
         return empty_result
 
     print(f"[S1/SerpAPI] 🔍 Fetching SERP data for: {keyword}")
-    serp_response = requests.get(
+    serp_response = http_get(
         "https://serpapi.com/search",
         params={
             "q": keyword,
@@ -547,7 +579,7 @@ def _fetch_serpapi_data(keyword, num_results=10):
         try:
             page_token = ai_overview_data["page_token"]
             print(f"[S1/SerpAPI] 🔄 AI Overview requires page_token fetch...")
-            aio_resp = requests.get(
+            aio_resp = http_get(
                 "https://serpapi.com/search.json",
                 params={
                     "engine": "google_ai_overview",
@@ -681,7 +713,257 @@ def _fetch_serpapi_data(keyword, num_results=10):
     }
 
 
-def fetch_serp_sources(keyword, num_results=10):
+# ======================================================
+# 🕸️ v56.4 Scraping: pobranie (sync/async) + wspólna ekstrakcja treści
+# ======================================================
+SCRAPE_HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/131.0.0.0 Safari/537.36",
+    "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8",
+    "Accept-Language": "pl-PL,pl;q=0.9,en;q=0.5",
+}
+
+
+def _decode_html(body, content_type):
+    """
+    v52.4: Smart encoding — requests domyślnie używa ISO-8859-1 dla text/html
+    bez deklaracji charset w nagłówkach, co powoduje pojÄciem zamiast pojęciem.
+    Zwraca (tekst, kodowanie, errors) — tym samym dekodowane są nagłówki H2.
+    """
+    match = re.search(r'charset=["\']?([\w.:-]+)', content_type or "", re.IGNORECASE)
+    if match:
+        # Zaufaj zadeklarowanemu charset (jak response.text w requests)
+        try:
+            return body.decode(match.group(1), errors="replace"), match.group(1), "replace"
+        except LookupError:
+            return body.decode("utf-8", errors="replace"), "utf-8", "replace"
+    try:
+        return body.decode('utf-8'), "utf-8", "strict"
+    except UnicodeDecodeError as e:
+        # Body ucięte budżetem bajtów w środku znaku UTF-8 — to wciąż UTF-8
+        if e.reason == "unexpected end of data" and e.start >= len(body) - 3:
+            return body[:e.start].decode('utf-8', errors='replace'), "utf-8", "replace"
+        try:
+            return body.decode('windows-1250'), "windows-1250", "strict"
+        except UnicodeDecodeError:
+            return body.decode('utf-8', errors='replace'), "utf-8", "replace"
+
+
+def _extract_scraped_page(item, page):
+    """
+    FetchedPage (status, nagłówki, body) → źródło S1 albo None.
+    Wspólne dla ścieżki sync (_scrape_one) i async (async_scraper).
+    """
+    url = page.url
+    title = item.get("title", "")
+    # v56.4: Czas pobrania strony (do końca body) → metrics.py
+    observe("scrape_fetch", time.time() - page.started_at, detail=url, status=page.status)
+    # v56.4: 304 Not Modified na conditional GET → treść z page_cache, bez trafilatury
+    cached = item.get("_page_cache")
+    page_cache = get_page_cache()
+    if page.status == 304 and cached and page_cache:
+        page_cache.mark_revalidated(cached, page.etag, page.last_modified)
+        print(f"[S1] ♻️ Not modified (304), cached {cached['word_count']} words: {url[:40]}")
+        return PageCache.to_source(cached, url, title)
+    if page.status != 200:
+        print(f"[S1] ⚠️ HTTP {page.status} from {url[:40]}")
+        return None
+
+    raw_html, encoding, errors = _decode_html(page.body, page.content_type)
+
+    # v56.2: Wyciągnij H2 z PEŁNEGO HTML (przed truncacją)
+    # v56.4: H2 zebrane przyrostowo w trakcie pobierania (H2Collector — zawsze
+    # lista, także w ścieżce sync: fetch_page_sync)
+    h2_tags = [re.sub(r'<[^>]+>', '', h.decode(encoding, errors=errors)).strip() for h in page.h2_raw]
+    h2_clean = [h for h in h2_tags if h and len(h) < 200 and not re.search(r'[{};]|webkit|moz-|flex-|align-items', h, re.IGNORECASE)]
+
+    # v56.2: Strip boilerplate BEFORE truncation — ensures trafilatura
+    # gets meaningful HTML, not 60K of <script>/<style> from <head>
+    # v56.4: Jeden przebieg skanera (html_extract) zamiast łańcucha re.sub
+    stripped_html = raw_html
+    if len(stripped_html) > MAX_CONTENT_SIZE * 2:
+        print(f"[S1] ⚠️ Content too large ({len(raw_html)} chars), truncating: {url[:40]}")
+        # Strip heavy non-content tags (script/style/svg/noscript/komentarze), then truncate
+        stripped_html = extract_html(raw_html).html[:MAX_CONTENT_SIZE * 3]
+
+    # Ekstrakcja treści — trafilatura lub regex fallback
+    content = None
+    if TRAFILATURA_AVAILABLE:
+        try:
+            with timed("trafilatura", detail=url):
+                content = trafilatura.extract(
+                    stripped_html,
+                    include_comments=False,
+                    include_tables=True,
+                    no_fallback=False,
+                    favor_precision=True
+                )
+        except Exception as e:
+            print(f"[S1] ⚠️ trafilatura failed for {url[:40]}: {e}")
+            content = None
+
+    # Fallback: widoczny tekst (bez script/style/svg/noscript/nav/footer/header/
+    # aside, klamer CSS i tagów) — z przyciętego prefiksu, jak wcześniej
+    if not content:
+        content = extract_html(stripped_html).text
+
+    content = content[:MAX_CONTENT_SIZE]
+    elapsed = time.time() - page.started_at
+
+    if len(content) > 500:
+        word_count = len(content.split())
+        print(f"[S1] ✅ Scraped {len(content)} chars ({word_count} words), {len(h2_clean)} H2 from {url[:40]} [{elapsed:.1f}s]")
+        source = {
+            "url": url,
+            "title": title,
+            "content": content,
+            "h2_structure": h2_clean[:15],
+            "word_count": word_count
+        }
+        if page_cache:
+            page_cache.put(url, source, page.etag, page.last_modified)
+        return source
+    print(f"[S1] ⚠️ Too short content from {url[:40]}")
+    return None
+
+
+def _request_headers(item):
+    """SCRAPE_HEADERS + If-None-Match / If-Modified-Since dla przeterminowanego wpisu cache."""
+    conditional = PageCache.conditional_headers(item.get("_page_cache"))
+    return {**SCRAPE_HEADERS, **conditional} if conditional else SCRAPE_HEADERS
+
+
+def _scrape_one(item):
+    """Scrape a single URL (blocking) — runs in thread pool."""
+    url = item.get("link", "")
+    try:
+        # v56.4: strumieniowo, do budżetu SCRAPE_MAX_BYTES, z odrzuceniem nie-HTML
+        page = fetch_page_sync(http_get, url, _request_headers(item), SCRAPE_TIMEOUT)
+        return _extract_scraped_page(item, page)
+    except RejectedContent as e:
+        print(f"[S1] ⏭️ Skipping {url[:40]}: {e}")
+        return None
+    except requests.exceptions.Timeout:
+        print(f"[S1] ⏱️ Timeout for {url[:40]} (>{SCRAPE_TIMEOUT}s)")
+        return None
+    except Exception as e:
+        print(f"[S1] ⚠️ Scrape error for {url[:40]}: {e}")
+        return None
+
+
+def _scrape_pages(items):
+    """Oddaje wyniki scrapingu w kolejności ukończenia, gdy tylko są gotowe (None = odrzucone)."""
+    # v56.4: Świeże wpisy page_cache wracają od razu (bez requestu i trafilatury);
+    # przeterminowane idą dalej z wpisem → conditional GET
+    to_fetch = items
+    page_cache = get_page_cache()
+    if page_cache:
+        to_fetch = []
+        for item in items:
+            url = item.get("link", "")
+            entry = page_cache.lookup(url)
+            if entry and entry["fresh"]:
+                print(f"[S1] 📦 Page cache hit ({entry['word_count']} words): {url[:40]}")
+                yield PageCache.to_source(entry, url, item.get("title", ""))
+            else:
+                to_fetch.append({**item, "_page_cache": entry} if entry else item)
+    if not to_fetch:
+        return
+    if ASYNC_SCRAPER_ENABLED:
+        yield from iter_scrape_pages_async(to_fetch, bind(_extract_scraped_page), headers=_request_headers,
+                                           timeout=SCRAPE_TIMEOUT)
+        return
+    from concurrent.futures import ThreadPoolExecutor, as_completed
+    with ThreadPoolExecutor(max_workers=6) as pool:
+        futures = [pool.submit(bind(_scrape_one), item) for item in to_fetch]
+        for future in as_completed(futures):
+            yield future.result()
+
+
+# v56.4: Odpowiedzi providerów przez serp_cache (TTL per keyword + coalescing)
+# v56.4: serp_fetch = z cache, serp_upstream = faktyczne wywołanie providera (metrics.py)
+def _serpapi_fetch_cached(keyword, num_results=10, ttl=None):
+    def upstream():
+        with timed("serp_upstream", detail=keyword, provider="serpapi"):
+            return _fetch_serpapi_data(keyword, num_results=num_results)
+
+    with timed("serp_fetch", detail=keyword, provider="serpapi"):
+        return cached_serp_fetch(
+            "serpapi", keyword, upstream,
+            location="pl", language="pl", num_results=num_results, ttl=ttl,
+        )
+
+
+def _dataforseo_fetch_cached(keyword, num_results=10, ttl=None):
+    def upstream():
+        with timed("serp_upstream", detail=keyword, provider="dataforseo"):
+            return dataforseo_fetch(keyword, num_results=num_results)
+
+    with timed("serp_fetch", detail=keyword, provider="dataforseo"):
+        return cached_serp_fetch(
+            "dataforseo", keyword, upstream,
+            location=2616, language="pl", num_results=num_results, ttl=ttl,
+        )
+
+
+def _has_organic_results(serp_metadata):
+    """DataForSEO zwraca organic_results_raw, SerpAPI organic_results."""
+    return bool(serp_metadata and (serp_metadata.get("organic_results") or serp_metadata.get("organic_results_raw")))
+
+
+def _missing_serp_fields(serp_fields):
+    missing = []
+    if not serp_fields["paa"]:
+        missing.append("PAA")
+    if not serp_fields["ai_overview"]:
+        missing.append("AIO")
+    if not serp_fields["featured_snippet"]:
+        missing.append("FS")
+    return missing
+
+
+def _merge_missing_serp_fields(serp_fields, secondary, secondary_name):
+    """v55.2: Uzupełnia brakujące PAA / AI Overview / snippet / related z drugiego providera."""
+    if not secondary:
+        return
+    if not serp_fields["paa"]:
+        _sec_paa = secondary.get("paa", [])
+        if _sec_paa:
+            serp_fields["paa"] = _sec_paa
+            print(f"[S1] ✅ PAA from {secondary_name}: {len(_sec_paa)} questions")
+    if not serp_fields["ai_overview"]:
+        _sec_aio = secondary.get("ai_overview")
+        if _sec_aio:
+            serp_fields["ai_overview"] = _sec_aio
+            print(f"[S1] ✅ AI Overview from {secondary_name}")
+    if not serp_fields["featured_snippet"]:
+        _sec_fs = secondary.get("featured_snippet")
+        if _sec_fs:
+            serp_fields["featured_snippet"] = _sec_fs
+            print(f"[S1] ✅ Featured Snippet from {secondary_name}")
+    if not serp_fields["related_searches"]:
+        _sec_rs = secondary.get("related_searches", [])
+        if _sec_rs:
+            serp_fields["related_searches"] = _sec_rs
+
+
+def _claude_paa_fallback_if_missing(keyword, serp_metadata, serp_fields):
+    """PAA Claude fallback (if still no PAA after both providers)."""
+    if serp_fields["paa"]:
+        return
+    print(f"[S1] ⚠️ No PAA from any provider — generating with Claude fallback...")
+    serp_data_for_fallback = serp_metadata.get("_serp_data", {})
+    if not serp_data_for_fallback:
+        serp_data_for_fallback = {
+            "organic_results": serp_metadata.get("organic_results_raw") or serp_metadata.get("organic_results", []),
+            "ai_overview": serp_fields["ai_overview"],
+        }
+    serp_fields["paa"] = _generate_paa_claude_fallback(keyword, serp_data_for_fallback)
+    if serp_fields["paa"]:
+        print(f"[S1] ✅ Claude PAA fallback: {len(serp_fields['paa'])} questions generated")
+
+
+def fetch_serp_sources(keyword, num_results=10, serp_cache_ttl=None, on_source=None, progress=None,
+                       scrape=True):
     """
     Pobiera PEŁNE dane z Google przez wybranego SERP providera:
     - Organic results (top 10 stron) + scrapuje ich pełną treść
@@ -695,6 +977,16 @@ def fetch_serp_sources(keyword, num_results=10):
       "dataforseo" — tylko DataForSEO
       "serpapi"     — tylko SerpAPI
       "auto"        — DataForSEO jeśli skonfigurowany, fallback do SerpAPI
+
+    v56.4: serp_cache_ttl — TTL cache SERP dla tego keywordu w s
+    (None → SERP_CACHE_TTL, domyślnie 6 h; 0 → pomiń cache, świeże dane).
+    v56.4: SERP_HEDGE_MODE (serp_hedge.py) — w trybie auto SerpAPI odpalany
+    równolegle / po opóźnieniu; scraping startuje po pierwszym organic.
+    v56.4: on_source(source) — wołane dla każdego przyjętego źródła zaraz po
+    jego zescrapowaniu (np. SourcePipeline.submit → parse w trakcie scrapingu).
+    v56.4: progress(stage, **info) — etap "scrape" z licznikiem stron (joby S1).
+    v56.4: scrape=False — tylko SERP; strony do scrapingu w "scrape_targets"
+    (bulk S1 scrapuje unikalne URL-e wszystkich keywordów naraz).
     """
     empty_result = {
         "sources": [],
@@ -710,6 +1002,7 @@ def fetch_serp_sources(keyword, num_results=10):
     # ── v55.0: Choose SERP provider ──
     provider_used = None
     serp_metadata = None
+    hedge = None
 
     try:
 
@@ -717,7 +1010,7 @@ def fetch_serp_sources(keyword, num_results=10):
             if not DATAFORSEO_ENABLED or _is_dataforseo_blocked():
                 print("[S1] ❌ SERP_PROVIDER=dataforseo but DataForSEO not configured or auth failed")
                 return empty_result
-            serp_metadata = dataforseo_fetch(keyword, num_results=num_results)
+            serp_metadata = _dataforseo_fetch_cached(keyword, num_results=num_results, ttl=serp_cache_ttl)
             provider_used = "dataforseo"
             # v56.2: Detect auth failure
             if not serp_metadata.get("organic_results_raw") and not serp_metadata.get("organic_results"):
@@ -727,13 +1020,34 @@ def fetch_serp_sources(keyword, num_results=10):
             if not SERPAPI_KEY:
                 print("[S1] ❌ SERP_PROVIDER=serpapi but SERPAPI_KEY not set")
                 return empty_result
-            serp_metadata = _fetch_serpapi_data(keyword, num_results=num_results)
+            serp_metadata = _serpapi_fetch_cached(keyword, num_results=num_results, ttl=serp_cache_ttl)
             provider_used = "serpapi"
 
+        elif SERP_HEDGE_ENABLED and DATAFORSEO_ENABLED and SERPAPI_KEY and not _is_dataforseo_blocked():
+            # v56.4: Hedged auto-mode — SerpAPI odpalany równolegle / po opóźnieniu,
+            # pierwszy provider z organic startuje scraping (serp_hedge.py)
+            print(f"[S1] 🔀 Auto-mode hedged ({SERP_HEDGE_MODE}): DataForSEO + SerpAPI")
+            hedge = hedged_fetch(
+                ("dataforseo", bind(lambda: _dataforseo_fetch_cached(keyword, num_results=num_results, ttl=serp_cache_ttl))),
+                ("serpapi", bind(lambda: _serpapi_fetch_cached(keyword, num_results=num_results, ttl=serp_cache_ttl))),
+                usable=_has_organic_results,
+            )
+            if "dataforseo" in hedge.results and not _has_organic_results(hedge.results["dataforseo"]):
+                print(f"[S1] ⚠️ DataForSEO returned no organic results")
+                _mark_dataforseo_failed()
+            provider_used = hedge.provider
+            serp_metadata = hedge.result
+            if serp_metadata is None:
+                # Żaden provider bez organic — jak w trybie sekwencyjnym: SerpAPI, potem DataForSEO
+                for name in ("serpapi", "dataforseo"):
+                    if hedge.results.get(name) is not None:
+                        provider_used, serp_metadata = name, hedge.results[name]
+                        break
+
         else:  # "auto" — try DataForSEO first, fallback to SerpAPI
             if DATAFORSEO_ENABLED and not _is_dataforseo_blocked():
                 print(f"[S1] 🔄 Auto-mode: trying DataForSEO first...")
-                serp_metadata = dataforseo_fetch(keyword, num_results=num_results)
+                serp_metadata = _dataforseo_fetch_cached(keyword, num_results=num_results, ttl=serp_cache_ttl)
                 provider_used = "dataforseo"
                 # Check if DataForSEO returned useful data
                 has_organic = bool(serp_metadata.get("organic_results_raw"))
@@ -745,7 +1059,7 @@ def fetch_serp_sources(keyword, num_results=10):
 
             if serp_metadata is None and SERPAPI_KEY:
                 print(f"[S1] 🔄 {'Fallback' if DATAFORSEO_ENABLED else 'Using'}: SerpAPI")
-                serp_metadata = _fetch_serpapi_data(keyword, num_results=num_results)
+                serp_metadata = _serpapi_fetch_cached(keyword, num_results=num_results, ttl=serp_cache_ttl)
                 provider_used = "serpapi"
 
         if serp_metadata is None:
@@ -755,10 +1069,12 @@ def fetch_serp_sources(keyword, num_results=10):
         print(f"[S1] ✅ SERP data from: {provider_used}")
 
         # ── Extract common fields ──
-        paa_questions = serp_metadata.get("paa", [])
-        featured_snippet = serp_metadata.get("featured_snippet")
-        ai_overview = serp_metadata.get("ai_overview")
-        related_searches = serp_metadata.get("related_searches", [])
+        serp_fields = {
+            "paa": serp_metadata.get("paa", []),
+            "featured_snippet": serp_metadata.get("featured_snippet"),
+            "ai_overview": serp_metadata.get("ai_overview"),
+            "related_searches": serp_metadata.get("related_searches", []),
+        }
         refinement_chips = serp_metadata.get("refinement_chips", [])
         serp_titles = serp_metadata.get("serp_titles", [])
         serp_snippets = serp_metadata.get("serp_snippets", [])
@@ -766,17 +1082,15 @@ def fetch_serp_sources(keyword, num_results=10):
         # ── v55.2: PAA/AI Overview/Snippet cascade ──
         # Jeśli primary provider nie zwrócił PAA, AI Overview lub Snippet,
         # spróbuj drugiego providera zanim fallback do Claude.
-        _missing = []
-        if not paa_questions:
-            _missing.append("PAA")
-        if not ai_overview:
-            _missing.append("AIO")
-        if not featured_snippet:
-            _missing.append("FS")
-
+        # v56.4: W trybie hedged drugi provider jest już odpalony — zakończony
+        # scalamy teraz, trwający dopiero po scrapingu (hedge.collect_late)
+        hedged_secondary = hedge is not None and len(hedge.fired) > 1
+        if hedged_secondary:
+            for _secondary_name, _secondary in hedge.others().items():
+                _merge_missing_serp_fields(serp_fields, _secondary, _secondary_name)
+        _missing = [] if hedged_secondary else _missing_serp_fields(serp_fields)
         if _missing:
             # Determine which secondary provider to try
-            _secondary = None
             _secondary_name = None
             if provider_used == "dataforseo" and SERPAPI_KEY:
                 _secondary_name = "serpapi"
@@ -797,45 +1111,17 @@ def fetch_serp_sources(keyword, num_results=10):
                 print(f"[S1] 🔄 Missing {', '.join(_missing)} from {provider_used} — trying {_secondary_name}...")
                 try:
                     if _secondary_name == "serpapi":
-                        _secondary = _fetch_serpapi_data(keyword, num_results=num_results)
+                        _secondary = _serpapi_fetch_cached(keyword, num_results=num_results, ttl=serp_cache_ttl)
                     else:
-                        _secondary = dataforseo_fetch(keyword, num_results=num_results)
-
-                    if _secondary:
-                        if not paa_questions:
-                            _sec_paa = _secondary.get("paa", [])
-                            if _sec_paa:
-                                paa_questions = _sec_paa
-                                print(f"[S1] ✅ PAA from {_secondary_name}: {len(_sec_paa)} questions")
-                        if not ai_overview:
-                            _sec_aio = _secondary.get("ai_overview")
-                            if _sec_aio:
-                                ai_overview = _sec_aio
-                                print(f"[S1] ✅ AI Overview from {_secondary_name}")
-                        if not featured_snippet:
-                            _sec_fs = _secondary.get("featured_snippet")
-                            if _sec_fs:
-                                featured_snippet = _sec_fs
-                                print(f"[S1] ✅ Featured Snippet from {_secondary_name}")
-                        if not related_searches:
-                            _sec_rs = _secondary.get("related_searches", [])
-                            if _sec_rs:
-                                related_searches = _sec_rs
+                        _secondary = _dataforseo_fetch_cached(keyword, num_results=num_results, ttl=serp_cache_ttl)
+                    _merge_missing_serp_fields(serp_fields, _secondary, _secondary_name)
                 except Exception as _sec_err:
                     print(f"[S1] ⚠️ Secondary provider {_secondary_name} error: {_sec_err}")
 
         # ── PAA Claude fallback (if still no PAA after both providers) ──
-        if not paa_questions:
-            print(f"[S1] ⚠️ No PAA from any provider — generating with Claude fallback...")
-            serp_data_for_fallback = serp_metadata.get("_serp_data", {})
-            if not serp_data_for_fallback:
-                serp_data_for_fallback = {
-                    "organic_results": serp_metadata.get("organic_results_raw") or serp_metadata.get("organic_results", []),
-                    "ai_overview": ai_overview,
-                }
-            paa_questions = _generate_paa_claude_fallback(keyword, serp_data_for_fallback)
-            if paa_questions:
-                print(f"[S1] ✅ Claude PAA fallback: {len(paa_questions)} questions generated")
+        # v56.4: Przy wciąż trwającym providerze hedged — dopiero po scrapingu
+        if hedge is None or not hedge.pending:
+            _claude_paa_fallback_if_missing(keyword, serp_metadata, serp_fields)
 
         # ── Get organic results for scraping ──
         # DataForSEO returns organic_results_raw, SerpAPI returns organic_results
@@ -845,10 +1131,10 @@ def fetch_serp_sources(keyword, num_results=10):
             print(f"[S1] ⚠️ No organic results from {provider_used}")
             return {
                 "sources": [],
-                "paa": paa_questions,
-                "featured_snippet": featured_snippet,
-                "ai_overview": ai_overview,
-                "related_searches": related_searches,
+                "paa": serp_fields["paa"],
+                "featured_snippet": serp_fields["featured_snippet"],
+                "ai_overview": serp_fields["ai_overview"],
+                "related_searches": serp_fields["related_searches"],
                 "serp_titles": serp_titles,
                 "serp_snippets": serp_snippets
             }
@@ -856,147 +1142,70 @@ def fetch_serp_sources(keyword, num_results=10):
         print(f"[S1] ✅ {len(organic_results)} organic results from {provider_used}")
 
         # ⭐ 6. Scrapuj PEŁNĄ treść każdej strony + strukturę H2
-        # ⭐ v47.1: Parallel scraping with ThreadPoolExecutor
-        from concurrent.futures import ThreadPoolExecutor, as_completed
+        # ⭐ v47.1: Parallel scraping; v56.4: async engine (async_scraper.py)
+        #   z globalnym budżetem połączeń i deadline'em na cały request
         import time as _time
 
-        def _scrape_one(item):
-            """Scrape a single URL — runs in thread pool."""
+        scrape_targets = []
+        for item in organic_results[:num_results]:
             url = item.get("link", "")
-            title = item.get("title", "")
             if not url:
-                return None
+                continue
             if should_skip_url(url):
                 print(f"[S1] ⏭️ Skipping large doc pattern: {url[:50]}...")
-                return None
-
-            t0 = _time.time()
-            try:
-                page_response = requests.get(
-                    url,
-                    timeout=SCRAPE_TIMEOUT,
-                    headers={
-                        "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/131.0.0.0 Safari/537.36",
-                        "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8",
-                        "Accept-Language": "pl-PL,pl;q=0.9,en;q=0.5",
-                    }
-                )
+                continue
+            scrape_targets.append(item)
 
-                if page_response.status_code != 200:
-                    print(f"[S1] ⚠️ HTTP {page_response.status_code} from {url[:40]}")
-                    return None
+        if not scrape:
+            if hedge is not None and hedge.pending:
+                for _late_name, _late in hedge.collect_late():
+                    _merge_missing_serp_fields(serp_fields, _late, _late_name)
+                _claude_paa_fallback_if_missing(keyword, serp_metadata, serp_fields)
+            return {
+                "sources": [],
+                "scrape_targets": scrape_targets,
+                "paa": serp_fields["paa"],
+                "featured_snippet": serp_fields["featured_snippet"],
+                "ai_overview": serp_fields["ai_overview"],
+                "related_searches": serp_fields["related_searches"],
+                "refinement_chips": refinement_chips,
+                "serp_titles": serp_titles,
+                "serp_snippets": serp_snippets
+            }
 
-                # v52.4: Smart encoding — requests domyślnie używa ISO-8859-1 dla text/html
-                # bez deklaracji charset w nagłówkach, co powoduje pojÄciem zamiast pojęciem.
-                content_type = page_response.headers.get('Content-Type', '')
-                if 'charset=' in content_type.lower():
-                    raw_html = page_response.text  # Zaufaj zadeklarowanemu charset
-                else:
-                    try:
-                        raw_html = page_response.content.decode('utf-8')
-                    except UnicodeDecodeError:
-                        try:
-                            raw_html = page_response.content.decode('windows-1250')
-                        except UnicodeDecodeError:
-                            raw_html = page_response.content.decode('utf-8', errors='replace')
-
-                # v56.2: Wyciągnij H2 z PEŁNEGO HTML (przed truncacją)
-                h2_tags = re.findall(r'<h2[^>]*>(.*?)</h2>', raw_html, re.IGNORECASE | re.DOTALL)
-                h2_clean = [re.sub(r'<[^>]+>', '', h).strip() for h in h2_tags]
-                h2_clean = [h for h in h2_clean if h and len(h) < 200 and not re.search(r'[{};]|webkit|moz-|flex-|align-items', h, re.IGNORECASE)]
-
-                # v56.2: Strip boilerplate BEFORE truncation — ensures trafilatura
-                # gets meaningful HTML, not 60K of <script>/<style> from <head>
-                stripped_html = raw_html
-                if len(stripped_html) > MAX_CONTENT_SIZE * 2:
-                    print(f"[S1] ⚠️ Content too large ({len(raw_html)} chars), truncating: {url[:40]}")
-                    # Strip heavy non-content tags first
-                    stripped_html = re.sub(r'<script[^>]*>.*?</script>', '', stripped_html, flags=re.DOTALL | re.IGNORECASE)
-                    stripped_html = re.sub(r'<style[^>]*>.*?</style>', '', stripped_html, flags=re.DOTALL | re.IGNORECASE)
-                    stripped_html = re.sub(r'<svg[^>]*>.*?</svg>', '', stripped_html, flags=re.DOTALL | re.IGNORECASE)
-                    stripped_html = re.sub(r'<noscript[^>]*>.*?</noscript>', '', stripped_html, flags=re.DOTALL | re.IGNORECASE)
-                    stripped_html = re.sub(r'<!--.*?-->', '', stripped_html, flags=re.DOTALL)
-                    # Now truncate the cleaned HTML
-                    stripped_html = stripped_html[:MAX_CONTENT_SIZE * 3]
-
-                # Ekstrakcja treści — trafilatura lub regex fallback
-                content = None
-                if TRAFILATURA_AVAILABLE:
-                    try:
-                        content = trafilatura.extract(
-                            stripped_html,
-                            include_comments=False,
-                            include_tables=True,
-                            no_fallback=False,
-                            favor_precision=True
-                        )
-                    except Exception as e:
-                        print(f"[S1] ⚠️ trafilatura failed for {url[:40]}: {e}")
-                        content = None
-
-                # Fallback: regex — strip remaining boilerplate
-                if not content:
-                    content = stripped_html
-                    content = re.sub(r'<script[^>]*>.*?</script>', '', content, flags=re.DOTALL | re.IGNORECASE)
-                    content = re.sub(r'<style[^>]*>.*?</style>', '', content, flags=re.DOTALL | re.IGNORECASE)
-                    content = re.sub(r'<nav[^>]*>.*?</nav>', '', content, flags=re.DOTALL | re.IGNORECASE)
-                    content = re.sub(r'<footer[^>]*>.*?</footer>', '', content, flags=re.DOTALL | re.IGNORECASE)
-                    content = re.sub(r'<header[^>]*>.*?</header>', '', content, flags=re.DOTALL | re.IGNORECASE)
-                    content = re.sub(r'<aside[^>]*>.*?</aside>', '', content, flags=re.DOTALL | re.IGNORECASE)
-                    # v56.2: Remove inline CSS/JS artifacts
-                    content = re.sub(r'\{[^}]{0,500}\}', ' ', content)
-                    content = re.sub(r'<[^>]+>', ' ', content)
-                    content = re.sub(r'\s+', ' ', content).strip()
-
-                content = content[:MAX_CONTENT_SIZE]
-                elapsed = _time.time() - t0
-
-                if len(content) > 500:
-                    word_count = len(content.split())
-                    print(f"[S1] ✅ Scraped {len(content)} chars ({word_count} words), {len(h2_clean)} H2 from {url[:40]} [{elapsed:.1f}s]")
-                    return {
-                        "url": url,
-                        "title": title,
-                        "content": content,
-                        "h2_structure": h2_clean[:15],
-                        "word_count": word_count
-                    }
-                else:
-                    print(f"[S1] ⚠️ Too short content from {url[:40]}")
-                    return None
-
-            except requests.exceptions.Timeout:
-                print(f"[S1] ⏱️ Timeout for {url[:40]} (>{SCRAPE_TIMEOUT}s)")
-                return None
-            except Exception as e:
-                print(f"[S1] ⚠️ Scrape error for {url[:40]}: {e}")
-                return None
-
-        # Launch all scrapes in parallel (max 6 threads)
-        scrape_targets = [r for r in organic_results[:num_results] if r.get("link")]
         t_start = _time.time()
-        print(f"[S1] 🚀 Parallel scraping {len(scrape_targets)} pages...")
+        print(f"[S1] 🚀 Parallel scraping {len(scrape_targets)} pages"
+              f"{' (async)' if ASYNC_SCRAPER_ENABLED else ''}...")
 
         sources = []
         total_content_size = 0
-        with ThreadPoolExecutor(max_workers=6) as pool:
-            futures = {pool.submit(_scrape_one, item): item for item in scrape_targets}
-            for future in as_completed(futures):
-                result = future.result()
-                if result and total_content_size < MAX_TOTAL_CONTENT:
-                    sources.append(result)
-                    total_content_size += len(result["content"])
+        if progress is not None:
+            progress("scrape", pages=len(scrape_targets), scraped=0)
+        for result in _scrape_pages(scrape_targets):
+            if result and total_content_size < MAX_TOTAL_CONTENT:
+                sources.append(result)
+                total_content_size += len(result["content"])
+                if on_source is not None:
+                    on_source(result)
+                if progress is not None:
+                    progress("scrape", scraped=len(sources))
 
         t_elapsed = _time.time() - t_start
+        observe("scrape_total", t_elapsed, detail=f"{len(sources)}/{len(scrape_targets)} pages")
         print(f"[S1] ✅ Parallel scrape done: {len(sources)} sources ({total_content_size} chars) in {t_elapsed:.1f}s")
 
+        # v56.4: Spóźniony provider (hedged) uzupełnia pola — scraping już nie czekał
+        if hedge is not None and hedge.pending:
+            for _late_name, _late in hedge.collect_late():
+                _merge_missing_serp_fields(serp_fields, _late, _late_name)
+            _claude_paa_fallback_if_missing(keyword, serp_metadata, serp_fields)
 
         return {
             "sources": sources,
-            "paa": paa_questions,
-            "featured_snippet": featured_snippet,
-            "ai_overview": ai_overview,  # v27.0
-            "related_searches": related_searches,
+            "paa": serp_fields["paa"],
+            "featured_snippet": serp_fields["featured_snippet"],
+            "ai_overview": serp_fields["ai_overview"],  # v27.0
+            "related_searches": serp_fields["related_searches"],
             "refinement_chips": refinement_chips,  # v60: Google search refinement chips
             "serp_titles": serp_titles,
             "serp_snippets": serp_snippets
@@ -1009,10 +1218,122 @@ def fetch_serp_sources(keyword, num_results=10):
 # ======================================================
 # 🔍 Endpoint: N-gram + Semantic + SERP Analysis + Firestore Save
 # ======================================================
+def _lemmatize_tokens(doc):
+    """Zwraca dwie listy: tokeny raw i tokeny-lematy (wyrównane, tylko alfa)."""
+    raw_toks, lem_toks = [], []
+    for t in doc:
+        if t.is_alpha:
+            raw_toks.append(t.text.lower())
+            lem_toks.append(t.lemma_.lower())
+    return raw_toks, lem_toks
+
+
+# ⭐ v22.3: Reduced from 10 to 8
+S1_SERP_RESULTS = 8
+
+
+def _no_progress(stage, **info):
+    pass
+
+
+def _async_requested(data):
+    """
+    v56.4: Tryb job — "async" z body albo ?async=1. Jawne parsowanie jak dla
+    "chain": false / "false" / 0 / "0" / "no" / null → synchronicznie
+    (bool("false") byłoby True).
+    """
+    if request.args.get("async") == "1":
+        return True
+    return str(data.get("async", False)).strip().lower() not in ("false", "0", "no", "off", "none", "")
+
+
 @app.route("/api/ngram_entity_analysis", methods=["POST"])
 def perform_ngram_analysis():
+    # v56.4: SERP z serp_cache (domyślnie włączony, TTL 6 h) — "serp_cache_ttl": 0
+    # w body wymusza świeże dane providera (także w /bulk)
     data = request.get_json(force=True)
-    
+    if request.args.get("timings") == "1":
+        data["timings"] = True
+
+    # v56.4: Tryb job — od razu 202 + job_id, analiza w tle (s1_jobs.py)
+    if _async_requested(data):
+        label = data.get("main_keyword") or data.get("keyword", "")
+        try:
+            job = submit_job(run_s1_analysis, data, label=label)
+        except JobQueueFull as e:
+            return jsonify({"error": "S1 job queue full", "details": str(e)}), 429
+        return jsonify({
+            "job_id": job["job_id"],
+            "state": job["state"],
+            "queue_position": job["queue_position"],
+            "poll_url": f"/api/jobs/{job['job_id']}",
+        }), 202
+
+    # v56.4: Streaming sekcji (NDJSON / SSE) w miarę ich ukończenia (s1_stream.py)
+    fmt = stream_format(data.get("stream", request.args.get("stream")))
+    if fmt:
+        sections = _timed_s1_sections(data, collect=False)
+        return Response(stream_with_context(stream_sections(sections, fmt)),
+                        mimetype=STREAM_FORMATS[fmt], headers=STREAM_HEADERS)
+
+    payload, status = run_s1_analysis(data)
+    return jsonify(payload), status
+
+
+def run_s1_analysis(data, progress=None, prefetched=None):
+    """
+    Pełna analiza S1 (SERP → scraping → n-gramy → encje → luki) dla danych
+    requestu. Zwraca (payload, http_status) — wspólne dla trybu sync i jobów.
+    v56.4: progress(stage, **info) raportuje etapy joba (s1_jobs.JobProgress).
+    v56.4: prefetched = {"serp_result", "doc_store", "source_tokens"} — SERP,
+    scraping i parse zrobione wcześniej, wspólnie dla klastra (bulk S1).
+    """
+    timings_block = {}
+    for section, value in _timed_s1_sections(data, progress=progress, prefetched=prefetched):
+        if section == "_timings":
+            timings_block = value
+        elif section in ("error", "done"):
+            payload, status = value
+            payload.update(timings_block)
+            return payload, status
+
+
+def _timed_s1_sections(data, **kwargs):
+    """
+    v56.4: iter_s1_sections z kolektorem czasów etapów (metrics.py) — s1_total
+    do /metrics; sekcja "_timings" przed końcową, gdy request jej zażądał
+    ("timings": true / ?timings=1).
+    """
+    final = None
+    report = None
+    with request_timings() as timings:
+        with timed("s1_total", mode="bulk" if kwargs.get("prefetched") else "single"):
+            for section, value in iter_s1_sections(data, **kwargs):
+                if section in ("error", "done"):
+                    final = (section, value)
+                    break
+                yield section, value
+        if data.get("timings"):
+            report = timings.report()
+    if final is None:
+        return
+    if report is not None:
+        yield "_timings", {"_timings": report}
+    yield final
+
+
+def iter_s1_sections(data, progress=None, prefetched=None, collect=True):
+    """
+    v56.4: Analiza S1 jako generator sekcji (nazwa, dane) w kolejności ich
+    ukończenia: serp → length_analysis → ngrams → semantic_keyphrases →
+    entity_seo → causal_triplets → content_gaps → summary; na końcu
+    ("done", (payload, 200)) albo ("error", (payload, status)).
+    Klucze danych sekcji = klucze top-level pełnej odpowiedzi.
+    collect=False (streaming bez project_id) — sekcje nie są składane
+    w pełny payload; "done" niesie wtedy pusty dict.
+    """
+    progress = progress or _no_progress
+
     # v27.0: Akceptuj zarówno "keyword" jak i "main_keyword"
     main_keyword = data.get("main_keyword") or data.get("keyword", "")
     
@@ -1030,13 +1351,33 @@ def perform_ngram_analysis():
     serp_snippets = []
     h2_patterns = []
 
+    # v56.3: Jeden parse spaCy per źródło — DocStore współdzielony z Entity SEO
+    nlp = get_nlp()
+    doc_store = prefetched["doc_store"] if prefetched else DocStore(nlp)
+    # v56.4: Źródła ze scrapingu parsowane w trakcie pobierania (source_pipeline.py)
+    source_pipeline = None
+    source_tokens = prefetched["source_tokens"] if prefetched else {}
+
     # ⭐ AUTO-FETCH: Jeśli brak sources, pobierz PEŁNE dane z SerpAPI
     if not sources:
         if not main_keyword:
-            return jsonify({"error": "Brak main_keyword do analizy"}), 400
+            yield "error", ({"error": "Brak main_keyword do analizy"}, 400)
+            return
 
-        print(f"[S1] 🔄 No sources provided - auto-fetching FULL SERP data...")
-        serp_result = fetch_serp_sources(main_keyword, num_results=8)  # ⭐ v22.3: Reduced from 10 to 8
+        if prefetched:
+            serp_result = prefetched["serp_result"]
+        else:
+            print(f"[S1] 🔄 No sources provided - auto-fetching FULL SERP data...")
+            progress("serp")
+            if SOURCE_PIPELINE_ENABLED:
+                source_pipeline = SourcePipeline(doc_store, partial=_lemmatize_tokens)
+            try:
+                serp_result = fetch_serp_sources(main_keyword, num_results=S1_SERP_RESULTS,
+                                                 serp_cache_ttl=data.get("serp_cache_ttl"),
+                                                 on_source=source_pipeline.submit if source_pipeline else None,
+                                                 progress=progress)
+            finally:
+                source_tokens = source_pipeline.finish() if source_pipeline else {}
 
         # Wyciągnij wszystkie dane z rezultatu
         sources = serp_result.get("sources", [])
@@ -1049,64 +1390,30 @@ def perform_ngram_analysis():
         serp_snippets = serp_result.get("serp_snippets", [])
 
         if not sources:
-            return jsonify({
+            yield "error", ({
                 "error": f"Nie udało się pobrać źródeł z SERP ({SERP_PROVIDER})",
                 "hint": "Sprawdź konfigurację SERP providera (DATAFORSEO_LOGIN/PASSWORD lub SERPAPI_KEY)",
                 "main_keyword": main_keyword,
                 "paa": paa_questions,
                 "related_searches": related_searches
-            }), 400
+            }, 400)
+            return
 
-    print(f"[S1] 🔍 Analiza n-gramów dla: {main_keyword}")
+    # v56.4: Sekcje składane w pełny payload tylko, gdy ktoś go potrzebuje
+    # (tryb sync / job / zapis do Firestore); streaming zwalnia je po wysłaniu
+    collect = collect or bool(project_id)
+    response_payload = {}
 
-    # ═══════════════════════════════════════════════════════════════════════════
-    # 1️⃣ NLP Statystyczne (N-gramy)
-    # v52.0: LEMMA-BASED N-GRAMS + HIGH-SIGNAL SOURCES
-    #
-    # Problem który rozwiązujemy:
-    # A) FLEKSJA: "wpływem alkoholu", "wpływu alkoholu", "wpływ alkoholu" to ta
-    #    sama fraza - Surfer liczy je razem, Brajn liczył jako 3 osobne n-gramy.
-    #    FIX: indeksujemy po LEMATACH (canonical form), zachowujemy najczęstszą
-    #    formę powierzchniową do wyświetlania.
-    #
-    # B) BRAKUJĄCE FRAZY: "warunkowe umorzenie" pojawia się w related_searches /
-    #    PAA / snippetach ale rzadko w treści stron (bo to krótkie strony).
-    #    FIX: PAA + related_searches + snippety = "high-signal source" - niższy
-    #    próg freq dla tych fraz (wystarczy 1x, nie 2x).
-    # ═══════════════════════════════════════════════════════════════════════════
-    ngram_presence = defaultdict(set)
-    ngram_freqs = Counter()
-    ngram_per_source = defaultdict(lambda: Counter())
-    lemma_surface_freq = defaultdict(Counter)  # lemma_key → {surface_form: count}
-    all_text_content = []
-
-    def _lemmatize_tokens(text_content, limit=50000):
-        """Zwraca dwie listy: tokeny raw i tokeny-lematy (wyrównane, tylko alfa)."""
-        doc = nlp(text_content[:limit])
-        raw_toks, lem_toks = [], []
-        for t in doc:
-            if t.is_alpha:
-                raw_toks.append(t.text.lower())
-                lem_toks.append(t.lemma_.lower())
-        return raw_toks, lem_toks
-
-    def _build_ngrams_for_source(raw_toks, lem_toks, src_label, src_idx):
-        """Buduje n-gramy używając LEMATÓW jako klucza, surface form do wyświetlania."""
-        for n in range(2, 5):
-            for i in range(len(lem_toks) - n + 1):
-                lemma_key = " ".join(lem_toks[i:i + n])
-                surface_form = " ".join(raw_toks[i:i + n])
-                ngram_freqs[lemma_key] += 1
-                ngram_presence[lemma_key].add(src_label)
-                ngram_per_source[lemma_key][src_idx] += 1
-                lemma_surface_freq[lemma_key][surface_form] += 1
+    def section(name, values):
+        if collect:
+            response_payload.update(values)
+        return name, values
 
-    # ── Główne źródła: scraped pages ──────────────────────────────────────────
+    # ⭐ H2 konkurencji z CZĘSTOŚCIĄ (ile stron używa danego wzorca)
+    # v56.4: Liczone przed n-gramami — dane SERP idą do klienta przed NLP
     for src_idx, src in enumerate(sources):
-        content = (src.get("content", "") or "").lower()
-        if not content.strip():
+        if not (src.get("content", "") or "").strip():
             continue
-        all_text_content.append(src.get("content", ""))
         src_h2 = src.get("h2_structure", [])
         if src_h2:
             # Track which source each H2 comes from for frequency counting
@@ -1116,107 +1423,7 @@ def perform_ngram_analysis():
                 elif isinstance(h2_item, dict):
                     h2_item["source_idx"] = src_idx
                     h2_patterns.append(h2_item)
-        raw_toks, lem_toks = _lemmatize_tokens(content)
-        _build_ngrams_for_source(raw_toks, lem_toks, src.get("url", f"src_{src_idx}"), src_idx)
 
-    # ── v52.0: High-signal sources: PAA + related searches + SERP snippets ────
-    # Google sam selekcjonuje te frazy - zawierają ważne słowa kluczowe których
-    # brak w krótkich stronach SERP (np. "warunkowe umorzenie", "dożywotni zakaz").
-    HIGH_SIGNAL_SRC_IDX = len(sources)
-    HIGH_SIGNAL_LABEL = "__google_signals__"
-    high_signal_texts = []
-
-    for paa_item in paa_questions:
-        q = paa_item.get("question", "") if isinstance(paa_item, dict) else str(paa_item)
-        if q:
-            high_signal_texts.append(q)
-    for rs in related_searches:
-        q = rs if isinstance(rs, str) else (rs.get("query", "") or rs.get("text", ""))
-        if q:
-            high_signal_texts.append(q)
-    for title in serp_titles:
-        if title:
-            high_signal_texts.append(title)
-    for snippet in serp_snippets:
-        if snippet:
-            high_signal_texts.append(snippet)
-
-    if high_signal_texts:
-        combined_signal = " . ".join(high_signal_texts)
-        raw_hs, lem_hs = _lemmatize_tokens(combined_signal, limit=20000)
-        _build_ngrams_for_source(raw_hs, lem_hs, HIGH_SIGNAL_LABEL, HIGH_SIGNAL_SRC_IDX)
-        print(f"[S1] 🎯 High-signal: {len(high_signal_texts)} tekstów (PAA+related+snippets) → dodane do n-gramów")
-
-    # ── Resolve best surface form per lemma-key ────────────────────────────────
-    lemma_to_surface = {}
-    for lemma_key, surface_counts in lemma_surface_freq.items():
-        lemma_to_surface[lemma_key] = surface_counts.most_common(1)[0][0]
-
-    max_freq = max(ngram_freqs.values()) if ngram_freqs else 1
-    num_sources = len(sources)
-    results = []
-
-    for ngram, freq in ngram_freqs.items():
-        # v52.0: Oddzielny próg dla high-signal vs stron
-        page_presence = {s for s in ngram_presence[ngram] if s != HIGH_SIGNAL_LABEL}
-        page_freq = sum(
-            cnt for idx, cnt in ngram_per_source[ngram].items()
-            if idx != HIGH_SIGNAL_SRC_IDX
-        )
-        is_high_signal_only = (HIGH_SIGNAL_LABEL in ngram_presence[ngram]
-                               and not page_presence)
-        # Stary filtr: min 2x w stronach; nowy: high-signal przechodzi przy freq>=1
-        if page_freq < 2 and not is_high_signal_only:
-            continue
-        # v52.0: Wyświetlamy najczęstszą formę powierzchniową, nie lemat
-        display_ngram = lemma_to_surface.get(ngram, ngram)
-
-        page_presence_set = {s for s in ngram_presence[ngram] if s != HIGH_SIGNAL_LABEL}
-        freq_norm = page_freq / max_freq if max_freq else 0
-        site_score = len(page_presence_set) / num_sources if num_sources else 0
-        weight = round(freq_norm * 0.5 + site_score * 0.5, 4)
-
-        # Boost: fraza zawiera główne słowo kluczowe
-        if main_keyword and main_keyword.lower() in display_ngram:
-            weight += 0.1
-        # Boost: fraza pochodzi z high-signal source (PAA/related/snippet)
-        if HIGH_SIGNAL_LABEL in ngram_presence[ngram]:
-            weight += 0.08
-
-        # v51/v52: Per-source frequency stats (Surfer-style ranges) — tylko prawdziwe strony
-        per_src = ngram_per_source.get(ngram, {})
-        all_counts = [per_src.get(i, 0) for i in range(num_sources)]
-        non_zero = sorted([c for c in all_counts if c > 0])
-
-        if non_zero:
-            freq_min = non_zero[0]
-            freq_max = non_zero[-1]
-            mid = len(non_zero) // 2
-            freq_median = non_zero[mid] if len(non_zero) % 2 == 1 else (non_zero[mid-1] + non_zero[mid]) // 2
-        else:
-            freq_min = freq_median = freq_max = 0
-
-        results.append({
-            "ngram": display_ngram,          # najczęstsza forma powierzchniowa
-            "ngram_lemma": ngram,            # lemat (do dedup w keyword_counter)
-            "freq": page_freq,               # tylko z prawdziwych stron
-            "freq_total": freq,              # łącznie z high-signal
-            "is_high_signal": is_high_signal_only,
-            "weight": min(1.0, weight),
-            "site_distribution": f"{len(page_presence_set)}/{num_sources}",
-            "freq_per_source": all_counts,
-            "freq_min": freq_min,
-            "freq_median": freq_median,
-            "freq_max": freq_max
-        })
-
-    results = sorted(results, key=lambda x: x["weight"], reverse=True)[:top_n]
-
-    # 2️⃣ Semantyka (TF-IDF — v56.0, replaces Gemini Flash)
-    full_text_sample = " ".join(all_text_content)[:15000]
-    semantic_keyphrases = extract_semantic_keyphrases_tfidf(full_text_sample)
-
-    # ⭐ H2 konkurencji z CZĘSTOŚCIĄ (ile stron używa danego wzorca)
     # Liczymy per source żeby H2 z 1 strony nie zdominowało przez repetycje
     h2_source_counts = {}   # h2_text → set of source indices
     for item in h2_patterns:
@@ -1266,6 +1473,15 @@ def perform_ngram_analysis():
             for i, src in enumerate(sources)
         ]
     }
+    yield section("serp", {
+        "main_keyword": main_keyword,
+        # ⭐ Pełna analiza SERP (surowe dane)
+        "serp_analysis": serp_analysis_data,
+        # v53.0: Top-level PAA alias (ZAWSZE obecny, wskazuje na serp_analysis.paa_questions)
+        "paa": paa_questions,
+        # v53.0: Top-level H2 patterns alias
+        "competitor_h2_patterns": unique_h2_patterns,
+    })
 
     # v53.0: Analiza długości — recommended_length na podstawie competitors
     word_counts = [src.get("word_count", 0) for src in sources if src.get("word_count", 0) > 0]
@@ -1288,35 +1504,207 @@ def perform_ngram_analysis():
         "max_competitor": max(word_counts) if word_counts else 0,
         "competitors_count": len(word_counts),
     }
+    # v53.0: Analiza długości (recommended_length + dane kompetytorów)
+    yield section("length_analysis", {
+        "length_analysis": length_analysis,
+        "recommended_length": recommended_length,
+    })
+
+    progress("ngrams", sources=len(sources))
+    print(f"[S1] 🔍 Analiza n-gramów dla: {main_keyword}")
+
+    # ═══════════════════════════════════════════════════════════════════════════
+    # 1️⃣ NLP Statystyczne (N-gramy)
+    # v52.0: LEMMA-BASED N-GRAMS + HIGH-SIGNAL SOURCES
+    #
+    # Problem który rozwiązujemy:
+    # A) FLEKSJA: "wpływem alkoholu", "wpływu alkoholu", "wpływ alkoholu" to ta
+    #    sama fraza - Surfer liczy je razem, Brajn liczył jako 3 osobne n-gramy.
+    #    FIX: indeksujemy po LEMATACH (canonical form), zachowujemy najczęstszą
+    #    formę powierzchniową do wyświetlania.
+    #
+    # B) BRAKUJĄCE FRAZY: "warunkowe umorzenie" pojawia się w related_searches /
+    #    PAA / snippetach ale rzadko w treści stron (bo to krótkie strony).
+    #    FIX: PAA + related_searches + snippety = "high-signal source" - niższy
+    #    próg freq dla tych fraz (wystarczy 1x, nie 2x).
+    # ═══════════════════════════════════════════════════════════════════════════
+    # v56.4: NgramEngine — ID lematów + spakowane n-gramy w NumPy zamiast
+    # czterech słowników Counterów (ngram_freqs/presence/per_source/surface)
+    ngram_engine = NgramEngine()
+    source_labels = [src.get("url", f"src_{src_idx}") for src_idx, src in enumerate(sources)]
+    all_text_content = []
+
+    # Źródła już sparsowane przez source_pipeline są w DocStore — tu tylko reszta
+    doc_store.parse([src.get("content", "") for src in sources if (src.get("content", "") or "").strip()])
+    t_ngrams = time.perf_counter()
+
+    # ── Główne źródła: scraped pages ──────────────────────────────────────────
+    for src_idx, src in enumerate(sources):
+        content = src.get("content", "") or ""
+        if not content.strip():
+            continue
+        all_text_content.append(src.get("content", ""))
+        # Scalanie w kolejności źródeł (nie ukończenia) — wynik jak bez pipeline'u
+        tokens = source_tokens.get(content)
+        raw_toks, lem_toks = tokens or _lemmatize_tokens(doc_store.get(content))
+        ngram_engine.add(raw_toks, lem_toks, src_idx)
+
+    # ── v52.0: High-signal sources: PAA + related searches + SERP snippets ────
+    # Google sam selekcjonuje te frazy - zawierają ważne słowa kluczowe których
+    # brak w krótkich stronach SERP (np. "warunkowe umorzenie", "dożywotni zakaz").
+    HIGH_SIGNAL_SRC_IDX = len(sources)
+    high_signal_texts = []
+
+    for paa_item in paa_questions:
+        q = paa_item.get("question", "") if isinstance(paa_item, dict) else str(paa_item)
+        if q:
+            high_signal_texts.append(q)
+    for rs in related_searches:
+        q = rs if isinstance(rs, str) else (rs.get("query", "") or rs.get("text", ""))
+        if q:
+            high_signal_texts.append(q)
+    for title in serp_titles:
+        if title:
+            high_signal_texts.append(title)
+    for snippet in serp_snippets:
+        if snippet:
+            high_signal_texts.append(snippet)
+
+    if high_signal_texts:
+        combined_signal = " . ".join(high_signal_texts)
+        raw_hs, lem_hs = _lemmatize_tokens(doc_store.get(combined_signal, limit=20000, clean=False))
+        # Tekst jednorazowy (per keyword) — zwalniany od razu, bo w bulk S1
+        # doc_store żyje przez cały klaster i BulkCorpus go nie liczy
+        doc_store.release([combined_signal], limit=20000, clean=False)
+        ngram_engine.add(raw_hs, lem_hs, HIGH_SIGNAL_SRC_IDX)
+        print(f"[S1] 🎯 High-signal: {len(high_signal_texts)} tekstów (PAA+related+snippets) → dodane do n-gramów")
+
+    num_sources = len(sources)
+    # ostatni wiersz = high-signal; v56.4: singletony (page_freq < 2, brak w
+    # high-signal) odrzucane w przejściu 1 — i tak nie przeszłyby filtra niżej
+    table = ngram_engine.build(num_sources + 1, page_rows=num_sources, min_page_freq=2)
+    print(f"[S1] 🔢 N-gramy: {table.size} kandydatów, {table.pruned} singletonów odrzuconych")
+
+    # ── Statystyki wszystkich n-gramów naraz (kolumny macierzy CSR) ───────────
+    page_freqs = table.row_sums(num_sources)
+    has_high_signal = table.row_mask(HIGH_SIGNAL_SRC_IDX)
+    page_presence = table.presence(num_sources, source_labels)
+    # Odrzucone klucze mają freq_total <= 1, więc max liczony z ocalałych (min. 1)
+    max_freq = max(1, int(table.totals.max())) if table.size else 1
+
+    # v52.0: Oddzielny próg dla high-signal vs stron
+    # Stary filtr: min 2x w stronach; nowy: high-signal przechodzi przy freq>=1
+    is_high_signal_only = has_high_signal & (page_presence == 0)
+    candidates = np.flatnonzero((page_freqs >= 2) | is_high_signal_only)
+
+    # Waga: 50% częstość (względem max_freq) + 50% pokrycie stron
+    freq_norm = page_freqs[candidates] / max_freq if max_freq else np.zeros(len(candidates))
+    site_score = page_presence[candidates] / num_sources if num_sources else np.zeros(len(candidates))
+    base_weight = round4(freq_norm * 0.5 + site_score * 0.5)
+    # Boost: fraza pochodzi z high-signal source (PAA/related/snippet)
+    hs_boost = np.where(has_high_signal[candidates], 0.08, 0.0)
+
+    # ── Przycinanie przed budową stringów ─────────────────────────────────────
+    # Boost za main_keyword (+0.1) zależy od formy powierzchniowej, więc waga
+    # kandydata leży w [dolna, górna]. Kandydat, którego GÓRNA granica jest
+    # poniżej top_n-tej DOLNEJ granicy, nie może wejść do top_n.
+    if 0 < top_n < len(candidates):
+        lower = np.minimum(1.0, base_weight + hs_boost)
+        upper = np.minimum(1.0, (base_weight + (0.1 if main_keyword else 0.0)) + hs_boost)
+        threshold = np.partition(lower, len(lower) - top_n)[len(lower) - top_n]
+        keep = upper >= threshold
+        candidates, base_weight, hs_boost = candidates[keep], base_weight[keep], hs_boost[keep]
+
+    # v52.0: Wyświetlamy najczęstszą formę powierzchniową, nie lemat
+    display_forms = table.surface_strings(candidates)
+    # Boost: fraza zawiera główne słowo kluczowe
+    main_kw_lower = main_keyword.lower() if main_keyword else ""
+    kw_boost = np.array([0.1 if main_kw_lower and main_kw_lower in d else 0.0 for d in display_forms])
+    weights = np.minimum(1.0, (base_weight + kw_boost) + hs_boost)
+
+    # ── Top-K: argpartition + sort tylko zwycięzców ───────────────────────────
+    # Remisy: kolejność pierwszego wystąpienia (kandydaci są w tej kolejności)
+    selected = np.arange(len(candidates))
+    if 0 < top_n < len(candidates):
+        kth = np.argpartition(-weights, top_n - 1)[top_n - 1]
+        selected = np.flatnonzero(weights >= weights[kth])
+    selected = selected[np.lexsort((selected, -weights[selected]))][:top_n]
+
+    top_keys = candidates[selected]
+    lemma_keys = table.lemma_strings(top_keys)
+    # v51/v52: Per-source frequency stats (Surfer-style ranges) — tylko prawdziwe strony
+    per_source = table.dense_columns(top_keys, num_sources)
+    freq_min, freq_median, freq_max = table.column_stats(top_keys, num_sources)
+
+    results = []
+    for i, (k, sel) in enumerate(zip(top_keys.tolist(), selected.tolist())):
+        results.append({
+            "ngram": display_forms[sel],     # najczęstsza forma powierzchniowa
+            "ngram_lemma": lemma_keys[i],    # lemat (do dedup w keyword_counter)
+            "freq": int(page_freqs[k]),      # tylko z prawdziwych stron
+            "freq_total": int(table.totals[k]),  # łącznie z high-signal
+            "is_high_signal": bool(is_high_signal_only[k]),
+            "weight": float(weights[sel]),
+            "site_distribution": f"{int(page_presence[k])}/{num_sources}",
+            "freq_per_source": per_source[i].tolist(),
+            "freq_min": int(freq_min[i]),
+            "freq_median": int(freq_median[i]),
+            "freq_max": int(freq_max[i])
+        })
+    observe("ngram_build", time.perf_counter() - t_ngrams, detail=f"{table.size} candidates")
+
+    yield section("ngrams", {"ngrams": results})
+
+    # 2️⃣ Semantyka (TF-IDF — v56.0, replaces Gemini Flash)
+    full_text_sample = " ".join(all_text_content)[:15000]
+    with timed("tfidf"):
+        semantic_keyphrases = extract_semantic_keyphrases_tfidf(full_text_sample)
+    yield section("semantic_keyphrases", {
+        "semantic_keyphrases": semantic_keyphrases,
+        # ✅ NOWE (MINIMALNA ZMIANA): zwracamy próbkę pełnych treści konkurencji,
+        # aby Master API mogło liczyć semantic coverage na realnym korpusie.
+        # Zachowujemy kompatybilność wsteczną przez alias "serp_content".
+        # v56.4: Alias tylko w pełnym payloadzie — streaming nie wysyła tej treści dwa razy
+        "full_text_sample": full_text_sample,
+    })
+    if collect:
+        response_payload["serp_content"] = full_text_sample
 
     # 3️⃣ Content Hints - WYŁĄCZONE v28.0 (duplikuje dane z serp_analysis)
     # content_hints = generate_content_hints(serp_analysis_data, main_keyword)
 
     # 4️⃣ 🆕 Entity SEO Analysis (v28.0)
     entity_seo_data = None
+    progress("entities")
     if ENTITY_SEO_ENABLED and sources:
         try:
             print(f"[S1] 🧠 Running Entity SEO analysis...")
-            entity_seo_data = perform_entity_seo_analysis(
-                nlp=nlp,
-                sources=sources,
-                main_keyword=main_keyword,
-                h2_patterns=unique_h2_patterns
-            )
+            with timed("entity_seo"):
+                entity_seo_data = perform_entity_seo_analysis(
+                    nlp=nlp,
+                    sources=sources,
+                    main_keyword=main_keyword,
+                    h2_patterns=unique_h2_patterns,
+                    doc_store=doc_store,
+                )
             print(f"[S1] ✅ Entity SEO: {entity_seo_data.get('entity_seo_summary', {}).get('total_entities', 0)} entities found")
         except Exception as e:
             print(f"[S1] ⚠️ Entity SEO error (non-critical): {e}")
             entity_seo_data = {"error": str(e), "status": "FAILED"}
+    # 🆕 Entity SEO (v28.0)
+    yield section("entity_seo", {"entity_seo": entity_seo_data})
 
     # 5️⃣ 🆕 Causal Triplet Extraction (v45.0)
     causal_data = None
+    progress("gaps")
     if CAUSAL_EXTRACTOR_ENABLED and sources:
         try:
             print(f"[S1] 🔗 Running Causal Triplet Extraction...")
-            causal_triplets = extract_causal_triplets(
-                texts=[s.get("content", "") for s in sources],
-                main_keyword=main_keyword
-            )
+            with timed("causal"):
+                causal_triplets = extract_causal_triplets(
+                    texts=[s.get("content", "") for s in sources],
+                    main_keyword=main_keyword
+                )
             # v53.0: Standaryzacja — chains zawierają cause/mechanism/effect,
             # singles zawierają cause/effect (bez mechanism)
             causal_chains = []
@@ -1349,6 +1737,8 @@ def perform_ngram_analysis():
         except Exception as e:
             print(f"[S1] ⚠️ Causal extraction error (non-critical): {e}")
             causal_data = {"error": str(e), "status": "FAILED"}
+    # 🆕 Causal Triplets (v45.0, v53.0: standaryzacja chains/singles)
+    yield section("causal_triplets", {"causal_triplets": causal_data})
 
     # 6️⃣ 🆕 Content Gap Analysis (v45.0)
     content_gaps_data = None
@@ -1360,13 +1750,14 @@ def perform_ngram_analysis():
                 p.get("text", "") if isinstance(p, dict) else str(p)
                 for p in unique_h2_patterns
             ]
-            raw_gaps = analyze_content_gaps(
-                competitor_texts=[s.get("content", "") for s in sources],
-                competitor_h2s=h2_texts,
-                paa_questions=paa_questions,
-                related_searches=related_searches,
-                main_keyword=main_keyword
-            )
+            with timed("gaps"):
+                raw_gaps = analyze_content_gaps(
+                    competitor_texts=[s.get("content", "") for s in sources],
+                    competitor_h2s=h2_texts,
+                    paa_questions=paa_questions,
+                    related_searches=related_searches,
+                    main_keyword=main_keyword
+                )
             # v53.0: Standaryzacja — dodaj flat string lists obok pełnych obiektów
             content_gaps_data = {
                 "total_gaps": raw_gaps.get("total_gaps", 0),
@@ -1390,41 +1781,13 @@ def perform_ngram_analysis():
             print(f"[S1] ⚠️ Gap Analysis error (non-critical): {e}")
             content_gaps_data = {"error": str(e), "status": "FAILED"}
 
+    # 🆕 Content Gaps (v45.0, v53.0: flat string lists + instruction)
+    yield section("content_gaps", {"content_gaps": content_gaps_data})
+
     # ⭐ PEŁNA ODPOWIEDŹ z wszystkimi danymi SERP
     # v53.0: Standaryzacja — ujednolicone pola, aliasy dla kompatybilności
-    response_payload = {
-        "main_keyword": main_keyword,
-        "ngrams": results,
-        "semantic_keyphrases": semantic_keyphrases,
-
-        # ✅ NOWE (MINIMALNA ZMIANA): zwracamy próbkę pełnych treści konkurencji,
-        # aby Master API mogło liczyć semantic coverage na realnym korpusie.
-        # Zachowujemy kompatybilność wsteczną przez alias "serp_content".
-        "full_text_sample": full_text_sample,
-        "serp_content": full_text_sample,
-
-        # ⭐ Pełna analiza SERP (surowe dane)
-        "serp_analysis": serp_analysis_data,
-
-        # v53.0: Top-level PAA alias (ZAWSZE obecny, wskazuje na serp_analysis.paa_questions)
-        "paa": paa_questions,
-
-        # v53.0: Analiza długości (recommended_length + dane kompetytorów)
-        "length_analysis": length_analysis,
-        "recommended_length": recommended_length,
-
-        # v53.0: Top-level H2 patterns alias
-        "competitor_h2_patterns": unique_h2_patterns,
-
-        # 🆕 Entity SEO (v28.0)
-        "entity_seo": entity_seo_data,
-
-        # 🆕 Causal Triplets (v45.0, v53.0: standaryzacja chains/singles)
-        "causal_triplets": causal_data,
-
-        # 🆕 Content Gaps (v45.0, v53.0: flat string lists + instruction)
-        "content_gaps": content_gaps_data,
-
+    # v56.4: Składana z sekcji powyżej (section → response_payload)
+    yield section("summary", {
         "summary": {
             "total_sources": len(sources),
             "sources_auto_fetched": not bool(data.get("sources", [])),
@@ -1441,10 +1804,13 @@ def perform_ngram_analysis():
             "engine": "v56.2",
             "lsi_candidates": len(semantic_keyphrases),
         }
-    }
+    })
 
     # 3️⃣ Firestore Save (optional)
     if project_id:
+        progress("firestore")
+        firestore_status = {}
+        t_firestore = time.perf_counter()
         try:
             db = firestore.client()
             doc_ref = db.collection("seo_projects").document(project_id)
@@ -1459,16 +1825,18 @@ def perform_ngram_analysis():
                     "avg_competitor_length": avg_len,
                     "updated_at": firestore.SERVER_TIMESTAMP
                 })
-                response_payload["saved_to_firestore"] = True
+                firestore_status["saved_to_firestore"] = True
                 print(f"[S1] ✅ Wyniki n-gramów zapisane do Firestore → {project_id}")
             else:
-                response_payload["saved_to_firestore"] = False
+                firestore_status["saved_to_firestore"] = False
                 print(f"[S1] ⚠️ Nie znaleziono projektu {project_id}")
         except Exception as e:
             print(f"[S1] ❌ Firestore error: {e}")
-            response_payload["firestore_error"] = str(e)
+            firestore_status["firestore_error"] = str(e)
+        observe("firestore", time.perf_counter() - t_firestore, detail=project_id)
+        yield section("firestore", firestore_status)
 
-    return jsonify(response_payload)
+    yield "done", (response_payload, 200)
 
 # ======================================================
 # v53.0: /api/s1_analysis — Alias for /api/ngram_entity_analysis
@@ -1479,6 +1847,160 @@ def perform_s1_analysis():
     """Alias — deleguje do perform_ngram_analysis."""
     return perform_ngram_analysis()
 
+# ======================================================
+# v56.4: GET /api/jobs/<job_id> — status / wynik joba S1 ("async": true)
+# ======================================================
+@app.route("/api/jobs/<job_id>", methods=["GET"])
+def s1_job_status(job_id):
+    include_result = request.args.get("include_result", "true").lower() != "false"
+    job = get_job(job_id, include_result=include_result)
+    if job is None:
+        return jsonify({"error": f"Unknown or expired job '{job_id}'"}), 404
+    return jsonify(job)
+
+# ======================================================
+# v56.4: /api/ngram_entity_analysis/bulk — klaster keywordów na wspólnym
+# korpusie: każdy unikalny URL scrapowany i parsowany RAZ (s1_bulk.py)
+# ======================================================
+@app.route("/api/ngram_entity_analysis/bulk", methods=["POST"])
+def perform_ngram_analysis_bulk():
+    data = request.get_json(force=True)
+    if request.args.get("timings") == "1":
+        data["timings"] = True
+
+    if _async_requested(data):
+        keywords = data.get("keywords") or []
+        try:
+            job = submit_job(run_s1_bulk_analysis, data, label=f"bulk: {len(keywords)} keywords")
+        except JobQueueFull as e:
+            return jsonify({"error": "S1 job queue full", "details": str(e)}), 429
+        return jsonify({
+            "job_id": job["job_id"],
+            "state": job["state"],
+            "queue_position": job["queue_position"],
+            "poll_url": f"/api/jobs/{job['job_id']}",
+        }), 202
+
+    payload, status = run_s1_bulk_analysis(data)
+    return jsonify(payload), status
+
+
+def _bulk_keyword_requests(data):
+    """keywords: ["kw", …] albo [{"keyword": "kw", "project_id": …}, …] → dane requestów per keyword."""
+    shared = {k: data[k] for k in ("top_n", "serp_cache_ttl", "timings") if k in data}
+    requests_by_keyword = {}
+    for item in data.get("keywords") or []:
+        item = {"main_keyword": item} if isinstance(item, str) else dict(item)
+        keyword = (item.pop("keyword", None) or item.get("main_keyword") or "").strip()
+        if keyword and keyword not in requests_by_keyword:
+            requests_by_keyword[keyword] = {**shared, **item, "main_keyword": keyword}
+    return requests_by_keyword
+
+
+def run_s1_bulk_analysis(data, progress=None):
+    """
+    S1 dla listy keywordów: SERP-y równolegle → scraping unikalnych URL-i →
+    parse każdej treści RAZ → run_s1_analysis per keyword na wspólnym korpusie.
+    Zwraca (payload, http_status); błąd jednego keywordu nie przerywa reszty.
+    v56.4: "_timings" wspólnej fazy (SERP, scraping, parse) — per keyword
+    we własnych wynikach, gdy "timings": true.
+    """
+    with request_timings() as timings, timed("s1_bulk_total"):
+        payload, status = _run_s1_bulk_analysis(data, progress)
+    if data.get("timings") and status == 200:
+        payload["_timings"] = timings.report()
+    return payload, status
+
+
+def _run_s1_bulk_analysis(data, progress=None):
+    from concurrent.futures import ThreadPoolExecutor
+
+    progress = progress or _no_progress
+    keyword_requests = _bulk_keyword_requests(data)
+    if not keyword_requests:
+        return {"error": "Brak keywords do analizy"}, 400
+    if len(keyword_requests) > S1_BULK_MAX_KEYWORDS:
+        return {"error": f"Za dużo keywordów: {len(keyword_requests)} (max {S1_BULK_MAX_KEYWORDS})"}, 400
+
+    t_start = time.time()
+    print(f"[S1_BULK] 🧩 Bulk S1 for {len(keyword_requests)} keywords")
+
+    # 1️⃣ SERP-y (bez scrapingu)
+    progress("serp", keywords=len(keyword_requests))
+
+    def _serp_only(keyword):
+        return fetch_serp_sources(keyword, num_results=S1_SERP_RESULTS,
+                                  serp_cache_ttl=keyword_requests[keyword].get("serp_cache_ttl"),
+                                  scrape=False)
+
+    with ThreadPoolExecutor(max_workers=S1_BULK_SERP_WORKERS) as pool:
+        serp_results = dict(zip(keyword_requests, pool.map(bind(_serp_only), keyword_requests)))
+
+    corpus = BulkCorpus()
+    for keyword, serp_result in serp_results.items():
+        corpus.add_keyword(keyword, serp_result.get("scrape_targets", []))
+
+    # 2️⃣ Scraping unikalnych URL-i + parse w trakcie (source_pipeline.py)
+    nlp = get_nlp()
+    doc_store = DocStore(nlp)
+    targets = corpus.unique_targets()
+    progress("scrape", pages=len(targets), scraped=0)
+    print(f"[S1_BULK] 🚀 Scraping {len(targets)} unique pages "
+          f"(of {corpus.requested} across SERPs)")
+    source_pipeline = SourcePipeline(doc_store, partial=_lemmatize_tokens) if SOURCE_PIPELINE_ENABLED else None
+    try:
+        for result in _scrape_pages(targets):
+            if corpus.add_source(result):
+                if source_pipeline is not None:
+                    source_pipeline.submit(result)
+                progress("scrape", scraped=len(corpus.sources))
+    finally:
+        source_tokens = source_pipeline.finish() if source_pipeline else {}
+
+    # Reszta treści (bez pipeline'u) — jeden wsadowy parse dla całego korpusu
+    doc_store.parse([src["content"] for src in corpus.sources.values() if src.get("content", "").strip()])
+    for src in corpus.sources.values():
+        content = src.get("content", "")
+        if content.strip() and content not in source_tokens:
+            source_tokens[content] = _lemmatize_tokens(doc_store.get(content))
+
+    # 3️⃣ Agregacja per keyword na wspólnym korpusie
+    results = {}
+    for idx, (keyword, keyword_data) in enumerate(keyword_requests.items()):
+        progress("analysis", keyword=keyword, done=idx, total=len(keyword_requests))
+        serp_result = {**serp_results[keyword], "sources": corpus.sources_for(keyword, MAX_TOTAL_CONTENT)}
+        try:
+            payload, status = run_s1_analysis(keyword_data, prefetched={
+                "serp_result": serp_result,
+                "doc_store": doc_store,
+                "source_tokens": source_tokens,
+            })
+        except Exception as e:
+            print(f"[S1_BULK] ❌ Analysis error for '{keyword}': {e}")
+            payload, status = {"error": str(e), "main_keyword": keyword}, 500
+        if status >= 400:
+            payload["status_code"] = status
+        results[keyword] = payload
+        # Doc-i treści niepotrzebnych już żadnemu keywordowi → zwolnione
+        released = corpus.release(keyword)
+        doc_store.release(released)
+        for content in released:
+            source_tokens.pop(content, None)
+
+    elapsed = time.time() - t_start
+    failed = [kw for kw, payload in results.items() if "status_code" in payload]
+    summary = {
+        **corpus.stats(),
+        "keywords_failed": len(failed),
+        "spacy_parsed": doc_store.parsed_count,
+        "spacy_from_cache": doc_store.cached_count,
+        "elapsed_seconds": round(elapsed, 2),
+    }
+    print(f"[S1_BULK] ✅ {len(results)} keywords in {elapsed:.1f}s — "
+          f"{summary['urls_unique']} unique / {summary['urls_requested']} URLs "
+          f"({summary['dedupe_ratio']:.0%} deduped), {len(failed)} failed")
+    return {"results": results, "failed": failed, "summary": summary}, 200
+
 # ======================================================
 # v54.0: GET /api/debug/serpapi?keyword=...
 # Diagnostyczny endpoint — zwraca surowy JSON z SerpAPI
@@ -1493,7 +2015,7 @@ def debug_serpapi():
         return jsonify({"error": "SERPAPI_KEY not configured"}), 500
 
     try:
-        resp = requests.get(
+        resp = http_get(
             "https://serpapi.com/search",
             params={
                 "q": keyword,
@@ -1568,8 +2090,43 @@ def perform_synthesize_topics():
 @app.route("/api/generate_compliance_report", methods=["POST"])
 def perform_generate_compliance_report():
     data = request.get_json(force=True)
+    # v56.4: article_id → sesja po stronie serwera (stan + lematy fraz), odpowiedź = delty
+    article_id = data.get("article_id")
+    if article_id:
+        result = generate_compliance_report_session(
+            str(article_id), data.get("text", ""), data.get("keyword_state")
+        )
+        if "error" in result:
+            return jsonify(result), (404 if result.get("session_missing") else 400)
+        return jsonify(result)
     return jsonify(generate_compliance_report(data.get("text", ""), data.get("keyword_state", {})))
 
+@app.route("/api/generate_compliance_report/batch", methods=["POST"])
+def perform_generate_compliance_report_batch():
+    data = request.get_json(force=True)
+    # v56.4: wiele tekstów przy jednym keyword_state — jedna lematyzacja fraz, jeden matcher
+    # "chain": false / "false" / 0 / "no" / null → teksty niezależne (bool("false") byłoby True)
+    chain = str(data.get("chain", True)).strip().lower() not in ("false", "0", "no", "off", "none", "")
+    result = generate_compliance_report_batch(
+        data.get("texts", []), data.get("keyword_state", {}), chain=chain
+    )
+    if "error" in result:
+        return jsonify(result), 400
+    return jsonify(result)
+
+@app.route("/api/compliance_session/<article_id>", methods=["GET", "DELETE"])
+def compliance_session_endpoint(article_id):
+    if request.method == "DELETE":
+        return jsonify({"deleted": delete_session(article_id)})
+    session = get_session(article_id)
+    if session is None:
+        return jsonify({"error": f"No active compliance session for article_id '{article_id}'"}), 404
+    return jsonify({
+        **session_summary(session),
+        "keyword_state": session["keyword_state"],
+        "counts": session["counts"],
+    })
+
 # ======================================================
 # v53.0: Global JSON Error Handlers
 # NIGDY nie zwracaj HTML error pages — ZAWSZE Content-Type: application/json
@@ -1596,6 +2153,14 @@ def handle_exception(e):
     return jsonify({"error": "Internal Server Error", "details": str(e)}), 500
 
 
+# ======================================================
+# v56.4: /metrics — histogramy czasów etapów S1 (Prometheus, metrics.py)
+# ======================================================
+@app.route("/metrics", methods=["GET"])
+def prometheus_metrics():
+    return Response(render_prometheus(), mimetype="text/plain; version=0.0.4")
+
+
 @app.route("/health", methods=["GET"])
 def health():
     return jsonify({
@@ -1607,11 +2172,22 @@ def health():
             "scrape_timeout": SCRAPE_TIMEOUT,
             "skip_domains": SKIP_DOMAINS
         },
+        "parse_cache": parse_cache_stats(),
+        "http_pool": http_pool_stats(),
+        "async_scraper": async_scraper_stats(),
+        "page_cache": page_cache_stats(),
+        "serp_cache": serp_cache_stats(),
+        "nlp_model": model_info(),
+        "nlp_pool": nlp_pool_stats(),
+        "s1_jobs": jobs_stats(),
+        "metrics": metrics_stats(),
         "features": {
             "tfidf_semantic_enabled": True,
             "serpapi_enabled": bool(SERPAPI_KEY),
             "dataforseo_enabled": DATAFORSEO_ENABLED,
             "serp_provider": SERP_PROVIDER,
+            "serp_hedge_mode": SERP_HEDGE_MODE,
+            "bulk_max_keywords": S1_BULK_MAX_KEYWORDS,
             "paa_extraction": True,
             "featured_snippet_extraction": True,
             "ai_overview_extraction": True,
@@ -0,0 +1,105 @@
+"""
+===============================================================================
+🔎 KEYWORD MATCHER v1.0 — Aho–Corasick nad ID lematów
+===============================================================================
+Zastępuje okno przesuwne text_lemmas[i:i+kw_len] == keyword_lemmas
+(O(N·K·L), nowa lista na każdym kroku) jednym przebiegiem po tekście,
+który zwraca WSZYSTKIE wystąpienia wszystkich fraz naraz.
+
+Semantyka identyczna jak okno przesuwne: liczone są również wystąpienia
+nachodzące na siebie, spany (start, end) rosnąco — gotowe do etapu fuzzy.
+Wyjątek: fraza bez lematów nie pasuje nigdzie (0) — jak w oknie
+generate_compliance_report (kw_len > 0); goła pętla w lemmatize_and_count
+dawała len(text_lemmas) + 1 i to tam jest odtwarzane.
+
+Użycie:
+    matcher = KeywordMatcher({"adwokat rozwodowy": ["adwokat", "rozwodowy"]})
+    spans = matcher.find_all(text_lemmas)   # {"adwokat rozwodowy": [(3, 5), ...]}
+
+Integracja: generate_compliance_report.py, lemmatize_and_count.py
+===============================================================================
+"""
+
+from collections import deque
+from typing import Dict, Hashable, Iterable, List, Sequence, Tuple
+
+
+class KeywordMatcher:
+    """Automat Aho–Corasick dla fraz zapisanych jako listy lematów."""
+
+    def __init__(self, patterns: Dict[Hashable, Sequence[str]]):
+        self._lemma_ids: Dict[str, int] = {}
+        self._goto: List[Dict[int, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._out: List[List[int]] = [[]]
+        self.keys: List[Hashable] = []
+        self.lengths: List[int] = []
+
+        for key, lemmas in patterns.items():
+            self._add(key, lemmas)
+        self._build()
+
+    # ── Budowa automatu ─────────────────────────────────────────────────────
+    def _add(self, key: Hashable, lemmas: Sequence[str]) -> None:
+        pattern_idx = len(self.keys)
+        self.keys.append(key)
+        self.lengths.append(len(lemmas))
+        if not lemmas:
+            return  # pusta fraza nigdy nie pasuje (jak okno z warunkiem kw_len > 0)
+
+        node = 0
+        for lemma in lemmas:
+            lemma_id = self._lemma_ids.setdefault(lemma, len(self._lemma_ids))
+            nxt = self._goto[node].get(lemma_id)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append([])
+                self._goto[node][lemma_id] = nxt
+            node = nxt
+        self._out[node].append(pattern_idx)
+
+    def _build(self) -> None:
+        """Linki fail (BFS) + scalenie wyjść po linkach fail."""
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for lemma_id, child in self._goto[node].items():
+                queue.append(child)
+                fail = self._fail[node]
+                while fail and lemma_id not in self._goto[fail]:
+                    fail = self._fail[fail]
+                target = self._goto[fail].get(lemma_id, 0)
+                self._fail[child] = target if target != child else 0
+                self._out[child] = self._out[child] + self._out[self._fail[child]]
+
+    # ── Dopasowanie ─────────────────────────────────────────────────────────
+    def lemma_id(self, lemma: str) -> int:
+        """ID lematu w słowniku fraz (-1 = lemat spoza fraz)."""
+        return self._lemma_ids.get(lemma, -1)
+
+    def find_all(self, text_lemmas: Iterable[str]) -> Dict[Hashable, List[Tuple[int, int]]]:
+        """Zwraca {klucz frazy: [(start, end), ...]} — jeden przebieg po tekście."""
+        spans: Dict[Hashable, List[Tuple[int, int]]] = {key: [] for key in self.keys}
+        goto, fail, out = self._goto, self._fail, self._out
+        lemma_ids = self._lemma_ids
+        keys, lengths = self.keys, self.lengths
+
+        node = 0
+        for pos, lemma in enumerate(text_lemmas):
+            lemma_id = lemma_ids.get(lemma)
+            if lemma_id is None:
+                node = 0  # lemat spoza wszystkich fraz — żadna nie może trwać dalej
+                continue
+            while node and lemma_id not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(lemma_id, 0)
+            for pattern_idx in out[node]:
+                end = pos + 1
+                spans[keys[pattern_idx]].append((end - lengths[pattern_idx], end))
+        return spans
+
+    def count_all(self, text_lemmas: Iterable[str]) -> Dict[Hashable, int]:
+        """Zwraca {klucz frazy: liczba wystąpień}."""
+        return {key: len(found) for key, found in self.find_all(text_lemmas).items()}
@@ -0,0 +1,325 @@
+"""
+===============================================================================
+⏱️ METRICS v1.0 — czasy etapów S1 (_timings w odpowiedzi + /metrics)
+===============================================================================
+Jedyną informacją o czasie były rozrzucone print-y z ręcznym time.time()
+(np. w _scrape_one) — nie dało się ustalić, który etap odpowiada za
+regresje p95.
+
+Teraz każdy etap mierzony jest jednym timerem:
+  serp_fetch / serp_upstream (per provider), scrape_fetch (per strona),
+  trafilatura, spacy_parse (per przebieg, pula / w procesie),
+  spacy_cache_load, ngram_build, tfidf, entity_seo, entity_ner,
+  salience, cooccurrence, causal, gaps, firestore, s1_total
+i trafia do:
+  - histogramu procesu (Prometheus: s1_stage_duration_seconds{stage=…}),
+  - opcjonalnie do bloku "_timings" odpowiedzi ("timings": true / ?timings=1)
+    — zdarzenia tego requestu (z URL-em / liczbą tekstów w "detail")
+    + podsumowanie per etap.
+
+Request trafia do timerów przez contextvar; praca w innych wątkach (pula
+ekstrakcji scrapera, SourcePipeline, hedged SERP) dostaje kolektor przez
+bind(fn).
+
+Workery gunicorna nie dzielą pamięci: każdy co METRICS_FLUSH_INTERVAL s
+i na końcu każdego requestu S1 zapisuje snapshot histogramów do
+METRICS_DIR/<pid>.json (atomowo), a /metrics scala snapshoty żywych
+workerów. Snapshot martwego workera (restart, max_requests) jest dosumowany
+do METRICS_DIR/dead.json i dopiero wtedy usuwany — liczniki w /metrics są
+monotoniczne (Prometheus nie widzi resetu przy restarcie pojedynczego
+workera).
+
+Konfiguracja (env):
+  METRICS_ENABLED         — "true"/"false" (domyślnie true)
+  METRICS_DIR             — katalog snapshotów (domyślnie <tmp>/ngram_metrics)
+  METRICS_FLUSH_INTERVAL  — s między snapshotami workera (domyślnie 5)
+
+Integracja: index.py (etapy S1, /metrics), doc_store.py (spaCy),
+entity_extractor.py (NER, salience, co-occurrence), source_pipeline.py
+===============================================================================
+"""
+
+import os
+import json
+import time
+import tempfile
+import threading
+import contextvars
+from contextlib import contextmanager
+from typing import Callable, Dict, List
+
+try:
+    from .disk_store import file_lock, pid_alive, remove_quietly, write_json
+except ImportError:
+    from disk_store import file_lock, pid_alive, remove_quietly, write_json
+
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() == "true"
+METRICS_DIR = os.getenv("METRICS_DIR", os.path.join(tempfile.gettempdir(), "ngram_metrics"))
+METRICS_FLUSH_INTERVAL = float(os.getenv("METRICS_FLUSH_INTERVAL", "5"))
+
+# Górne granice kubełków (s) — od pojedynczego parse do całego S1
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 120)
+
+METRIC_NAME = "s1_stage_duration_seconds"
+
+
+# ── Histogramy procesu ──────────────────────────────────────────────────────
+_HIST_LOCK = threading.Lock()
+_HIST: Dict[str, Dict] = {}     # klucz etykiet (JSON) → {"labels", "buckets", "sum", "count"}
+_HIST_PID = os.getpid()
+_last_flush = 0.0
+
+
+def _labels_key(labels: Dict[str, str]) -> str:
+    return json.dumps(labels, sort_keys=True)
+
+
+def _observe_histogram(labels: Dict[str, str], seconds: float) -> None:
+    global _HIST, _HIST_PID
+    key = _labels_key(labels)
+    with _HIST_LOCK:
+        if _HIST_PID != os.getpid():
+            # Po forku: liczniki mastera nie należą do tego workera
+            _HIST, _HIST_PID = {}, os.getpid()
+        series = _HIST.get(key)
+        if series is None:
+            series = _HIST[key] = {"labels": labels, "buckets": [0] * len(BUCKETS), "sum": 0.0, "count": 0}
+        for i, bound in enumerate(BUCKETS):
+            if seconds <= bound:
+                series["buckets"][i] += 1
+        series["sum"] += seconds
+        series["count"] += 1
+    _maybe_flush()
+
+
+def _snapshot() -> Dict[str, Dict]:
+    with _HIST_LOCK:
+        if _HIST_PID != os.getpid():
+            return {}
+        return {key: {**s, "buckets": list(s["buckets"])} for key, s in _HIST.items()}
+
+
+def _snapshot_path(pid: int) -> str:
+    return os.path.join(METRICS_DIR, f"{pid}.json")
+
+
+_DEAD_FILE = "dead.json"
+
+
+def _flush() -> None:
+    global _last_flush
+    _last_flush = time.time()
+    pid = os.getpid()
+    try:
+        write_json(_snapshot_path(pid), {"pid": pid, "series": _snapshot()})
+    except Exception as e:
+        print(f"[METRICS] ⚠️ Snapshot write failed: {e}")
+
+
+def _maybe_flush() -> None:
+    if time.time() - _last_flush >= METRICS_FLUSH_INTERVAL:
+        _flush()
+
+
+# ── Timingi requestu ────────────────────────────────────────────────────────
+class RequestTimings:
+    """Zdarzenia etapów jednego requestu (thread-safe — piszą też wątki pomocnicze)."""
+
+    def __init__(self):
+        self.started_at = time.time()
+        self.events: List[Dict] = []
+        self._lock = threading.Lock()
+
+    def add(self, stage: str, seconds: float, labels: Dict[str, str], detail) -> None:
+        event = {"stage": stage, "seconds": round(seconds, 4),
+                 "start": round(time.time() - seconds - self.started_at, 4)}
+        if labels:
+            event.update(labels)
+        if detail is not None:
+            event["detail"] = detail
+        with self._lock:
+            self.events.append(event)
+
+    def report(self) -> Dict:
+        """Blok "_timings": podsumowanie per etap (+ etykiety) i pełna lista zdarzeń."""
+        with self._lock:
+            events = sorted(self.events, key=lambda e: e["start"])
+        stages: Dict[str, Dict] = {}
+        for event in events:
+            name = event["stage"]
+            if "provider" in event:
+                name = f"{name}:{event['provider']}"
+            agg = stages.setdefault(name, {"count": 0, "total_s": 0.0, "max_s": 0.0})
+            agg["count"] += 1
+            agg["total_s"] = round(agg["total_s"] + event["seconds"], 4)
+            agg["max_s"] = max(agg["max_s"], event["seconds"])
+        return {
+            "wall_s": round(time.time() - self.started_at, 4),
+            "stages": stages,
+            "events": events,
+        }
+
+
+_CURRENT: contextvars.ContextVar = contextvars.ContextVar("s1_request_timings", default=None)
+
+
+@contextmanager
+def request_timings():
+    """Aktywuje kolektor timingów dla bieżącego wątku / kontekstu (zagnieżdżalne)."""
+    timings = RequestTimings()
+    token = _CURRENT.set(timings)
+    try:
+        yield timings
+    finally:
+        try:
+            _CURRENT.reset(token)
+        except ValueError:
+            pass  # generator zamknięty z innego kontekstu (np. GC po rozłączeniu klienta)
+        if METRICS_ENABLED:
+            _flush()  # bezczynny worker nie może zostać z nieaktualnym snapshotem
+
+
+def bind(fn: Callable) -> Callable:
+    """fn z kolektorem bieżącego requestu — do uruchomienia w innym wątku."""
+    timings = _CURRENT.get()
+    if timings is None or not METRICS_ENABLED:
+        return fn
+
+    def bound(*args, **kwargs):
+        token = _CURRENT.set(timings)
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            _CURRENT.reset(token)
+
+    return bound
+
+
+def observe(stage: str, seconds: float, detail=None, **labels) -> None:
+    """Rejestruje czas etapu. `labels` → etykiety Prometheus (niska kardynalność),
+    `detail` (URL, liczba tekstów…) → tylko do _timings requestu."""
+    if not METRICS_ENABLED:
+        return
+    labels = {k: str(v) for k, v in labels.items()}
+    _observe_histogram({"stage": stage, **labels}, seconds)
+    timings = _CURRENT.get()
+    if timings is not None:
+        timings.add(stage, seconds, labels, detail)
+
+
+@contextmanager
+def timed(stage: str, detail=None, **labels):
+    """with timed("tfidf"): … — mierzy blok (także gdy rzuci wyjątek)."""
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(stage, time.perf_counter() - t0, detail=detail, **labels)
+
+
+# ── Eksport Prometheus ──────────────────────────────────────────────────────
+def _read_series(path: str) -> Dict[str, Dict]:
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)["series"]
+
+
+def _add_series(merged: Dict[str, Dict], series: Dict[str, Dict]) -> None:
+    for key, s in series.items():
+        agg = merged.setdefault(key, {"labels": s["labels"], "buckets": [0] * len(BUCKETS), "sum": 0.0, "count": 0})
+        agg["buckets"] = [a + b for a, b in zip(agg["buckets"], s["buckets"])]
+        agg["sum"] += s["sum"]
+        agg["count"] += s["count"]
+
+
+def _fold_dead(pids: List[int]) -> None:
+    """
+    Snapshoty martwych workerów → dead.json (suma), potem usunięcie snapshotów.
+    Pod flock: równoległe /metrics w dwóch workerach nie dosumują dwa razy.
+    """
+    dead_path = os.path.join(METRICS_DIR, _DEAD_FILE)
+    with file_lock(os.path.join(METRICS_DIR, "dead.lock")):
+        try:
+            dead = _read_series(dead_path)
+        except FileNotFoundError:
+            dead = {}
+        folded = []
+        for pid in pids:
+            try:
+                _add_series(dead, _read_series(_snapshot_path(pid)))
+            except FileNotFoundError:
+                continue  # już dosumowany przez inny worker
+            except Exception:
+                pass  # uszkodzony snapshot — nie da się go dosumować
+            folded.append(pid)
+        if not folded:
+            return
+        write_json(dead_path, {"series": dead})
+        for pid in folded:
+            remove_quietly(_snapshot_path(pid))
+
+
+def _merged_series() -> Dict[str, Dict]:
+    """Snapshoty żywych workerów (ten — aktualny) + suma martwych, zsumowane per etykiety."""
+    _flush()
+    try:
+        names = os.listdir(METRICS_DIR)
+    except OSError:
+        names = []
+    live, dead = [], []
+    for name in names:
+        if not name.endswith(".json"):
+            continue
+        try:
+            pid = int(name[:-len(".json")])
+        except ValueError:
+            continue
+        (live if pid_alive(pid) else dead).append(pid)
+    if dead:
+        try:
+            _fold_dead(dead)
+        except Exception as e:
+            print(f"[METRICS] ⚠️ Folding dead workers failed: {e}")
+
+    merged: Dict[str, Dict] = {}
+    for path in [os.path.join(METRICS_DIR, _DEAD_FILE)] + [_snapshot_path(pid) for pid in live]:
+        try:
+            _add_series(merged, _read_series(path))
+        except Exception:
+            continue
+    return merged
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labels: Dict[str, str], **extra) -> str:
+    items = {**labels, **extra}
+    return "{" + ",".join(f'{k}="{_escape(str(v))}"' for k, v in items.items()) + "}"
+
+
+def render_prometheus() -> str:
+    """Tekstowy format ekspozycji Prometheus (histogramy etapów S1)."""
+    lines = [
+        f"# HELP {METRIC_NAME} Duration of S1 pipeline stages in seconds.",
+        f"# TYPE {METRIC_NAME} histogram",
+    ]
+    for _key, s in sorted(_merged_series().items()):
+        labels = s["labels"]
+        for bound, value in zip(BUCKETS, s["buckets"]):
+            lines.append(f"{METRIC_NAME}_bucket{_format_labels(labels, le=f'{bound:g}')} {value}")
+        lines.append(f"{METRIC_NAME}_bucket{_format_labels(labels, le='+Inf')} {s['count']}")
+        lines.append(f"{METRIC_NAME}_sum{_format_labels(labels)} {s['sum']:.6f}")
+        lines.append(f"{METRIC_NAME}_count{_format_labels(labels)} {s['count']}")
+    return "\n".join(lines) + "\n"
+
+
+def metrics_stats() -> Dict:
+    """Statystyki dla /health."""
+    snapshot = _snapshot()
+    return {
+        "enabled": METRICS_ENABLED,
+        "directory": METRICS_DIR,
+        "series": len(snapshot),
+        "observations": sum(s["count"] for s in snapshot.values()),
+    }
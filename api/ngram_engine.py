@@ -0,0 +1,318 @@
+"""
+===============================================================================
+🔢 NGRAM ENGINE v1.0 — zwarte liczenie n-gramów na tablicach NumPy
+===============================================================================
+Wcześniej _build_ngrams_for_source robił dwa " ".join(...) na KAŻDY n-gram
+(n=2..4) i aktualizował cztery słowniki Counterów (ngram_freqs,
+ngram_presence, ngram_per_source, lemma_surface_freq) — miliony małych
+obiektów na request.
+
+Teraz:
+  - lematy i formy powierzchniowe → ID (int32), raz per token,
+  - n-gram = ID przesunięte o 1 i spakowane do int64 w systemie o podstawie
+    |vocab|+1 (cyfry niezerowe → kody unikalne także między różnymi n);
+    gdy się nie mieści — grupowanie np.unique(axis=0),
+  - liczenie: np.unique → macierz wiersze (źródła) × n-gramy,
+    v1.1: scipy.sparse CSR (przechowywane tylko niezerowe liczniki),
+  - v1.1: statystyki per n-gram (suma, obecność, min/mediana/max po
+    źródłach) liczone kolumnowo dla wszystkich n-gramów naraz,
+  - stringi (lemat, najczęstsza forma powierzchniowa) budowane TYLKO dla
+    n-gramów, które mogą wejść do top_n.
+
+v1.2: Dwa przejścia (build(..., min_page_freq=2)). Większość 2–4-gramów
+w 10 źródłach występuje raz i i tak odpada na filtrze page_freq < 2.
+Przejście 1 liczy same kody n-gramów; przejście 2 buduje macierz, kody form
+powierzchniowych i indeks wystąpień TYLKO dla kluczy, które mogą przetrwać
+(page_freq >= próg albo obecne w wierszach high-signal).
+
+Kolejność kluczy = kolejność pierwszego wystąpienia (źródło → n → pozycja),
+czyli ta sama, w jakiej wcześniej wypełniał się ngram_freqs — remisy wag
+sortują się identycznie.
+
+Integracja: index.py → perform_ngram_analysis()
+===============================================================================
+"""
+
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+from scipy import sparse
+
+NGRAM_MIN_N = 2
+NGRAM_MAX_N = 4
+
+# Maks. podstawa, przy której MAX_N cyfr mieści się w int64
+_INT64_LIMIT = 2 ** 63 - 1
+
+
+def round4(values: np.ndarray) -> np.ndarray:
+    """
+    round(x, 4) zgodne z Pythonowym round() dla całej tablicy.
+    np.round (rint(x*1e4)/1e4) różni się od round() tylko przy x*1e4 ≈ k+0.5
+    — te pojedyncze przypadki liczymy wbudowanym round().
+    """
+    values = np.asarray(values, dtype=np.float64)
+    out = np.round(values, 4)
+    scaled = values * 1e4
+    halfway = np.flatnonzero(np.abs(scaled - np.floor(scaled) - 0.5) < 1e-6)
+    for i in halfway.tolist():
+        out[i] = round(float(values[i]), 4)
+    return out
+
+
+def _pack_windows(ids: np.ndarray, n: int, base: int) -> np.ndarray:
+    """Kody int64 wszystkich okien długości n (ids już przesunięte o 1)."""
+    m = len(ids) - n + 1
+    codes = ids[:m].astype(np.int64)
+    for j in range(1, n):
+        codes = codes * base + ids[j:j + m]
+    return codes
+
+
+def _window_rows(ids: np.ndarray, n: int, width: int) -> np.ndarray:
+    """Okna długości n jako wiersze (m, width), dopełnione zerami."""
+    m = len(ids) - n + 1
+    rows = np.zeros((m, width), dtype=np.int32)
+    for j in range(n):
+        rows[:, j] = ids[j:j + m]
+    return rows
+
+
+class _Vocab:
+    """String → ID (kolejność dodania)."""
+
+    def __init__(self):
+        self.ids: Dict[str, int] = {}
+        self.words: List[str] = []
+
+    def encode(self, tokens: Sequence[str]) -> np.ndarray:
+        ids, words = self.ids, self.words
+        out = np.empty(len(tokens), dtype=np.int32)
+        for i, tok in enumerate(tokens):
+            idx = ids.get(tok)
+            if idx is None:
+                idx = ids[tok] = len(words)
+                words.append(tok)
+            out[i] = idx + 1  # 0 = dopełnienie
+        return out
+
+
+class NgramTable:
+    """Wynik liczenia: macierz wiersze × n-gramy + leniwe stringi."""
+
+    def __init__(self, counts, first_occurrence, occ_key, occ_surface, occ_pos, pieces,
+                 lemma_vocab, surface_vocab, pruned: int = 0):
+        self.counts = counts                      # CSR (wiersze, K) int32
+        self.totals = np.asarray(counts.sum(axis=0)).ravel()  # (K,) ze wszystkich wierszy
+        self.first_occurrence = first_occurrence  # (K,) globalna pozycja 1. wystąpienia
+        self._occ_key = occ_key                   # (M,) klucz lematowy wystąpienia
+        self._occ_surface = occ_surface           # (M,) kod formy powierzchniowej
+        self._occ_pos = occ_pos                   # (M,) globalna pozycja wystąpienia
+        self.pruned = pruned                      # klucze odrzucone w przejściu 1
+        self._pieces = pieces                     # [(offset, n, ids lematów, ids form)]
+        self._piece_offsets = np.array([p[0] for p in pieces], dtype=np.int64)
+        self._lemma_vocab = lemma_vocab
+        self._surface_vocab = surface_vocab
+
+    @property
+    def size(self) -> int:
+        return self.counts.shape[1]
+
+    def row_sums(self, rows: int) -> np.ndarray:
+        """Suma wystąpień per n-gram w wierszach 0..rows-1."""
+        return np.asarray(self.counts[:rows].sum(axis=0)).ravel()
+
+    def row_mask(self, row: int) -> np.ndarray:
+        """Czy n-gram wystąpił w danym wierszu (np. high-signal)."""
+        mask = np.zeros(self.size, dtype=bool)
+        mask[self.counts[row].indices] = True
+        return mask
+
+    def presence(self, rows: int, labels: Optional[Sequence[str]] = None) -> np.ndarray:
+        """
+        Liczba różnych etykiet (URL-i) z wierszy 0..rows-1, w których n-gram
+        wystąpił. Duplikaty URL liczą się raz — jak wcześniej set etykiet.
+        """
+        page = self.counts[:rows]
+        if labels is not None and len(set(labels)) != len(labels):
+            # Wiersze o tej samej etykiecie sumowane macierzą przypisań
+            label_ids = {}
+            row_label = np.array([label_ids.setdefault(lbl, len(label_ids)) for lbl in labels])
+            assign = sparse.csr_matrix(
+                (np.ones(rows, dtype=np.int32), (row_label, np.arange(rows))),
+                shape=(len(label_ids), rows),
+            )
+            page = assign @ page
+        return page.getnnz(axis=0)
+
+    def dense_columns(self, keys: Sequence[int], rows: int) -> np.ndarray:
+        """Liczniki (len(keys), rows) — freq_per_source dla wybranych n-gramów."""
+        return self.counts[:rows][:, keys].T.toarray()
+
+    def column_stats(self, keys: Sequence[int], rows: int):
+        """
+        (min, mediana, max) niezerowych liczników per n-gram w wierszach 0..rows-1.
+        Mediana parzystej liczby źródeł = średnia dwóch środkowych, w dół (//).
+        Bez wystąpień → 0, 0, 0.
+        """
+        cols = self.counts[:rows][:, keys].tocsc()
+        cols.sort_indices()
+        lengths = np.diff(cols.indptr)
+        col_ids = np.repeat(np.arange(len(lengths)), lengths)
+        values = cols.data[np.lexsort((cols.data, col_ids))].astype(np.int64)
+
+        freq_min = np.zeros(len(lengths), dtype=np.int64)
+        freq_median = np.zeros(len(lengths), dtype=np.int64)
+        freq_max = np.zeros(len(lengths), dtype=np.int64)
+        present = lengths > 0
+        start, count = cols.indptr[:-1][present], lengths[present]
+        mid = start + count // 2
+        freq_min[present] = values[start]
+        freq_max[present] = values[start + count - 1]
+        odd = count % 2 == 1
+        freq_median[present] = np.where(
+            odd, values[mid], (values[np.maximum(mid - 1, start)] + values[mid]) // 2
+        )
+        return freq_min, freq_median, freq_max
+
+    def _decode(self, occurrence: int, surface: bool) -> str:
+        """String n-gramu z wystąpienia o podanej pozycji globalnej."""
+        piece = int(np.searchsorted(self._piece_offsets, occurrence, side="right")) - 1
+        offset, n, lem_ids, raw_ids = self._pieces[piece]
+        start = occurrence - offset
+        ids, words = (raw_ids, self._surface_vocab.words) if surface else (lem_ids, self._lemma_vocab.words)
+        return " ".join(words[i - 1] for i in ids[start:start + n].tolist())
+
+    def lemma_strings(self, keys: Sequence[int]) -> List[str]:
+        """Klucze lematowe ("wpływ alkohol") dla podanych n-gramów."""
+        return [self._decode(int(self.first_occurrence[k]), False) for k in keys]
+
+    def surface_strings(self, keys: Sequence[int]) -> List[str]:
+        """
+        Najczęstsza forma powierzchniowa per n-gram; remis → forma, która
+        wystąpiła pierwsza (jak Counter.most_common(1)).
+        """
+        keys = np.asarray(keys, dtype=np.int64)
+        if not len(keys):
+            return []
+        occ = np.flatnonzero(np.isin(self._occ_key, keys))
+        key = self._occ_key[occ]
+        surf = self._occ_surface[occ]
+        # Grupy (klucz, forma): liczność + pierwsze wystąpienie
+        order = np.lexsort((occ, surf, key))
+        key, surf, occ = key[order], surf[order], occ[order]
+        starts = np.flatnonzero(np.r_[True, (key[1:] != key[:-1]) | (surf[1:] != surf[:-1])])
+        group_counts = np.diff(np.r_[starts, len(key)])
+        group_key, group_first = key[starts], occ[starts]
+        # Per klucz: max liczność, potem najwcześniejsze wystąpienie
+        best = np.lexsort((group_first, -group_counts, group_key))
+        group_key, group_first = group_key[best], group_first[best]
+        heads = np.flatnonzero(np.r_[True, group_key[1:] != group_key[:-1]])
+        best_occ = dict(zip(group_key[heads].tolist(), self._occ_pos[group_first[heads]].tolist()))
+        return [self._decode(best_occ[k], True) for k in keys.tolist()]
+
+
+class NgramEngine:
+    """Zbiera tokeny źródeł i liczy n-gramy (NGRAM_MIN_N..NGRAM_MAX_N) wsadowo."""
+
+    def __init__(self, min_n: int = NGRAM_MIN_N, max_n: int = NGRAM_MAX_N):
+        self.min_n = min_n
+        self.max_n = max_n
+        self._lemmas = _Vocab()
+        self._surfaces = _Vocab()
+        self._sources = []  # (wiersz, ids lematów, ids form)
+
+    def add(self, raw_toks: Sequence[str], lem_toks: Sequence[str], row: int) -> None:
+        """Dodaje źródło (tokeny wyrównane: forma powierzchniowa ↔ lemat)."""
+        self._sources.append((row, self._lemmas.encode(lem_toks), self._surfaces.encode(raw_toks)))
+
+    def _group(self, pieces, vocab_size: int, keep: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        Kody okien: spakowane int64 albo (fallback) odwrotny indeks np.unique.
+        keep — maska wystąpień (po wszystkich kawałkach); pozostałe pomijane
+        per kawałek, bez materializacji pełnej tablicy.
+        """
+        base = vocab_size + 1
+        packed = base ** self.max_n <= _INT64_LIMIT
+        parts, offset = [], 0
+        for ids, n in pieces:
+            m = len(ids) - n + 1
+            part = _pack_windows(ids, n, base) if packed else _window_rows(ids, n, self.max_n)
+            if keep is not None:
+                part = part[keep[offset:offset + m]]
+            parts.append(part)
+            offset += m
+        if packed:
+            return np.concatenate(parts) if parts else np.zeros(0, dtype=np.int64)
+        if not parts:
+            return np.zeros(0, dtype=np.int64)
+        _, inverse = np.unique(np.concatenate(parts), axis=0, return_inverse=True)
+        return inverse.reshape(-1).astype(np.int64)
+
+    def build(self, n_rows: int, page_rows: Optional[int] = None,
+              min_page_freq: Optional[int] = None) -> NgramTable:
+        """
+        Liczy n-gramy wszystkich źródeł → NgramTable (n_rows wierszy).
+        min_page_freq — odrzuca klucze z < min_page_freq wystąpieniami
+        w wierszach 0..page_rows-1, których nie ma w wierszach >= page_rows.
+        """
+        # Wystąpienia w kolejności: źródło → n → pozycja
+        pieces, occ_rows = [], []
+        offset = 0
+        for row, lem_ids, raw_ids in self._sources:
+            for n in range(self.min_n, self.max_n + 1):
+                m = len(lem_ids) - n + 1
+                if m <= 0:
+                    continue
+                pieces.append((offset, n, lem_ids, raw_ids))
+                occ_rows.append(np.full(m, row, dtype=np.int32))
+                offset += m
+
+        empty = np.zeros(0, dtype=np.int64)
+        if not pieces:
+            return NgramTable(sparse.csr_matrix((n_rows, 0), dtype=np.int32), empty, empty, empty,
+                              empty, [], self._lemmas, self._surfaces)
+
+        lemma_pieces = [(p[2], p[1]) for p in pieces]
+        lemma_codes = self._group(lemma_pieces, len(self._lemmas.words))
+        occ_row = np.concatenate(occ_rows)
+        occ_pos = np.arange(len(lemma_codes), dtype=np.int64)
+        keep, pruned = None, 0
+
+        # ── Przejście 1: same kody → które klucze mogą przetrwać ──────────────
+        if min_page_freq is not None:
+            page_rows = n_rows if page_rows is None else page_rows
+            _, inverse = np.unique(lemma_codes, return_inverse=True)
+            inverse = inverse.reshape(-1)
+            on_page = occ_row < page_rows
+            n_all = int(inverse.max()) + 1
+            page_counts = np.bincount(inverse[on_page], minlength=n_all)
+            extra_counts = np.bincount(inverse[~on_page], minlength=n_all)
+            keep_key = (page_counts >= min_page_freq) | (extra_counts > 0)
+            pruned = int(n_all - keep_key.sum())
+            keep = keep_key[inverse]
+            del inverse, on_page, page_counts, extra_counts
+            lemma_codes, occ_row, occ_pos = lemma_codes[keep], occ_row[keep], occ_pos[keep]
+            if not len(lemma_codes):
+                return NgramTable(sparse.csr_matrix((n_rows, 0), dtype=np.int32), empty, empty, empty,
+                                  empty, pieces, self._lemmas, self._surfaces, pruned=pruned)
+
+        # ── Przejście 2: macierz + formy powierzchniowe tylko dla ocalałych ──
+        surface_codes = self._group([(p[3], p[1]) for p in pieces], len(self._surfaces.words), keep)
+
+        _, first_idx, inverse = np.unique(lemma_codes, return_index=True, return_inverse=True)
+        # Klucze w kolejności pierwszego wystąpienia (jak dict ngram_freqs)
+        order = np.argsort(first_idx, kind="stable")
+        rank = np.empty_like(order)
+        rank[order] = np.arange(len(order))
+        occ_key = rank[inverse.reshape(-1)].astype(np.int64)
+        first_occurrence = occ_pos[first_idx[order]]
+        n_keys = len(order)
+
+        # COO → CSR sumuje duplikaty (wiersz, klucz) = liczniki wystąpień
+        counts = sparse.coo_matrix(
+            (np.ones(len(occ_key), dtype=np.int32), (occ_row, occ_key)), shape=(n_rows, n_keys)
+        ).tocsr()
+
+        return NgramTable(counts, first_occurrence, occ_key, surface_codes, occ_pos, pieces,
+                          self._lemmas, self._surfaces, pruned=pruned)
@@ -0,0 +1,184 @@
+"""
+===============================================================================
+🧩 NLP MODEL REGISTRY v1.0 — jeden model spaCy na proces
+===============================================================================
+Wcześniej pl_core_news_sm ładował się osobno w index.py (nlp),
+generate_compliance_report.py (NLP) i lemmatize_and_count.py (NLP) —
+kilka kopii modelu na workera gunicorna.
+
+Teraz model ładuje się leniwie, RAZ na proces, a wywołujący dostają
+widok z wyłączonymi komponentami, których nie potrzebują:
+  get_nlp()         — pełny pipeline (S1: n-gramy, NER, salience)
+  get_lemmatizer()  — tylko lematy (compliance, keyword counting);
+                      v1.2: aktywne wyłącznie LEMMATIZER_PIPES
+
+v1.1: warm_up() — preload w masterze gunicorna (gunicorn.conf.py), workery
+dziedziczą wagi i vocab przez fork (copy-on-write). process_memory()
+raportuje prywatny vs współdzielony RSS procesu (/health).
+
+Konfiguracja (env):
+  SPACY_MODEL — nazwa modelu (domyślnie pl_core_news_sm)
+===============================================================================
+"""
+
+import os
+import time
+import threading
+from typing import Iterable, List, Optional
+
+try:
+    import spacy
+except ImportError:
+    spacy = None
+
+SPACY_MODEL = os.getenv("SPACY_MODEL", "pl_core_news_sm")
+
+# v1.2: Jedyne komponenty potrzebne do token.lemma_ — reszta (parser, tagger,
+# attribute_ruler, ner) jest wyłączana. Polski lemmatizer (pos_lookup) czyta
+# POS/morfologię z morphologizera, a ten korzysta ze współdzielonego tok2vec.
+LEMMATIZER_PIPES = ("tok2vec", "morphologizer", "lemmatizer")
+
+# Tekst rozgrzewkowy — buduje leniwe tabele (lookups, lexemy, bufory modelu)
+_WARMUP_TEXT = "Sąd Rejonowy w Warszawie orzekł zakaz prowadzenia pojazdów na 3 lata."
+
+
+class PipelineView:
+    """Widok na współdzielony model z wyłączonymi komponentami (bez kopii wag)."""
+
+    def __init__(self, nlp, disable: Iterable[str] = ()):
+        self.nlp = nlp
+        self.disable: List[str] = [name for name in disable if name in nlp.pipe_names]
+
+    @property
+    def vocab(self):
+        return self.nlp.vocab
+
+    @property
+    def meta(self):
+        return self.nlp.meta
+
+    @property
+    def pipe_names(self) -> List[str]:
+        return [name for name in self.nlp.pipe_names if name not in self.disable]
+
+    def __call__(self, text):
+        return self.nlp(text, disable=self.disable)
+
+    def pipe(self, texts, **kwargs):
+        kwargs.setdefault("disable", self.disable)
+        return self.nlp.pipe(texts, **kwargs)
+
+
+_NLP = None
+_LEMMATIZER: Optional[PipelineView] = None
+_NLP_LOCK = threading.Lock()
+_LOAD_SECONDS: Optional[float] = None
+_LOADED_PID: Optional[int] = None
+_WARMUP_SECONDS: Optional[float] = None
+
+
+def _load_model():
+    """Ładuje model; jeśli brak — pobiera go (jak wcześniej w każdym module)."""
+    try:
+        return spacy.load(SPACY_MODEL)
+    except OSError:
+        print(f"[NLP] ⬇️ Pobieranie modelu {SPACY_MODEL}...")
+        from spacy.cli import download
+        download(SPACY_MODEL)
+        return spacy.load(SPACY_MODEL)
+
+
+def get_nlp():
+    """Zwraca współdzielony pełny pipeline (ładowany leniwie, raz na proces)."""
+    global _NLP, _LOAD_SECONDS, _LOADED_PID
+    if _NLP is not None:
+        return _NLP
+    with _NLP_LOCK:
+        if _NLP is None:
+            if spacy is None:
+                raise RuntimeError("spaCy is not installed")
+            t0 = time.time()
+            _NLP = _load_model()
+            _LOAD_SECONDS = time.time() - t0
+            _LOADED_PID = os.getpid()
+            print(f"[NLP] ✅ spaCy {SPACY_MODEL} loaded in {_LOAD_SECONDS:.1f}s "
+                  f"(pipes: {', '.join(_NLP.pipe_names)})")
+    return _NLP
+
+
+def lemmatizer_disabled_pipes(nlp) -> List[str]:
+    """Komponenty modelu spoza LEMMATIZER_PIPES."""
+    return [name for name in nlp.pipe_names if name not in LEMMATIZER_PIPES]
+
+
+def get_lemmatizer() -> PipelineView:
+    """Widok tylko-lematyzujący (wszystko poza LEMMATIZER_PIPES wyłączone)."""
+    global _LEMMATIZER
+    if _LEMMATIZER is None:
+        nlp = get_nlp()
+        _LEMMATIZER = PipelineView(nlp, lemmatizer_disabled_pipes(nlp))
+    return _LEMMATIZER
+
+
+def is_loaded() -> bool:
+    return _NLP is not None
+
+
+def warm_up() -> dict:
+    """
+    Ładuje model i przepuszcza przez niego tekst rozgrzewkowy (pełny pipeline
+    + widok lematyzujący), żeby leniwe struktury powstały PRZED forkiem.
+    Wywoływane w masterze gunicorna (when_ready w gunicorn.conf.py).
+    """
+    global _WARMUP_SECONDS
+    nlp = get_nlp()
+    t0 = time.time()
+    nlp(_WARMUP_TEXT)
+    get_lemmatizer()(_WARMUP_TEXT.lower())
+    _WARMUP_SECONDS = time.time() - t0
+    return {
+        "load_seconds": round(_LOAD_SECONDS or 0.0, 2),
+        "warmup_seconds": round(_WARMUP_SECONDS, 2),
+        "cold_start_seconds": round((_LOAD_SECONDS or 0.0) + _WARMUP_SECONDS, 2),
+    }
+
+
+def process_memory(pid: Optional[int] = None) -> dict:
+    """
+    RSS procesu w MB z /proc/<pid>/smaps_rollup (Linux): private = strony tylko
+    tego procesu, shared = strony współdzielone z masterem/innymi workerami.
+    """
+    path = f"/proc/{pid or 'self'}/smaps_rollup"
+    fields = {}
+    try:
+        with open(path) as f:
+            for line in f:
+                parts = line.split()
+                if len(parts) >= 2 and parts[0].endswith(":") and parts[1].isdigit():
+                    fields[parts[0][:-1]] = int(parts[1])  # kB
+    except OSError:
+        return {}
+    private_kb = fields.get("Private_Clean", 0) + fields.get("Private_Dirty", 0)
+    shared_kb = fields.get("Shared_Clean", 0) + fields.get("Shared_Dirty", 0)
+    return {
+        "rss_mb": round(fields.get("Rss", 0) / 1024, 1),
+        "pss_mb": round(fields.get("Pss", 0) / 1024, 1),
+        "private_mb": round(private_kb / 1024, 1),
+        "shared_mb": round(shared_kb / 1024, 1),
+    }
+
+
+def model_info() -> dict:
+    """Stan rejestru dla /health."""
+    return {
+        "model": SPACY_MODEL,
+        "loaded": _NLP is not None,
+        "load_seconds": round(_LOAD_SECONDS, 2) if _LOAD_SECONDS is not None else None,
+        "warmup_seconds": round(_WARMUP_SECONDS, 2) if _WARMUP_SECONDS is not None else None,
+        # Model załadowany w innym procesie (master gunicorna) = odziedziczony przez fork
+        "preloaded_in_master": _LOADED_PID is not None and _LOADED_PID != os.getpid(),
+        "pid": os.getpid(),
+        "memory": process_memory(),
+        "pipes": list(_NLP.pipe_names) if _NLP is not None else [],
+        "lemmatizer_pipes": [p for p in LEMMATIZER_PIPES if _NLP is not None and p in _NLP.pipe_names],
+    }
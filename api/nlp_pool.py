@@ -0,0 +1,226 @@
+"""
+===============================================================================
+🏭 NLP POOL v1.0 — pula procesów spaCy dla DocStore (parse poza workerem WWW)
+===============================================================================
+Cały spaCy z perform_ngram_analysis i perform_entity_seo_analysis (DocStore →
+nlp.pipe) liczył się w wątku requestu: jeden ciężki S1 zajmował rdzeń
+i blokował synchronicznego workera gunicorna, a 10 źródeł szło po kolei.
+
+Teraz (opcjonalnie) DocStore oddaje teksty do puli procesów NLP:
+  - każdy proces puli ładuje model RAZ (initializer → nlp_models.get_nlp),
+  - teksty jednego wywołania są rozdzielane na procesy (10 źródeł → równolegle
+    na NLP_POOL_PROCESSES rdzeniach),
+  - wynik wraca jako kompaktowy DocBin (tablice atrybutów: lematy, POS,
+    dependency → noun chunks, encje + stringi) przez multiprocessing
+    shared_memory — przez pipe puli idzie tylko nazwa segmentu i rozmiar
+    (bez picklowania dużego bufora); to NIE jest zero-copy: DocBin.from_bytes
+    rozpakowuje (zlib) dane z segmentu do własnej pamięci procesu WWW,
+  - worker WWW tylko deserializuje Doc-i (get_docs na własnym vocab),
+    więc Entity SEO / n-gramy / salience działają bez zmian.
+Awaria puli (BrokenProcessPool, timeout) → parse w procesie jak wcześniej;
+segmenty porzuconych zadań (także tych, które skończą się PO timeoucie)
+są usuwane (unlink) — inaczej /dev/shm puchłby o DocBin na każdy timeout.
+
+Konfiguracja (env):
+  NLP_POOL_PROCESSES     — liczba procesów (domyślnie 0 = wyłączone)
+  NLP_POOL_START_METHOD  — forkserver / spawn / fork (domyślnie forkserver;
+                           fork z wielowątkowego workera grozi deadlockiem)
+  NLP_POOL_MIN_CHARS     — krótsze wywołania parsowane w procesie (domyślnie 2000)
+  NLP_POOL_TIMEOUT       — s na parse jednego wywołania (domyślnie 120)
+
+Integracja: doc_store.py → DocStore.parse(). Statystyki → /health ("nlp_pool").
+===============================================================================
+"""
+
+import os
+import time
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeout
+from typing import Dict, List, Optional, Sequence
+
+try:
+    from multiprocessing import resource_tracker, shared_memory
+except ImportError:
+    shared_memory = None
+
+try:
+    from spacy.tokens import DocBin
+except ImportError:
+    DocBin = None
+
+try:
+    from .nlp_models import get_nlp
+except ImportError:
+    from nlp_models import get_nlp
+
+NLP_POOL_PROCESSES = int(os.getenv("NLP_POOL_PROCESSES", "0"))
+NLP_POOL_START_METHOD = os.getenv("NLP_POOL_START_METHOD", "forkserver")
+NLP_POOL_MIN_CHARS = int(os.getenv("NLP_POOL_MIN_CHARS", "2000"))
+NLP_POOL_TIMEOUT = float(os.getenv("NLP_POOL_TIMEOUT", "120"))
+NLP_POOL_ENABLED = NLP_POOL_PROCESSES > 0 and DocBin is not None
+
+_STATS_LOCK = threading.Lock()
+_STATS = {"calls": 0, "texts": 0, "bytes": 0, "inline": 0, "fallbacks": 0, "restarts": 0}
+
+
+def _count(field: str, value: int = 1) -> None:
+    with _STATS_LOCK:
+        _STATS[field] += value
+
+
+# ── Strona procesu puli ─────────────────────────────────────────────────────
+def _init_worker() -> None:
+    t0 = time.time()
+    get_nlp()
+    print(f"[NLP_POOL] ✅ Worker {os.getpid()} ready in {time.time() - t0:.1f}s")
+
+
+def _parse_in_worker(texts: List[str], disable: List[str]):
+    """Parse → DocBin → segment shared_memory. Zwraca ("shm", nazwa, rozmiar) albo ("bytes", dane)."""
+    nlp = get_nlp()
+    docs = list(nlp.pipe(texts, disable=disable))
+    data = DocBin(docs=docs, store_user_data=False).to_bytes()
+    if shared_memory is None:
+        return ("bytes", data)
+    shm = shared_memory.SharedMemory(create=True, size=max(1, len(data)))
+    shm.buf[:len(data)] = data
+    name = shm.name
+    shm.close()  # segment żyje dalej — odczyta go i usunie (unlink) proces WWW
+    # Właścicielem jest proces WWW: tracker workera nie może go sprzątać przy wyjściu
+    # (tracker zna nazwę POSIX z wiodącym "/", shm.name zwraca ją bez niego)
+    if os.name == "posix":
+        resource_tracker.unregister(name if name.startswith("/") else "/" + name, "shared_memory")
+    return ("shm", name, len(data))
+
+
+# ── Strona workera WWW ──────────────────────────────────────────────────────
+def _read_result(result):
+    """Wynik zadania → (DocBin, rozmiar). from_bytes czyta z widoku segmentu (rozpakowanie = kopia); segment usuwany."""
+    if result[0] == "bytes":
+        return DocBin().from_bytes(result[1]), len(result[1])
+    _kind, name, size = result
+    shm = shared_memory.SharedMemory(name=name)
+    view = shm.buf[:size]
+    try:
+        return DocBin().from_bytes(view), size
+    finally:
+        view.release()
+        shm.close()
+        shm.unlink()
+
+
+def _unlink_result(result) -> None:
+    """Usuwa segment wyniku bez dekodowania (brak segmentu = już odczytany)."""
+    if result[0] != "shm":
+        return
+    try:
+        shm = shared_memory.SharedMemory(name=result[1])
+    except FileNotFoundError:
+        return
+    shm.close()
+    shm.unlink()
+
+
+def _release_abandoned(future) -> None:
+    """Callback porzuconego zadania: po zakończeniu usuwa jego segment."""
+    if future.cancelled() or future.exception() is not None:
+        return
+    try:
+        _unlink_result(future.result())
+    except Exception:
+        pass
+
+
+def _discard(futures) -> None:
+    """
+    Po błędzie / timeoucie: zwalnia segmenty wszystkich zadań — zakończonych
+    od razu, wciąż trwających przez callback po ich zakończeniu.
+    """
+    for future in futures:
+        if future.cancel():
+            continue
+        future.add_done_callback(_release_abandoned)  # dla zakończonych woła od razu
+
+
+_POOL: Optional[ProcessPoolExecutor] = None
+_POOL_PID: Optional[int] = None
+_POOL_LOCK = threading.Lock()
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    """Pula per worker WWW (nowa po forku — procesów puli nie dziedziczymy)."""
+    global _POOL, _POOL_PID
+    pid = os.getpid()
+    if _POOL is not None and _POOL_PID == pid:
+        return _POOL
+    with _POOL_LOCK:
+        if _POOL is None or _POOL_PID != pid:
+            ctx = multiprocessing.get_context(NLP_POOL_START_METHOD)
+            _POOL = ProcessPoolExecutor(
+                max_workers=NLP_POOL_PROCESSES, mp_context=ctx, initializer=_init_worker
+            )
+            _POOL_PID = pid
+            print(f"[NLP_POOL] ✅ Started {NLP_POOL_PROCESSES} NLP processes "
+                  f"({NLP_POOL_START_METHOD}) for pid {pid}")
+    return _POOL
+
+
+def _reset_pool() -> None:
+    global _POOL
+    with _POOL_LOCK:
+        if _POOL is not None:
+            _POOL.shutdown(wait=False, cancel_futures=True)
+        _POOL = None
+    _count("restarts")
+
+
+def should_offload(texts: Sequence[str]) -> bool:
+    return NLP_POOL_ENABLED and sum(len(t) for t in texts) >= NLP_POOL_MIN_CHARS
+
+
+def parse_docs(nlp, texts: List[str], disable: Sequence[str] = ()) -> Optional[List]:
+    """
+    Parsuje `texts` w puli (po jednym tekście na zadanie → równolegle na
+    procesach) i zwraca Doc-i na vocab `nlp`, wyrównane z `texts`.
+    None → pula niedostępna; wywołujący parsuje w procesie.
+    """
+    if not should_offload(texts):
+        _count("inline")
+        return None
+    _count("calls")
+    futures = []
+    try:
+        pool = _get_pool()
+        futures = [pool.submit(_parse_in_worker, [text], list(disable)) for text in texts]
+        deadline = time.time() + NLP_POOL_TIMEOUT
+        docs = []
+        for future in futures:
+            doc_bin, size = _read_result(future.result(timeout=max(0.0, deadline - time.time())))
+            _count("bytes", size)
+            docs.extend(doc_bin.get_docs(nlp.vocab))
+        _count("texts", len(texts))
+        return docs
+    except FutureTimeout:
+        print(f"[NLP_POOL] ⏱️ Parse exceeded {NLP_POOL_TIMEOUT:g}s — parsing in-process")
+    except Exception as e:
+        print(f"[NLP_POOL] ⚠️ Pool error ({type(e).__name__}: {e}) — parsing in-process")
+    _discard(futures)
+    _count("fallbacks")
+    _reset_pool()
+    return None
+
+
+def nlp_pool_stats() -> Dict:
+    """Statystyki dla /health."""
+    with _STATS_LOCK:
+        stats = dict(_STATS)
+    stats.update({
+        "enabled": NLP_POOL_ENABLED,
+        "processes": NLP_POOL_PROCESSES,
+        "start_method": NLP_POOL_START_METHOD,
+        "shared_memory": shared_memory is not None,
+        "running": _POOL is not None and _POOL_PID == os.getpid(),
+    })
+    return stats
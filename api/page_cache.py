@@ -0,0 +1,171 @@
+"""
+===============================================================================
+📦 PAGE CACHE v1.0 — trwały cache zescrapowanych stron (+ rewalidacja HTTP)
+===============================================================================
+Te same URL-e konkurencji (kancelarie, portale medyczne) wracają w wielu
+keywordach niszy, a _scrape_one za każdym razem pobierał je od nowa
+i przepuszczał przez trafilaturę (najdroższy krok CPU per strona).
+
+Teraz wynik ekstrakcji (content, h2_structure, word_count) ląduje na dysku,
+kluczowany URL-em, razem z walidatorami ETag / Last-Modified:
+  - wpis świeży (< PAGE_CACHE_TTL od ostatniej walidacji) → zwracany bez
+    żadnego requestu,
+  - wpis przeterminowany → conditional GET (If-None-Match /
+    If-Modified-Since); 304 → wpis odświeżony i zwrócony bez trafilatury,
+    200 → normalna ekstrakcja i nadpisanie wpisu,
+  - rozmiar ograniczony PAGE_CACHE_MAX_MB — eviction LRU po mtime
+    (disk_store.LruDir, jak parse_cache.py).
+
+Konfiguracja (env):
+  PAGE_CACHE_ENABLED  — "true"/"false" (domyślnie true)
+  PAGE_CACHE_DIR      — katalog (domyślnie <tmp>/ngram_page_cache)
+  PAGE_CACHE_TTL      — s do rewalidacji (domyślnie 86400)
+  PAGE_CACHE_MAX_MB   — limit rozmiaru (domyślnie 128)
+
+Statystyki → /health ("page_cache").
+===============================================================================
+"""
+
+import os
+import json
+import time
+import hashlib
+import tempfile
+from typing import Dict, Optional
+
+try:
+    from .disk_store import Counters, LruDir, atomic_write, remove_quietly, touch
+except ImportError:
+    from disk_store import Counters, LruDir, atomic_write, remove_quietly, touch
+
+PAGE_CACHE_ENABLED = os.getenv("PAGE_CACHE_ENABLED", "true").lower() == "true"
+PAGE_CACHE_DIR = os.getenv("PAGE_CACHE_DIR", os.path.join(tempfile.gettempdir(), "ngram_page_cache"))
+PAGE_CACHE_TTL = int(os.getenv("PAGE_CACHE_TTL", "86400"))
+PAGE_CACHE_MAX_MB = int(os.getenv("PAGE_CACHE_MAX_MB", "128"))
+
+_CACHED_FIELDS = ("content", "h2_structure", "word_count")
+
+
+class PageCache:
+    """Cache wyników ekstrakcji stron (jeden plik JSON per URL)."""
+
+    def __init__(self, directory: str, max_bytes: int, ttl: int):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.counters = Counters(("fresh_hits", "revalidated", "misses", "writes", "errors"))
+        self._lru = LruDir(directory, max_bytes, ".json")
+
+    def _path(self, url: str) -> str:
+        key = hashlib.sha256(url.encode("utf-8", errors="surrogatepass")).hexdigest()
+        return os.path.join(self.directory, key[:2], f"{key}.json")
+
+    # ── Odczyt ──────────────────────────────────────────────────────────────
+    def get(self, url: str) -> Optional[Dict]:
+        """Wpis (świeży lub nie) albo None. Pole "fresh" mówi, czy trzeba rewalidować."""
+        path = self._path(url)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                entry = json.load(f)
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            self.counters.count("errors")
+            print(f"[PAGE_CACHE] ⚠️ Corrupt entry for {url[:40]}: {e}")
+            remove_quietly(path)
+            return None
+        if entry.get("url") != url:
+            return None  # kolizja hasha — traktujemy jak brak
+        entry["fresh"] = time.time() - entry.get("validated_at", 0) < self.ttl
+        return entry
+
+    def lookup(self, url: str) -> Optional[Dict]:
+        """Jak get(), ale liczy statystyki: świeży wpis = hit, brak = miss."""
+        entry = self.get(url)
+        if entry is None:
+            self.counters.count("misses")
+        elif entry["fresh"]:
+            self.counters.count("fresh_hits")
+            touch(self._path(url))  # LRU: odczyt odświeża mtime
+        return entry
+
+    @staticmethod
+    def conditional_headers(entry: Optional[Dict]) -> Dict:
+        """Nagłówki conditional GET dla przeterminowanego wpisu."""
+        headers = {}
+        if entry:
+            if entry.get("etag"):
+                headers["If-None-Match"] = entry["etag"]
+            if entry.get("last_modified"):
+                headers["If-Modified-Since"] = entry["last_modified"]
+        return headers
+
+    @staticmethod
+    def to_source(entry: Dict, url: str, title: str) -> Dict:
+        """Wpis → źródło S1 (ten sam kształt co wynik scrapingu)."""
+        source = {"url": url, "title": title}
+        source.update({field: entry[field] for field in _CACHED_FIELDS})
+        return source
+
+    # ── Zapis ───────────────────────────────────────────────────────────────
+    def put(self, url: str, source: Dict, etag: Optional[str], last_modified: Optional[str]) -> None:
+        entry = {field: source[field] for field in _CACHED_FIELDS}
+        entry.update({
+            "url": url,
+            "etag": etag,
+            "last_modified": last_modified,
+            "validated_at": time.time(),
+        })
+        try:
+            written = atomic_write(self._path(url), json.dumps(entry, ensure_ascii=False))
+            self.counters.count("writes")
+        except Exception as e:
+            self.counters.count("errors")
+            print(f"[PAGE_CACHE] ⚠️ Write failed for {url[:40]}: {e}")
+            return
+        self._lru.account(written)
+
+    def mark_revalidated(self, entry: Dict, etag: Optional[str], last_modified: Optional[str]) -> None:
+        """304 Not Modified — ten sam content, nowy czas walidacji."""
+        self.counters.count("revalidated")
+        self.put(entry["url"], entry, etag or entry.get("etag"), last_modified or entry.get("last_modified"))
+
+    def stats(self) -> Dict:
+        counts = self.counters.snapshot()
+        hits = counts["fresh_hits"] + counts["revalidated"]
+        lookups = hits + counts["misses"]
+        return {
+            "enabled": True,
+            "directory": self.directory,
+            "ttl_s": self.ttl,
+            "max_mb": round(self.max_bytes / (1024 * 1024), 1),
+            "size_mb": round(self._lru.size_bytes / (1024 * 1024), 2),
+            "fresh_hits": counts["fresh_hits"],
+            "revalidated_304": counts["revalidated"],
+            "misses": counts["misses"],
+            "hit_ratio": round(hits / lookups, 3) if lookups else 0.0,
+            "writes": counts["writes"],
+            "evictions": self._lru.evictions,
+            "errors": counts["errors"],
+        }
+
+
+_PAGE_CACHE: Optional[PageCache] = None
+
+
+def get_page_cache() -> Optional[PageCache]:
+    """Procesowy singleton (None gdy wyłączony)."""
+    global _PAGE_CACHE
+    if not PAGE_CACHE_ENABLED:
+        return None
+    if _PAGE_CACHE is None:
+        _PAGE_CACHE = PageCache(PAGE_CACHE_DIR, PAGE_CACHE_MAX_MB * 1024 * 1024, PAGE_CACHE_TTL)
+    return _PAGE_CACHE
+
+
+def page_cache_stats() -> Dict:
+    """Statystyki dla /health."""
+    cache = get_page_cache()
+    if cache is None:
+        return {"enabled": False}
+    return cache.stats()
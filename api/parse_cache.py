@@ -0,0 +1,149 @@
+"""
+===============================================================================
+💾 PARSE CACHE v1.0 — trwały cache wyników spaCy (DocBin na dysku)
+===============================================================================
+Pisarze odpalają S1 dla tego samego keywordu wiele razy dziennie, a top-10
+URL-i prawie się nie zmienia. Ten moduł zapisuje wynik pipeline'u
+(lematy, POS, dependency, encje) w kompaktowym formacie DocBin, kluczowany
+hashem tekstu + wersją modelu. DocStore sprawdza cache PRZED nlp.pipe.
+
+Konfiguracja (env):
+  PARSE_CACHE_ENABLED  — "true"/"false" (domyślnie true)
+  PARSE_CACHE_DIR      — katalog cache (domyślnie <tmp>/ngram_parse_cache)
+  PARSE_CACHE_MAX_MB   — limit rozmiaru; eviction LRU po mtime (domyślnie 256)
+
+Zapis atomowy i eviction LRU → disk_store.py. Statystyki hit/miss →
+/health ("parse_cache").
+===============================================================================
+"""
+
+import os
+import hashlib
+import tempfile
+from typing import Dict, Optional
+
+try:
+    import spacy
+    from spacy.tokens import DocBin
+except ImportError:
+    spacy = None
+    DocBin = None
+
+try:
+    from .disk_store import Counters, LruDir, atomic_write, remove_quietly, touch
+except ImportError:
+    from disk_store import Counters, LruDir, atomic_write, remove_quietly, touch
+
+PARSE_CACHE_ENABLED = os.getenv("PARSE_CACHE_ENABLED", "true").lower() == "true"
+PARSE_CACHE_DIR = os.getenv("PARSE_CACHE_DIR", os.path.join(tempfile.gettempdir(), "ngram_parse_cache"))
+PARSE_CACHE_MAX_MB = int(os.getenv("PARSE_CACHE_MAX_MB", "256"))
+
+
+class ParseCache:
+    """Content-addressed cache Doc-ów spaCy (jeden plik DocBin per tekst)."""
+
+    def __init__(self, directory: str, max_bytes: int):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.counters = Counters(("hits", "misses", "writes", "errors"))
+        self._lru = LruDir(directory, max_bytes, ".spacy")
+        self._model_tags: Dict[int, str] = {}
+
+    # ── Klucze ──────────────────────────────────────────────────────────────
+    def _model_tag(self, nlp) -> str:
+        """Wersja modelu + aktywne komponenty — zmiana modelu = nowe klucze."""
+        tag = self._model_tags.get(id(nlp))
+        if tag is None:
+            meta = getattr(nlp, "meta", {}) or {}
+            tag = "|".join([
+                getattr(spacy, "__version__", "?") if spacy else "?",
+                f"{meta.get('lang', '?')}_{meta.get('name', '?')}",
+                str(meta.get("version", "?")),
+                ",".join(getattr(nlp, "pipe_names", [])),
+            ])
+            self._model_tags[id(nlp)] = tag
+        return tag
+
+    def key(self, nlp, text: str) -> str:
+        digest = hashlib.sha256()
+        digest.update(self._model_tag(nlp).encode("utf-8"))
+        digest.update(b"\0")
+        digest.update(text.encode("utf-8", errors="surrogatepass"))
+        return digest.hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key[:2], f"{key}.spacy")
+
+    # ── Odczyt / zapis ──────────────────────────────────────────────────────
+    def get(self, nlp, text: str):
+        """Zwraca Doc z cache albo None (miss)."""
+        if DocBin is None:
+            return None
+        path = self._path(self.key(nlp, text))
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+            doc = next(DocBin().from_bytes(data).get_docs(nlp.vocab))
+            touch(path)  # LRU: odczyt odświeża mtime
+            self.counters.count("hits")
+            return doc
+        except FileNotFoundError:
+            self.counters.count("misses")
+            return None
+        except Exception as e:
+            self.counters.count("misses")
+            self.counters.count("errors")
+            print(f"[PARSE_CACHE] ⚠️ Corrupt entry {os.path.basename(path)}: {e}")
+            remove_quietly(path)
+            return None
+
+    def put(self, nlp, text: str, doc) -> None:
+        """Zapisuje Doc jako DocBin (atomowo: tmp + os.replace)."""
+        if DocBin is None:
+            return
+        path = self._path(self.key(nlp, text))
+        try:
+            written = atomic_write(path, DocBin(docs=[doc], store_user_data=False).to_bytes())
+            self.counters.count("writes")
+        except Exception as e:
+            self.counters.count("errors")
+            print(f"[PARSE_CACHE] ⚠️ Write failed: {e}")
+            return
+        self._lru.account(written)
+
+    def stats(self) -> Dict:
+        counts = self.counters.snapshot()
+        lookups = counts["hits"] + counts["misses"]
+        return {
+            "enabled": True,
+            "directory": self.directory,
+            "max_mb": round(self.max_bytes / (1024 * 1024), 1),
+            "size_mb": round(self._lru.size_bytes / (1024 * 1024), 2),
+            "hits": counts["hits"],
+            "misses": counts["misses"],
+            "hit_ratio": round(counts["hits"] / lookups, 3) if lookups else 0.0,
+            "writes": counts["writes"],
+            "evictions": self._lru.evictions,
+            "errors": counts["errors"],
+        }
+
+
+_PARSE_CACHE: Optional[ParseCache] = None
+
+
+def get_parse_cache() -> Optional[ParseCache]:
+    """Procesowy singleton cache (None gdy wyłączony albo brak spaCy)."""
+    global _PARSE_CACHE
+    if not PARSE_CACHE_ENABLED or DocBin is None:
+        return None
+    if _PARSE_CACHE is None:
+        _PARSE_CACHE = ParseCache(PARSE_CACHE_DIR, PARSE_CACHE_MAX_MB * 1024 * 1024)
+    return _PARSE_CACHE
+
+
+def parse_cache_stats() -> Dict:
+    """Statystyki dla /health."""
+    cache = get_parse_cache()
+    if cache is None:
+        return {"enabled": False}
+    return cache.stats()
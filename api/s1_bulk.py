@@ -0,0 +1,113 @@
+"""
+===============================================================================
+🧩 S1 BULK v1.0 — analiza klastra keywordów na wspólnym korpusie
+===============================================================================
+Planowanie klastra = 20-50 pokrewnych keywordów, których SERP-y mocno się
+pokrywają. Osobne wywołania /api/ngram_entity_analysis scrapowały,
+ekstrahowały (trafilatura) i parsowały (spaCy) te same URL-e wielokrotnie.
+
+Tryb bulk:
+  - SERP-y wszystkich keywordów pobierane równolegle (S1_BULK_SERP_WORKERS),
+    bez scrapingu,
+  - BulkCorpus deduplikuje URL-e z wszystkich SERP-ów (normalizacja: bez
+    fragmentu, schematu, "www." i końcowego "/") → każda unikalna strona
+    scrapowana RAZ, jednym przebiegiem silnika scrapingu,
+  - parse spaCy + tokeny n-gramów liczone RAZ per unikalna treść
+    (wspólny DocStore),
+  - agregacja per keyword (n-gramy, encje, luki) bez zmian — na źródłach
+    z jego SERP-u w kolejności rankingu; Doc-i zwalniane, gdy ostatni
+    keyword, który ich używa, skończy (refcount).
+
+Konfiguracja (env):
+  S1_BULK_MAX_KEYWORDS   — maks. keywordów w jednym requeście (domyślnie 50)
+  S1_BULK_SERP_WORKERS   — równoległe pobrania SERP (domyślnie 4)
+
+Integracja: index.py → /api/ngram_entity_analysis/bulk (run_s1_bulk_analysis)
+===============================================================================
+"""
+
+import os
+from typing import Dict, List, Optional
+from urllib.parse import urlsplit
+
+S1_BULK_MAX_KEYWORDS = int(os.getenv("S1_BULK_MAX_KEYWORDS", "50"))
+S1_BULK_SERP_WORKERS = int(os.getenv("S1_BULK_SERP_WORKERS", "4"))
+
+
+def normalize_url(url: str) -> str:
+    """Klucz deduplikacji: host bez "www.", ścieżka bez końcowego "/", query; bez schematu i fragmentu."""
+    parts = urlsplit((url or "").strip())
+    host = parts.netloc.lower()
+    if host.startswith("www."):
+        host = host[4:]
+    path = parts.path.rstrip("/")
+    return f"{host}{path}?{parts.query}" if parts.query else f"{host}{path}"
+
+
+class BulkCorpus:
+    """Unikalne strony z SERP-ów wielu keywordów + przypisanie źródeł do keywordów."""
+
+    def __init__(self):
+        self.targets: Dict[str, Dict] = {}          # klucz URL → item SERP (pierwszy)
+        self.plans: Dict[str, List[tuple]] = {}     # keyword → [(klucz URL, item SERP)] w kolejności rankingu
+        self.sources: Dict[str, Dict] = {}          # klucz URL → zescrapowane źródło
+        self.refcount: Dict[str, int] = {}          # klucz URL → keywordy jeszcze do policzenia
+        self.requested = 0
+
+    def add_keyword(self, keyword: str, scrape_targets: List[Dict]) -> None:
+        plan = []
+        seen = set()
+        for item in scrape_targets:
+            key = normalize_url(item.get("link", ""))
+            if not key or key in seen:
+                continue
+            seen.add(key)
+            plan.append((key, item))
+            self.targets.setdefault(key, item)
+            self.refcount[key] = self.refcount.get(key, 0) + 1
+        self.requested += len(plan)
+        self.plans[keyword] = plan
+
+    def unique_targets(self) -> List[Dict]:
+        return list(self.targets.values())
+
+    def add_source(self, source: Optional[Dict]) -> Optional[Dict]:
+        """Wynik scrapingu (None = odrzucony) → zapamiętany pod kluczem URL."""
+        if source:
+            self.sources[normalize_url(source.get("url", ""))] = source
+        return source
+
+    def sources_for(self, keyword: str, max_total_content: int) -> List[Dict]:
+        """Źródła keywordu w kolejności jego SERP-u (tytuł z jego SERP-u), z limitem treści."""
+        sources = []
+        total = 0
+        for key, item in self.plans.get(keyword, []):
+            source = self.sources.get(key)
+            if source is None or total >= max_total_content:
+                continue
+            # Kopia per keyword: run_s1_analysis dopisuje pola do h2_structure/źródeł
+            sources.append({
+                **source,
+                "title": item.get("title") or source.get("title", ""),
+                "h2_structure": list(source.get("h2_structure", [])),
+            })
+            total += len(source.get("content", ""))
+        return sources
+
+    def release(self, keyword: str) -> List[str]:
+        """Keyword policzony → treści, których nie potrzebuje już żaden keyword."""
+        done = []
+        for key, _item in self.plans.get(keyword, []):
+            self.refcount[key] -= 1
+            if self.refcount[key] == 0 and key in self.sources:
+                done.append(self.sources[key].get("content", ""))
+        return done
+
+    def stats(self) -> Dict:
+        return {
+            "keywords": len(self.plans),
+            "urls_requested": self.requested,
+            "urls_unique": len(self.targets),
+            "urls_scraped": len(self.sources),
+            "dedupe_ratio": round(1 - len(self.targets) / self.requested, 3) if self.requested else 0.0,
+        }
@@ -0,0 +1,230 @@
+"""
+===============================================================================
+⏳ S1 JOBS v1.0 — asynchroniczne zadania S1 (job ID + polling)
+===============================================================================
+Jedno S1 to wywołania SERP, do 8 scrapów po 8 s i ciężkie NLP — request
+/api/ngram_entity_analysis regularnie ocierał się o timeout proxy, a worker
+HTTP był zajęty przez całą analizę.
+
+Tryb job:
+  - POST z "async": true → od razu 202 + job_id (worker HTTP wolny),
+  - analiza (run_s1_analysis) biegnie w procesowej puli S1_JOB_WORKERS
+    wątków; nadmiar czeka w kolejce (do S1_JOB_QUEUE_MAX), zamiast być
+    odrzucany przez proxy,
+  - postęp per etap (serp → scrape → ngrams → entities → gaps → done)
+    zapisywany w pliku statusu — GET /api/jobs/<id> działa z DOWOLNEGO
+    workera gunicorna (pamięci nie dzielą, dysk tak),
+  - gotowy payload w osobnym pliku (status zostaje mały i tani do pollingu).
+
+Pliki JSON zapisywane atomowo (disk_store.write_json). Job, którego proces-
+właściciel zniknął (restart workera), zgłaszany jest jako "lost".
+
+Konfiguracja (env):
+  S1_JOBS_DIR        — katalog (domyślnie <tmp>/ngram_s1_jobs)
+  S1_JOB_WORKERS     — równoległe joby per worker gunicorna (domyślnie 2)
+  S1_JOB_QUEUE_MAX   — maks. jobów w kolejce per worker (domyślnie 32)
+  S1_JOB_TTL         — czas przechowywania jobów w s (domyślnie 3600)
+
+Integracja: index.py → /api/ngram_entity_analysis ("async": true),
+            /api/jobs/<job_id>
+===============================================================================
+"""
+
+import os
+import time
+import uuid
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Optional
+
+try:
+    from .disk_store import pid_alive, read_json, write_json
+except ImportError:
+    from disk_store import pid_alive, read_json, write_json
+
+S1_JOBS_DIR = os.getenv("S1_JOBS_DIR", os.path.join(tempfile.gettempdir(), "ngram_s1_jobs"))
+S1_JOB_WORKERS = int(os.getenv("S1_JOB_WORKERS", "2"))
+S1_JOB_QUEUE_MAX = int(os.getenv("S1_JOB_QUEUE_MAX", "32"))
+S1_JOB_TTL = int(os.getenv("S1_JOB_TTL", "3600"))
+
+# Sprzątanie wygasłych jobów — nie częściej niż raz na 10 min per proces
+_PURGE_INTERVAL = 600
+_last_purge = 0.0
+
+
+class JobQueueFull(Exception):
+    """Kolejka jobów tego workera jest pełna."""
+
+
+# ── Pliki jobów ─────────────────────────────────────────────────────────────
+def _status_path(job_id: str) -> str:
+    return os.path.join(S1_JOBS_DIR, f"{job_id}.json")
+
+
+def _result_path(job_id: str) -> str:
+    return os.path.join(S1_JOBS_DIR, f"{job_id}.result.json")
+
+
+def _write_json(path: str, data: Dict) -> None:
+    write_json(path, data, default=str)
+
+
+def _read_json(path: str) -> Optional[Dict]:
+    return read_json(path, label="S1_JOBS")
+
+
+def _purge_expired() -> None:
+    global _last_purge
+    now = time.time()
+    if now - _last_purge < _PURGE_INTERVAL:
+        return
+    _last_purge = now
+    try:
+        names = os.listdir(S1_JOBS_DIR)
+    except OSError:
+        return
+    for name in names:
+        full = os.path.join(S1_JOBS_DIR, name)
+        try:
+            if now - os.path.getmtime(full) > S1_JOB_TTL:
+                os.remove(full)
+        except OSError:
+            pass
+
+
+# ── Postęp ──────────────────────────────────────────────────────────────────
+class JobProgress:
+    """Callback progress(stage, **info) przekazywany do run_s1_analysis."""
+
+    def __init__(self, status: Dict):
+        self.status = status
+        self._lock = threading.Lock()
+
+    def __call__(self, stage: str, **info) -> None:
+        now = time.time()
+        with self._lock:
+            stages = self.status["stages"]
+            if not stages or stages[-1]["stage"] != stage:
+                if stages:
+                    stages[-1]["seconds"] = round(now - stages[-1]["started_at"], 2)
+                stages.append({"stage": stage, "started_at": now})
+            stages[-1].update(info)
+            self.status["stage"] = stage
+            self.status["updated_at"] = now
+            _write_json(_status_path(self.status["job_id"]), self.status)
+
+    def close(self, state: str, **fields) -> None:
+        now = time.time()
+        with self._lock:
+            stages = self.status["stages"]
+            if stages and "seconds" not in stages[-1]:
+                stages[-1]["seconds"] = round(now - stages[-1]["started_at"], 2)
+            self.status.update(fields)
+            self.status.update({"state": state, "updated_at": now, "finished_at": now})
+            self.status["elapsed_seconds"] = round(now - self.status["started_at"], 2)
+            _write_json(_status_path(self.status["job_id"]), self.status)
+
+
+# ── Wykonawca (procesowy, nowy po forku) ────────────────────────────────────
+_EXECUTOR: Optional[ThreadPoolExecutor] = None
+_EXECUTOR_PID: Optional[int] = None
+_EXECUTOR_LOCK = threading.Lock()
+_QUEUED = 0
+_RUNNING = 0
+_COUNTS_LOCK = threading.Lock()
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _EXECUTOR, _EXECUTOR_PID, _QUEUED, _RUNNING
+    pid = os.getpid()
+    if _EXECUTOR is not None and _EXECUTOR_PID == pid:
+        return _EXECUTOR
+    with _EXECUTOR_LOCK:
+        if _EXECUTOR is None or _EXECUTOR_PID != pid:
+            _EXECUTOR = ThreadPoolExecutor(max_workers=S1_JOB_WORKERS, thread_name_prefix="s1-job")
+            _EXECUTOR_PID = pid
+            _QUEUED = _RUNNING = 0
+    return _EXECUTOR
+
+
+def _run_job(job_id: str, status: Dict, runner: Callable, data: Dict) -> None:
+    global _QUEUED, _RUNNING
+    with _COUNTS_LOCK:
+        _QUEUED -= 1
+        _RUNNING += 1
+    progress = JobProgress(status)
+    status.update({"state": "running", "started_at": time.time()})
+    try:
+        payload, http_status = runner(data, progress=progress)
+        _write_json(_result_path(job_id), payload)
+        progress("done")
+        progress.close("done" if http_status < 400 else "failed", http_status=http_status,
+                       error=payload.get("error") if http_status >= 400 else None)
+        print(f"[S1_JOBS] ✅ Job {job_id} {status['state']} in {status['elapsed_seconds']}s")
+    except Exception as e:
+        print(f"[S1_JOBS] ❌ Job {job_id} crashed: {e}")
+        progress.close("failed", http_status=500, error=str(e))
+    finally:
+        with _COUNTS_LOCK:
+            _RUNNING -= 1
+
+
+def submit_job(runner: Callable, data: Dict, label: str = "") -> Dict:
+    """
+    Kolejkuje runner(data, progress=...) → (payload, http_status).
+    Zwraca status joba; JobQueueFull, gdy kolejka tego workera jest pełna.
+    """
+    global _QUEUED
+    executor = _get_executor()
+    with _COUNTS_LOCK:
+        if _QUEUED >= S1_JOB_QUEUE_MAX:
+            raise JobQueueFull(f"{_QUEUED} jobs already queued (S1_JOB_QUEUE_MAX={S1_JOB_QUEUE_MAX})")
+        _QUEUED += 1
+        queue_position = _QUEUED
+    os.makedirs(S1_JOBS_DIR, exist_ok=True)
+    _purge_expired()
+    job_id = uuid.uuid4().hex
+    now = time.time()
+    status = {
+        "job_id": job_id,
+        "label": label,
+        "state": "queued",
+        "stage": "queued",
+        "stages": [],
+        "queue_position": queue_position,
+        "pid": os.getpid(),
+        "created_at": now,
+        "updated_at": now,
+    }
+    _write_json(_status_path(job_id), status)
+    queued = dict(status)  # kopia przed submit — wątek joba od razu modyfikuje status
+    executor.submit(_run_job, job_id, status, runner, data)
+    print(f"[S1_JOBS] 📥 Job {job_id} queued ({label}, position {queue_position})")
+    return queued
+
+
+def get_job(job_id: str, include_result: bool = True) -> Optional[Dict]:
+    """Status joba (+ payload, gdy gotowy). None = brak / wygasł."""
+    if not job_id.isalnum():
+        return None
+    status = _read_json(_status_path(job_id))
+    if status is None:
+        return None
+    if status["state"] in ("queued", "running") and not pid_alive(status.get("pid", 0)):
+        status["state"] = "lost"
+        status["error"] = "Worker process that owned this job is gone — resubmit"
+    if include_result and status["state"] in ("done", "failed"):
+        status["result"] = _read_json(_result_path(job_id))
+    return status
+
+
+def jobs_stats() -> Dict:
+    """Statystyki dla /health."""
+    return {
+        "workers": S1_JOB_WORKERS,
+        "queue_max": S1_JOB_QUEUE_MAX,
+        "queued": _QUEUED if _EXECUTOR_PID == os.getpid() else 0,
+        "running": _RUNNING if _EXECUTOR_PID == os.getpid() else 0,
+        "ttl_s": S1_JOB_TTL,
+    }
@@ -0,0 +1,87 @@
+"""
+===============================================================================
+📡 S1 STREAM v1.0 — strumieniowa odpowiedź S1 (NDJSON / SSE)
+===============================================================================
+perform_ngram_analysis budował jeden ogromny response_payload (z
+full_text_sample zdublowanym jako serp_content) i oddawał go dopiero po
+WSZYSTKICH etapach — agent GPT czekał na encje, choć PAA i wzorce H2 były
+gotowe kilkanaście sekund wcześniej.
+
+Tryb stream (opt-in: "stream": "ndjson" / "sse" / true w body albo
+?stream=…) wysyła sekcje w kolejności ich ukończenia (iter_s1_sections):
+  serp → length_analysis → ngrams → semantic_keyphrases → entity_seo →
+  causal_triplets → content_gaps → summary → (firestore) → (_timings) → done
+Dane sekcji = klucze top-level pełnej odpowiedzi (klient może je scalić
+dict.update), sekcja jest serializowana i zwalniana zaraz po wysłaniu,
+serp_content (alias full_text_sample) nie jest wysyłany.
+
+Format:
+  ndjson — jedna linia JSON per sekcja: {"section": …, "data": {…}}
+  sse    — event: <sekcja> / data: <JSON>
+Status HTTP to zawsze 200 (nagłówki idą przed analizą) — błąd to sekcja
+"error" z polem status_code; strumień kończy sekcja "done" albo "error".
+
+Integracja: index.py → /api/ngram_entity_analysis, /api/s1_analysis
+===============================================================================
+"""
+
+import json
+import time
+from typing import Dict, Iterable, Iterator, Optional, Tuple
+
+STREAM_FORMATS = {
+    "ndjson": "application/x-ndjson",
+    "sse": "text/event-stream",
+}
+
+# Proxy (nginx) nie buforuje — sekcje docierają do klienta od razu
+STREAM_HEADERS = {
+    "Cache-Control": "no-cache",
+    "X-Accel-Buffering": "no",
+}
+
+
+def stream_format(value) -> Optional[str]:
+    """Wartość "stream" z body / query → "ndjson" / "sse" / None (bez streamingu)."""
+    if value is True:
+        return "ndjson"
+    if isinstance(value, str) and value.lower() in ("1", "true", "ndjson", "sse"):
+        return "sse" if value.lower() == "sse" else "ndjson"
+    return None
+
+
+def encode_section(name: str, data: Dict, fmt: str) -> str:
+    body = json.dumps(data, ensure_ascii=False, default=str)
+    if fmt == "sse":
+        return f"event: {name}\ndata: {body}\n\n"
+    return f'{{"section": {json.dumps(name)}, "data": {body}}}\n'
+
+
+def stream_sections(sections: Iterable[Tuple[str, object]], fmt: str) -> Iterator[str]:
+    """Sekcje (nazwa, dane) z iter_s1_sections → kolejne fragmenty odpowiedzi."""
+    t0 = time.time()
+    sent = 0
+    try:
+        for name, value in sections:
+            if name == "error":
+                payload, status = value
+                yield encode_section("error", {**payload, "status_code": status}, fmt)
+                return
+            if name == "done":
+                yield encode_section("done", {
+                    "status_code": 200,
+                    "sections": sent,
+                    "elapsed_seconds": round(time.time() - t0, 2),
+                }, fmt)
+                print(f"[S1_STREAM] ✅ Streamed {sent} sections in {time.time() - t0:.1f}s")
+                return
+            yield encode_section(name, value, fmt)
+            sent += 1
+    except Exception as e:
+        print(f"[S1_STREAM] ❌ Stream aborted after {sent} sections: {e}")
+        yield encode_section("error", {"error": "Internal Server Error", "details": str(e), "status_code": 500}, fmt)
+    finally:
+        # Klient się rozłączył → zamknij generator analizy (przerywa kolejne etapy)
+        close = getattr(sections, "close", None)
+        if close is not None:
+            close()
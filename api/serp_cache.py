@@ -0,0 +1,242 @@
+"""
+===============================================================================
+🗂️ SERP CACHE v1.0 — cache odpowiedzi SERP (TTL per keyword) + coalescing
+===============================================================================
+fetch_serp_sources woła DataForSEO / SerpAPI (z no_cache) przy KAŻDYM
+requeście S1 — dwóch autorów pytających o ten sam keyword w tej samej
+minucie = dwie płatne odpowiedzi i dwa razy 5-30 s czekania.
+
+Teraz wynik providera (już sparsowany: PAA, AIO, snippet, organic…) jest
+cache'owany na dysku pod kluczem (provider, keyword, location, language,
+num_results):
+  - TTL domyślny SERP_CACHE_TTL, nadpisywany per wywołanie (np. świeższe
+    dane dla keywordów newsowych; ttl=0 → wymuszone odświeżenie),
+  - coalescing: równoległe identyczne zapytania czekają na JEDNO wywołanie
+    upstream — w procesie (Event per klucz), a między workerami gunicorna
+    przez flock na pliku .lock (drugi worker po zdjęciu blokady czyta już
+    gotowy wpis z dysku),
+  - puste / nieudane odpowiedzi NIE są cache'owane (wykrywanie awarii
+    providera działa jak wcześniej),
+  - mtime pliku = czas wygaśnięcia → okresowy sweep usuwa przeterminowane
+    wpisy bez czytania ich treści oraz pliki .lock keywordów, których wpis
+    zniknął, a blokada nie była używana dłużej niż SERP_CACHE_TTL.
+
+UWAGA: cache jest domyślnie WŁĄCZONY — ten sam keyword w ciągu 6 h dostaje
+dane SERP sprzed max. 6 h (bez wywołania providera). Świeże dane:
+"serp_cache_ttl": 0 w body /api/ngram_entity_analysis (i /bulk) — pomija
+odczyt z cache i nadpisuje wpis; SERP_CACHE_ENABLED=false wyłącza całość.
+
+Konfiguracja (env):
+  SERP_CACHE_ENABLED  — "true"/"false" (domyślnie true)
+  SERP_CACHE_DIR      — katalog (domyślnie <tmp>/ngram_serp_cache)
+  SERP_CACHE_TTL      — domyślny TTL w s (domyślnie 21600 = 6 h)
+
+Integracja: index.py → fetch_serp_sources() (_fetch_serpapi_data,
+dataforseo_fetch). Statystyki → /health ("serp_cache").
+===============================================================================
+"""
+
+import os
+import copy
+import json
+import time
+import hashlib
+import tempfile
+import threading
+from typing import Callable, Dict, Optional
+
+try:
+    from .disk_store import Counters, file_lock, remove_lock_if_idle, write_json
+except ImportError:
+    from disk_store import Counters, file_lock, remove_lock_if_idle, write_json
+
+SERP_CACHE_ENABLED = os.getenv("SERP_CACHE_ENABLED", "true").lower() == "true"
+SERP_CACHE_DIR = os.getenv("SERP_CACHE_DIR", os.path.join(tempfile.gettempdir(), "ngram_serp_cache"))
+SERP_CACHE_TTL = int(os.getenv("SERP_CACHE_TTL", "21600"))
+
+_SWEEP_EVERY_WRITES = 200
+
+_STATS = Counters(("hits", "misses", "coalesced", "writes", "not_cached", "errors", "swept"))
+
+
+def _count(field: str, value: int = 1) -> int:
+    return _STATS.count(field, value)
+
+
+def _normalize_keyword(keyword: str) -> str:
+    return " ".join((keyword or "").lower().split())
+
+
+def _cache_key(provider: str, keyword: str, location, language, num_results: int) -> str:
+    raw = json.dumps([provider, _normalize_keyword(keyword), str(location), str(language), num_results])
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def _entry_path(key: str) -> str:
+    return os.path.join(SERP_CACHE_DIR, key[:2], f"{key}.json")
+
+
+# ── Dysk ────────────────────────────────────────────────────────────────────
+def _read(key: str, ttl: int) -> Optional[Dict]:
+    path = _entry_path(key)
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            entry = json.load(f)
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        _count("errors")
+        print(f"[SERP_CACHE] ⚠️ Corrupt entry {key[:12]}: {e}")
+        return None
+    age = time.time() - entry.get("stored_at", 0)
+    if age >= min(ttl, entry.get("ttl", ttl)):
+        return None
+    return entry
+
+
+def _write(key: str, result: Dict, ttl: int, meta: Dict) -> None:
+    now = time.time()
+    entry = {**meta, "stored_at": now, "ttl": ttl, "result": result}
+    try:
+        # mtime = wygaśnięcie wpisu → sweep bez parsowania JSON
+        write_json(_entry_path(key), entry, mtime=now + ttl)
+    except Exception as e:
+        _count("errors")
+        print(f"[SERP_CACHE] ⚠️ Write failed {key[:12]}: {e}")
+        return
+    if _count("writes") % _SWEEP_EVERY_WRITES == 0:
+        _sweep()
+
+
+def _sweep() -> None:
+    """Usuwa wpisy z mtime (= wygaśnięcie) w przeszłości i osierocone pliki .lock."""
+    now = time.time()
+    removed = 0
+    for root, _dirs, files in os.walk(SERP_CACHE_DIR):
+        for name in files:
+            full = os.path.join(root, name)
+            try:
+                if name.endswith(".json") and os.stat(full).st_mtime < now:
+                    os.remove(full)
+                    removed += 1
+                elif name.endswith(".lock") and _remove_orphan_lock(full, now):
+                    removed += 1
+            except OSError:
+                pass
+    if removed:
+        _count("swept", removed)
+        print(f"[SERP_CACHE] 🧹 Swept {removed} expired entries")
+
+
+def _remove_orphan_lock(path: str, now: float) -> bool:
+    """.lock bez wpisu .json, nieużywany dłużej niż SERP_CACHE_TTL → usuwany (gdy wolny)."""
+    entry_path = path[:-len(".lock")] + ".json"
+    if os.path.exists(entry_path) or os.stat(path).st_mtime >= now - SERP_CACHE_TTL:
+        return False
+    return remove_lock_if_idle(path, still_needed=lambda: os.path.exists(entry_path))
+
+
+def _locked(key: str):
+    """Blokada między workerami: jeden proces pyta upstream, reszta czeka."""
+    # mtime .lock = ostatnie użycie (sweep osieroconych)
+    return file_lock(_entry_path(key)[:-len(".json")] + ".lock", touch_on_acquire=True)
+
+
+# ── Coalescing w procesie ───────────────────────────────────────────────────
+class _InFlight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+_INFLIGHT: Dict[str, _InFlight] = {}
+_INFLIGHT_LOCK = threading.Lock()
+
+
+def _is_cacheable(result) -> bool:
+    """Cache'ujemy tylko odpowiedzi z wynikami organicznymi albo PAA."""
+    if not isinstance(result, dict):
+        return False
+    return bool(result.get("organic_results") or result.get("organic_results_raw") or result.get("paa"))
+
+
+def cached_serp_fetch(provider: str, keyword: str, fetch: Callable[[], Dict], *,
+                      location="", language="", num_results: int = 10,
+                      ttl: Optional[int] = None) -> Dict:
+    """
+    Wynik fetch() z cache albo z jednego (współdzielonego) wywołania upstream.
+
+    Args:
+        provider: "dataforseo" / "serpapi" — część klucza
+        keyword, location, language, num_results: parametry zapytania (klucz)
+        fetch: bezargumentowe wywołanie providera
+        ttl: TTL w s dla tego keywordu (None → SERP_CACHE_TTL, 0 → odśwież)
+    """
+    if not SERP_CACHE_ENABLED:
+        return fetch()
+    ttl = SERP_CACHE_TTL if ttl is None else max(0, int(ttl))
+    key = _cache_key(provider, keyword, location, language, num_results)
+
+    if ttl > 0:
+        entry = _read(key, ttl)
+        if entry is not None:
+            _count("hits")
+            age = time.time() - entry["stored_at"]
+            print(f"[SERP_CACHE] 📦 Hit {provider} '{keyword}' (age {age:.0f}s)")
+            return entry["result"]
+
+    with _INFLIGHT_LOCK:
+        flight = _INFLIGHT.get(key)
+        leader = flight is None
+        if leader:
+            flight = _INFLIGHT[key] = _InFlight()
+
+    if not leader:
+        _count("coalesced")
+        print(f"[SERP_CACHE] ⏳ Waiting for in-flight {provider} '{keyword}'")
+        flight.done.wait()
+        if flight.error is not None:
+            raise flight.error
+        return copy.deepcopy(flight.result)
+
+    try:
+        with _locked(key):
+            # Inny worker mógł właśnie zapisać wpis, gdy czekaliśmy na blokadę
+            entry = _read(key, ttl) if ttl > 0 else None
+            if entry is not None:
+                _count("coalesced")
+                result = entry["result"]
+            else:
+                _count("misses")
+                result = fetch()
+                if _is_cacheable(result):
+                    _write(key, result, ttl or SERP_CACHE_TTL, {
+                        "provider": provider, "keyword": keyword,
+                        "location": location, "language": language, "num_results": num_results,
+                    })
+                else:
+                    _count("not_cached")
+        flight.result = copy.deepcopy(result)
+        return result
+    except Exception as e:
+        flight.error = e
+        raise
+    finally:
+        with _INFLIGHT_LOCK:
+            _INFLIGHT.pop(key, None)
+        flight.done.set()
+
+
+def serp_cache_stats() -> Dict:
+    """Statystyki dla /health."""
+    stats = _STATS.snapshot()
+    lookups = stats["hits"] + stats["misses"] + stats["coalesced"]
+    stats.update({
+        "enabled": SERP_CACHE_ENABLED,
+        "directory": SERP_CACHE_DIR,
+        "default_ttl_s": SERP_CACHE_TTL,
+        "in_flight": len(_INFLIGHT),
+        "upstream_saved_ratio": round((stats["hits"] + stats["coalesced"]) / lookups, 3) if lookups else 0.0,
+    })
+    return stats
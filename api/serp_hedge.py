@@ -0,0 +1,153 @@
+"""
+===============================================================================
+🔀 SERP HEDGE v1.0 — równoległe / opóźnione odpalenie drugiego providera SERP
+===============================================================================
+W trybie auto fetch_serp_sources czekał na DataForSEO (timeout 30 s), a SerpAPI
+wołał dopiero PO nim, gdy brakowało PAA / AIO / featured snippet — w
+najgorszym przypadku dwa pełne round-tripy providerów, zanim ruszy scraping.
+
+Tryb hedged (opcjonalny):
+  - "parallel" — primary i secondary startują jednocześnie,
+  - "delay"    — secondary startuje, jeśli primary nie odpowie w
+                 SERP_HEDGE_DELAY s (albo odpowie bez wyników organicznych);
+                 szybka, kompletna odpowiedź primary → zachowanie jak dotąd,
+  - pierwszy provider z wynikami organicznymi „wygrywa” — scraping rusza od
+    razu, a spóźniony provider jest dobierany PO scrapingu (collect_late,
+    maks. SERP_HEDGE_GRACE s) i uzupełnia brakujące pola.
+
+Moduł jest generyczny (nazwa + bezargumentowa funkcja per provider);
+wybór providerów, cache i scalanie pól zostają w index.py.
+
+Konfiguracja (env):
+  SERP_HEDGE_MODE     — "off" / "parallel" / "delay" (domyślnie off)
+  SERP_HEDGE_DELAY    — s do odpalenia secondary w trybie delay (domyślnie 3)
+  SERP_HEDGE_GRACE    — s czekania na spóźnionego providera (domyślnie 5)
+  SERP_HEDGE_WORKERS  — wątki puli wywołań providerów (domyślnie 8)
+===============================================================================
+"""
+
+import os
+import time
+import threading
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from concurrent.futures import TimeoutError as FutureTimeout
+from typing import Callable, Dict, Iterator, Optional, Tuple
+
+SERP_HEDGE_MODE = os.getenv("SERP_HEDGE_MODE", "off").lower()
+SERP_HEDGE_ENABLED = SERP_HEDGE_MODE in ("parallel", "delay")
+SERP_HEDGE_DELAY = float(os.getenv("SERP_HEDGE_DELAY", "3"))
+SERP_HEDGE_GRACE = float(os.getenv("SERP_HEDGE_GRACE", "5"))
+SERP_HEDGE_WORKERS = int(os.getenv("SERP_HEDGE_WORKERS", "8"))
+
+Provider = Tuple[str, Callable[[], Dict]]
+
+_POOL: Optional[ThreadPoolExecutor] = None
+_POOL_PID: Optional[int] = None
+_POOL_LOCK = threading.Lock()
+
+
+def _get_pool() -> ThreadPoolExecutor:
+    """Procesowa pula (nowa po forku — wątki nie przeżywają fork())."""
+    global _POOL, _POOL_PID
+    pid = os.getpid()
+    if _POOL is None or _POOL_PID != pid:
+        with _POOL_LOCK:
+            if _POOL is None or _POOL_PID != pid:
+                _POOL = ThreadPoolExecutor(max_workers=SERP_HEDGE_WORKERS, thread_name_prefix="serp-hedge")
+                _POOL_PID = pid
+    return _POOL
+
+
+def _safe_result(name: str, future, timeout: Optional[float] = None) -> Optional[Dict]:
+    """Wynik providera (None przy błędzie); FutureTimeout tylko, gdy future nie skończył się w `timeout`."""
+    # Najpierw wait — od Pythona 3.11 FutureTimeout to wbudowany TimeoutError,
+    # więc timeout rzucony przez samego providera (socket) nie może go udawać
+    done, _ = wait([future], timeout=timeout)
+    if not done:
+        raise FutureTimeout()
+    try:
+        return future.result()
+    except Exception as e:
+        print(f"[SERP_HEDGE] ⚠️ {name} error: {e}")
+        return None
+
+
+class HedgeOutcome:
+    """
+    Wynik hedged_fetch:
+      provider / result — pierwszy provider z użytecznym wynikiem (albo None),
+      results           — wszystkie zakończone wywołania {nazwa: wynik},
+      pending           — wciąż trwające wywołania {nazwa: future},
+      fired             — nazwy providerów, które faktycznie odpalono.
+    """
+
+    def __init__(self):
+        self.provider: Optional[str] = None
+        self.result: Optional[Dict] = None
+        self.results: Dict[str, Optional[Dict]] = {}
+        self.pending: Dict[str, object] = {}
+        self.fired = []
+        self.started_at = time.time()
+
+    def others(self) -> Dict[str, Optional[Dict]]:
+        """Zakończone wyniki pozostałych providerów."""
+        return {name: res for name, res in self.results.items() if name != self.provider}
+
+    def collect_late(self, grace: float = SERP_HEDGE_GRACE) -> Iterator[Tuple[str, Optional[Dict]]]:
+        """Spóźnieni providerzy, którzy zdążą w `grace` s (reszta dokończy się w tle → serp_cache)."""
+        deadline = time.time() + grace
+        for name, future in list(self.pending.items()):
+            try:
+                result = _safe_result(name, future, timeout=max(0.0, deadline - time.time()))
+            except FutureTimeout:
+                print(f"[SERP_HEDGE] ⏱️ {name} still running after {grace:g}s grace — skipped")
+                continue
+            del self.pending[name]
+            self.results[name] = result
+            yield name, result
+
+
+def hedged_fetch(primary: Provider, secondary: Provider, usable: Callable[[Optional[Dict]], bool],
+                 mode: str = SERP_HEDGE_MODE, delay: float = SERP_HEDGE_DELAY) -> HedgeOutcome:
+    """
+    Odpala primary (i secondary: od razu albo po `delay`) i wraca, gdy
+    pierwszy provider zwróci wynik spełniający `usable` albo gdy wszystkie
+    się zakończą.
+    """
+    pool = _get_pool()
+    outcome = HedgeOutcome()
+    futures = {}
+
+    def fire(provider: Provider):
+        name, fetch = provider
+        futures[pool.submit(fetch)] = name
+        outcome.fired.append(name)
+
+    fire(primary)
+    if mode == "parallel":
+        fire(secondary)
+    else:
+        done, _ = wait(list(futures), timeout=delay)
+        if done:
+            result = _safe_result(primary[0], next(iter(done)))
+            outcome.results[primary[0]] = result
+            if usable(result):
+                outcome.provider, outcome.result = primary[0], result
+                return outcome
+            futures.clear()
+        print(f"[SERP_HEDGE] 🔀 {primary[0]} {'unusable' if done else f'slow (>{delay:g}s)'} — firing {secondary[0]}")
+        fire(secondary)
+
+    remaining = set(futures)
+    while remaining and outcome.provider is None:
+        done, remaining = wait(remaining, return_when=FIRST_COMPLETED)
+        for future in done:
+            name = futures[future]
+            result = _safe_result(name, future)
+            outcome.results[name] = result
+            if outcome.provider is None and usable(result):
+                outcome.provider, outcome.result = name, result
+                print(f"[SERP_HEDGE] 🏁 {name} first with organic results "
+                      f"({time.time() - outcome.started_at:.1f}s)")
+    outcome.pending = {futures[f]: f for f in remaining}
+    return outcome
@@ -0,0 +1,108 @@
+"""
+===============================================================================
+🔁 SOURCE PIPELINE v1.0 — parse spaCy źródeł w trakcie scrapingu
+===============================================================================
+Wcześniej perform_ngram_analysis zaczynał parse (DocStore → nlp.pipe) dopiero
+po zakończeniu CAŁEGO scrapingu — najwolniejsza strona (do SCRAPE_TIMEOUT)
+blokowała całą pracę CPU: czas ≈ max(download) + parse(wszystkie).
+
+Teraz producer/consumer:
+  - fetch_serp_sources oddaje każde przyjęte źródło od razu (on_source),
+  - wątek parsujący bierze je z kolejki i robi DocStore.parse + funkcję
+    `partial(doc)` (np. tokeny raw/lemat dla n-gramów),
+  - po scrapingu finish() czeka tylko na ogon kolejki i zwraca wyniki
+    cząstkowe; scalanie (kolejność źródeł, n-gramy, encje) bez zmian.
+Czas ≈ max(download) + parse(ostatnie).
+
+v1.1: Wątek zabiera z kolejki wszystkie czekające źródła naraz (np. trafienia
+page_cache przychodzą paczką) — z pulą procesów NLP (nlp_pool.py) paczka
+parsuje się równolegle.
+
+Jeden wątek parsujący per request: DocStore nie jest thread-safe, a główny
+wątek dotyka go dopiero po finish(). Błąd w wątku → brak wyniku cząstkowego
+(główny wątek sparsuje dane źródło sam, jak wcześniej).
+
+Konfiguracja (env):
+  SOURCE_PIPELINE_ENABLED  — "true"/"false" (domyślnie true)
+
+Integracja: index.py → perform_ngram_analysis() / fetch_serp_sources(on_source=…)
+===============================================================================
+"""
+
+import os
+import time
+import queue
+import threading
+from typing import Callable, Dict, List, Optional
+
+try:
+    from .metrics import bind
+except ImportError:
+    from metrics import bind
+
+SOURCE_PIPELINE_ENABLED = os.getenv("SOURCE_PIPELINE_ENABLED", "true").lower() == "true"
+
+_STOP = object()
+
+
+class SourcePipeline:
+    """Wątek parsujący źródła S1 w miarę ich napływania ze scrapingu."""
+
+    def __init__(self, doc_store, partial: Optional[Callable] = None):
+        self.doc_store = doc_store
+        self.partial = partial
+        self.partials: Dict[str, object] = {}
+        self.submitted = 0
+        self.parsed = 0
+        self.errors = 0
+        self._queue = queue.Queue()
+        self._finished = None
+        # Czasy parse z wątku trafiają do _timings requestu (metrics.bind)
+        self._thread = threading.Thread(target=bind(self._run), name="s1-source-parse", daemon=True)
+        self._thread.start()
+
+    def submit(self, source: Dict) -> None:
+        """Callback producenta (on_source) — tylko kolejkuje."""
+        content = source.get("content", "") or ""
+        if content.strip():
+            self.submitted += 1
+            self._queue.put(content)
+
+    def _drain(self) -> List:
+        """Blokuje na pierwszym elemencie, potem zabiera wszystko, co już czeka."""
+        batch = [self._queue.get()]
+        while True:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                return batch
+
+    def _run(self) -> None:
+        while True:
+            batch = self._drain()
+            contents = [item for item in batch if item is not _STOP]
+            if contents:
+                try:
+                    # v1.1: Paczka naraz — z nlp_pool.py parsowana równolegle na procesach
+                    docs = self.doc_store.parse(contents)
+                    if self.partial is not None:
+                        for content, doc in zip(contents, docs):
+                            self.partials[content] = self.partial(doc)
+                    self.parsed += len(contents)
+                except Exception as e:
+                    self.errors += 1
+                    print(f"[S1] ⚠️ Source pipeline parse error: {e}")
+            if len(contents) < len(batch):
+                return
+
+    def finish(self) -> Dict[str, object]:
+        """Czeka na resztę kolejki; zwraca {content: wynik partial(doc)}."""
+        if self._finished is None:
+            t0 = time.time()
+            pending = self._queue.qsize()
+            self._queue.put(_STOP)
+            self._thread.join()
+            self._finished = time.time() - t0
+            print(f"[S1] 🔁 Source pipeline: {self.parsed}/{self.submitted} sources parsed, "
+                  f"tail of {pending} waited {self._finished:.2f}s ({self.errors} errors)")
+        return self.partials
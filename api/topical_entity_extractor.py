@@ -245,6 +245,7 @@ def extract_topical_entities(
     max_entities: int = 30,
     min_frequency: int = 2,
     min_sources: int = 1,
+    docs: List = None,
 ) -> List[TopicalEntity]:
     """
     Wyciąga topical/concept entities z tekstów konkurencji.
@@ -260,6 +261,8 @@ def extract_topical_entities(
         max_entities: Max encji do zwrócenia
         min_frequency: Min częstość (suma ze wszystkich źródeł)
         min_sources: Min ile źródeł musi zawierać frazę
+        docs: Opcjonalne Doc-i z DocStore (wyrównane z texts) — bez ponownego nlp();
+              ich tekst to _clean_text_for_nlp(text)[:50000], nie surowy text[:50000]
     
     Returns:
         Lista TopicalEntity posortowana po importance
@@ -293,11 +296,14 @@ def extract_topical_entities(
         if not text or len(text) < 100:
             continue
         
-        # Limit tekstu dla wydajności
-        text_sample = text[:50000]
-        
         try:
-            doc = nlp(text_sample)
+            if docs is not None:
+                doc = docs[idx]
+                text_sample = doc.text
+            else:
+                # Limit tekstu dla wydajności
+                text_sample = text[:50000]
+                doc = nlp(text_sample)
 
             # Polish spaCy models don't support noun_chunks,
             # so we build them from POS tags (NOUN/PROPN/ADJ sequences)
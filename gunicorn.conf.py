@@ -0,0 +1,53 @@
+# ================================================================
+# v56.3: Gunicorn config — preload spaCy w masterze, fork copy-on-write
+#
+# Master importuje api.index (preload_app), ładuje i rozgrzewa model spaCy
+# (nlp_models.warm_up), zamraża GC i dopiero wtedy forkuje workery.
+# Workery współdzielą read-only strony vocab + wag zamiast ładować własną
+# kopię. Cold start i prywatny RSS per worker lądują w logach i w /health.
+#
+# Start: gunicorn -c gunicorn.conf.py api.index:app
+# Env: PORT, WEB_CONCURRENCY (workers), GUNICORN_PRELOAD ("true"/"false")
+# ================================================================
+import gc
+import os
+import time
+
+bind = f"0.0.0.0:{os.getenv('PORT', '10000')}"
+workers = int(os.getenv("WEB_CONCURRENCY", "2"))
+preload_app = os.getenv("GUNICORN_PRELOAD", "true").lower() == "true"
+
+_MASTER_START = time.time()
+
+
+def when_ready(server):
+    """Master: aplikacja już zaimportowana (preload) — rozgrzej model przed forkiem."""
+    if not preload_app:
+        server.log.info("[S1] ℹ️ Preload disabled — each worker loads spaCy lazily")
+        return
+    from api.nlp_models import warm_up, process_memory
+    stats = warm_up()
+    # Obiekty z preloadu → permanent generation: GC workerów ich nie dotyka,
+    # więc strony nie są kopiowane (copy-on-write) przy pierwszym gc.collect()
+    gc.freeze()
+    mem = process_memory()
+    server.log.info(
+        f"[S1] ✅ Preloaded spaCy in master: load={stats['load_seconds']}s "
+        f"warmup={stats['warmup_seconds']}s cold_start={time.time() - _MASTER_START:.1f}s "
+        f"rss={mem.get('rss_mb')}MB"
+    )
+
+
+def post_fork(server, worker):
+    worker._s1_forked_at = time.time()
+
+
+def post_worker_init(worker):
+    from api.nlp_models import process_memory
+    mem = process_memory()
+    boot = time.time() - getattr(worker, "_s1_forked_at", time.time())
+    worker.log.info(
+        f"[S1] 👷 Worker {worker.pid} ready in {boot:.2f}s: "
+        f"private={mem.get('private_mb')}MB shared={mem.get('shared_mb')}MB "
+        f"pss={mem.get('pss_mb')}MB"
+    )
@@ -1,20 +1,19 @@
 # Plik: api/lemmatize_and_count.py
 
 import json
-import spacy
 from http.server import BaseHTTPRequestHandler
 
-# Ładujemy model spaCy tylko raz przy starcie serwera
+# Model spaCy: współdzielony rejestr (jedna kopia na proces), widok bez parsera i NER
 try:
-    NLP = spacy.load("pl_core_news_sm")
-except OSError:
-    from spacy.cli import download
-    download("pl_core_news_sm")
-    NLP = spacy.load("pl_core_news_sm")
+    from api.nlp_models import get_lemmatizer
+    from api.keyword_matcher import KeywordMatcher
+except ImportError:
+    from nlp_models import get_lemmatizer
+    from keyword_matcher import KeywordMatcher
 
 def lemmatize_text(text):
     """Zwraca listę lematów z tekstu (bez znaków interpunkcyjnych)."""
-    doc = NLP(text.lower())
+    doc = get_lemmatizer()(text.lower())
     return [token.lemma_ for token in doc if token.is_alpha]
 
 class handler(BaseHTTPRequestHandler):
@@ -43,20 +42,21 @@ class handler(BaseHTTPRequestHandler):
             # Lematyzujemy cały tekst (lista lematów)
             text_lemmas = lemmatize_text(text_to_process)
 
-            keyword_counts = {}
+            # Lematyzacja fraz kluczowych (jeden nlp.pipe zamiast nlp() per fraza)
+            keywords_to_find = [str(kw) for kw in keywords_to_find]
+            keyword_docs = get_lemmatizer().pipe([kw.lower() for kw in keywords_to_find])
+            keyword_lemmas = {
+                kw: [token.lemma_ for token in doc if token.is_alpha]
+                for kw, doc in zip(keywords_to_find, keyword_docs)
+            }
 
-            for keyword in keywords_to_find:
-                # Lematyzacja frazy kluczowej
-                keyword_lemmas = lemmatize_text(keyword)
-                kw_len = len(keyword_lemmas)
-                count = 0
-
-                # Przesuwamy się po tekście i sprawdzamy pełne dopasowania sekwencji
-                for i in range(len(text_lemmas) - kw_len + 1):
-                    if text_lemmas[i:i + kw_len] == keyword_lemmas:
-                        count += 1
-
-                keyword_counts[keyword] = count
+            # Wszystkie pełne dopasowania sekwencji w jednym przebiegu (Aho–Corasick)
+            keyword_counts = KeywordMatcher(keyword_lemmas).count_all(text_lemmas)
+            # Fraza bez lematów (same cyfry / interpunkcja): okno przesuwne dopasowywało
+            # pustą listę na każdej pozycji → len + 1; zachowane dla zgodności odpowiedzi
+            for kw, lemmas in keyword_lemmas.items():
+                if not lemmas:
+                    keyword_counts[kw] = len(text_lemmas) + 1
 
             # Wysyłamy odpowiedź
             self.send_response(200)
@@ -0,0 +1,51 @@
+"""
+Testy modułów api/ importowanych bezpośrednio (jak w lemmatize_and_count.py:
+fallback z importu względnego) — bez firebase_admin i bez modelu spaCy.
+"""
+
+import os
+import re
+import sys
+
+import pytest
+
+API_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "api")
+if API_DIR not in sys.path:
+    sys.path.insert(0, API_DIR)
+
+
+# ── Atrapa lematyzatora (generate_compliance_report, compliance_session) ───
+class _Token:
+    def __init__(self, text):
+        self.text = text
+        self.is_alpha = text.isalpha()
+        self.lemma_ = text[:5]  # deterministyczny "lemat" — wystarczy do porównań
+
+
+class FakeLemmatizer:
+    """Interfejs get_lemmatizer(): nlp(text) i nlp.pipe(texts)."""
+
+    def __init__(self):
+        self.calls = 0
+        self.texts = 0
+
+    def __call__(self, text):
+        self.calls += 1
+        self.texts += 1
+        return [_Token(t) for t in re.findall(r"\w+|[^\w\s]", text)]
+
+    def pipe(self, texts, n_process=1):
+        self.calls += 1
+        texts = list(texts)
+        self.texts += len(texts)
+        return [[_Token(t) for t in re.findall(r"\w+|[^\w\s]", text)] for text in texts]
+
+
+@pytest.fixture
+def lemmatizer(monkeypatch):
+    import generate_compliance_report as gcr
+
+    fake = FakeLemmatizer()
+    monkeypatch.setattr(gcr, "get_lemmatizer", lambda: fake)
+    monkeypatch.setattr(gcr, "_KEYWORD_LEMMA_CACHE", {})
+    return fake
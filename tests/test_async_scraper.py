@@ -0,0 +1,205 @@
+"""
+iter_scrape_pages_async na lokalnym serwerze aiohttp: wyniki w kolejności
+ukończenia, conditional GET / 304, odrzucenie nie-HTML, timeout strony,
+deadline requestu i anulowanie pobrań po close() generatora.
+"""
+
+import asyncio
+import threading
+import time
+
+import pytest
+
+aiohttp = pytest.importorskip("aiohttp")
+from aiohttp import web
+
+import async_scraper
+
+PAGE = b"<html><body><h2>Koszty rozwodu</h2><p>" + "treść ".encode("utf-8") * 200 + b"</p></body></html>"
+
+
+class Server:
+    """Serwer testowy w osobnym wątku (własna pętla — niezależna od pętli scrapera)."""
+
+    def __init__(self):
+        self.disconnected = []           # ścieżki, których klient zerwał połączenie
+        self.requests = []               # (ścieżka, nagłówki)
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever, daemon=True)
+        self.thread.start()
+        self.runner = self._call(self._start())
+
+    def _call(self, coro):
+        return asyncio.run_coroutine_threadsafe(coro, self.loop).result(10)
+
+    async def _start(self):
+        self.release = asyncio.Event()  # stop(): wiszące handlery kończą się od razu
+        app = web.Application()
+        app.router.add_get("/page/{name}", self.page)
+        app.router.add_get("/delayed/{seconds}", self.delayed)
+        app.router.add_get("/hanging/{name}", self.hanging)
+        app.router.add_get("/stalled", self.stalled)
+        app.router.add_get("/file.pdf", self.pdf)
+        runner = web.AppRunner(app)
+        await runner.setup()
+        site = web.TCPSite(runner, "127.0.0.1", 0)
+        await site.start()
+        self.port = runner.addresses[0][1]
+        return runner
+
+    def url(self, path):
+        return f"http://127.0.0.1:{self.port}{path}"
+
+    def stop(self):
+        self.loop.call_soon_threadsafe(self.release.set)
+        self._call(self.runner.cleanup())
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join(5)
+
+    async def page(self, request):
+        self.requests.append((request.path, dict(request.headers)))
+        if request.headers.get("If-None-Match") == '"v1"':
+            return web.Response(status=304, headers={"ETag": '"v1"'})
+        return web.Response(body=PAGE, content_type="text/html",
+                            headers={"ETag": '"v1"', "Last-Modified": "Mon, 01 Jan 2024 00:00:00 GMT"})
+
+    async def delayed(self, request):
+        await asyncio.sleep(float(request.match_info["seconds"]))
+        return web.Response(body=PAGE, content_type="text/html")
+
+    async def hanging(self, request):
+        """Body sączone bez końca — zerwanie połączenia przez klienta widać przy zapisie."""
+        resp = web.StreamResponse(headers={"Content-Type": "text/html"})
+        await resp.prepare(request)
+        try:
+            while not self.release.is_set():
+                await resp.write(b"<p>.</p>")
+                await asyncio.sleep(0.05)
+        except (ConnectionResetError, asyncio.CancelledError):
+            self.disconnected.append(request.path)
+            raise
+        return resp
+
+    async def stalled(self, request):
+        resp = web.StreamResponse(headers={"Content-Type": "text/html"})
+        await resp.prepare(request)
+        await self.release.wait()
+        return resp
+
+    async def pdf(self, request):
+        return web.Response(body=b"%PDF-1.4" * 1000, content_type="application/pdf")
+
+
+@pytest.fixture
+def server():
+    srv = Server()
+    yield srv
+    srv.stop()
+
+
+@pytest.fixture
+def runtime(monkeypatch):
+    """Świeża pętla scrapera na test (limit per host > 1 — wszystkie strony to 127.0.0.1)."""
+    monkeypatch.setattr(async_scraper, "SCRAPE_PER_DOMAIN", 8)
+    monkeypatch.setattr(async_scraper, "_RUNTIME", None)
+    yield
+    rt = async_scraper._RUNTIME
+    if rt is not None:
+        asyncio.run_coroutine_threadsafe(rt.session.close(), rt.loop).result(5)
+        rt.loop.call_soon_threadsafe(rt.loop.stop)
+        rt.extract_pool.shutdown(wait=True)
+
+
+def _process(item, page):
+    """Jak _extract_scraped_page: 200 → źródło, 304 → znacznik, reszta → None."""
+    if page.status == 304:
+        return {"url": page.url, "not_modified": True, "etag": page.etag}
+    if page.status != 200:
+        return None
+    return {"url": page.url, "h2": page.h2_raw, "size": len(page.body), "etag": page.etag}
+
+
+def _stat(name):
+    return async_scraper.async_scraper_stats()[name]
+
+
+def _wait_for(condition, timeout=5.0):
+    deadline = time.time() + timeout
+    while not condition() and time.time() < deadline:
+        time.sleep(0.02)
+    return condition()
+
+
+def test_results_in_completion_order_with_conditional_get(server, runtime):
+    items = [{"link": server.url("/delayed/0.4")}, {"link": server.url("/page/a")},
+             {"link": server.url("/page/b"), "etag": '"v1"'}, {"link": server.url("/file.pdf")}]
+
+    def headers(item):
+        return {"User-Agent": "test", **({"If-None-Match": item["etag"]} if "etag" in item else {})}
+
+    rejected = _stat("rejected")
+    results = async_scraper.scrape_pages_async(items, _process, headers, timeout=5, deadline=10)
+
+    assert len(results) == 4
+    assert results[-1]["url"] == server.url("/delayed/0.4")  # najwolniejsza na końcu
+    by_url = {r["url"]: r for r in results if r}
+    assert by_url[server.url("/page/a")] == {"url": server.url("/page/a"), "h2": [b"Koszty rozwodu"],
+                                            "size": len(PAGE), "etag": '"v1"'}
+    assert by_url[server.url("/page/b")] == {"url": server.url("/page/b"), "not_modified": True, "etag": '"v1"'}
+    assert results.count(None) == 1 and _stat("rejected") == rejected + 1  # PDF odrzucony po nagłówkach
+    sent = dict(server.requests)
+    assert sent["/page/b"]["If-None-Match"] == '"v1"' and "If-None-Match" not in sent["/page/a"]
+
+
+def test_stalled_page_times_out_without_blocking_others(server, runtime):
+    timeouts = _stat("timeouts")
+    processed = []
+
+    def process(item, page):
+        processed.append(page.url)
+        return _process(item, page)
+
+    t0 = time.time()
+    results = async_scraper.scrape_pages_async(
+        [{"link": server.url("/stalled")}, {"link": server.url("/page/a")}], process, {}, timeout=0.3, deadline=10)
+    assert time.time() - t0 < 3
+    assert results[0]["url"] == server.url("/page/a") and results[1] is None
+    assert processed == [server.url("/page/a")]
+    assert _stat("timeouts") == timeouts + 1
+
+
+def test_request_deadline_cancels_unfinished_pages(server, runtime):
+    deadline_hits, cancelled = _stat("deadline_hits"), _stat("cancelled")
+    items = [{"link": server.url("/page/a")}, {"link": server.url("/hanging/1")}, {"link": server.url("/hanging/2")}]
+
+    t0 = time.time()
+    results = async_scraper.scrape_pages_async(items, _process, {}, timeout=10, deadline=0.5)
+    elapsed = time.time() - t0
+
+    assert 0.5 <= elapsed < 3  # deadline requestu, a nie timeout strony
+    assert [r["url"] for r in results] == [server.url("/page/a")]  # anulowane nie trafiają do wyników
+    assert _stat("deadline_hits") == deadline_hits + 1
+    assert _wait_for(lambda: _stat("cancelled") == cancelled + 2)
+    assert _wait_for(lambda: sorted(server.disconnected) == ["/hanging/1", "/hanging/2"])
+
+
+def test_close_cancels_in_flight_pages(server, runtime):
+    cancelled = _stat("cancelled")
+    processed = []
+
+    def process(item, page):
+        processed.append(page.url)
+        return _process(item, page)
+
+    items = [{"link": server.url("/page/a")}, {"link": server.url("/hanging/1")}, {"link": server.url("/hanging/2")}]
+    results = async_scraper.iter_scrape_pages_async(items, process, {}, timeout=10, deadline=30)
+    assert next(results)["url"] == server.url("/page/a")
+
+    t0 = time.time()
+    results.close()  # klient się rozłączył — GeneratorExit w wątku Flask
+    assert time.time() - t0 < 1
+
+    # Pobieranie reszty stron anulowane na pętli, połączenia zerwane, brak ekstrakcji
+    assert _wait_for(lambda: _stat("cancelled") == cancelled + 2)
+    assert _wait_for(lambda: sorted(server.disconnected) == ["/hanging/1", "/hanging/2"])
+    assert processed == [server.url("/page/a")]
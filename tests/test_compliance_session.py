@@ -0,0 +1,176 @@
+"""
+compliance_session z atrapą lematyzatora: zakładanie sesji, kontynuacja
+z deltami, reset, wygaśnięcie i sprzątanie plików .lock.
+"""
+
+import os
+import time
+
+import pytest
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+import compliance_session as cs
+import generate_compliance_report as gcr
+
+
+STATE = "alimenty: 1-3\nsąd okręgowy: 2\nrozwód: 0-1"
+
+
+@pytest.fixture
+def sessions(tmp_path, monkeypatch, lemmatizer):
+    monkeypatch.setattr(cs, "COMPLIANCE_SESSION_DIR", str(tmp_path))
+    monkeypatch.setattr(cs, "_last_purge", 0.0)
+    monkeypatch.setattr(cs, "_MATCHER_CACHE", cs.OrderedDict())
+    return tmp_path
+
+
+def _files(directory):
+    return sorted(os.listdir(directory))
+
+
+def test_start_scores_first_batch_and_persists_state(sessions):
+    result = cs.generate_compliance_report_session("art-1", "Alimenty i jeszcze alimenty.", STATE)
+    assert result["keyword_deltas"] == {"alimenty": {"used": 2, "total": 2, "min": 0, "max": 1}}
+    assert [entry["keyword"] for entry in result["compliance_report"]] == ["alimenty"]
+    assert result["session"] == {"article_id": "art-1", "batches": 1, "keywords": 3,
+                                 "pending_min": 1, "exhausted": 0}
+
+    key = cs._session_key("art-1")
+    assert _files(sessions) == [f"{key}.json", f"{key}.lock"]
+    stored = cs.get_session("art-1")
+    assert stored["counts"] == {"alimenty": 2, "sąd okręgowy": 0, "rozwód": 0}
+    assert stored["keyword_state"]["alimenty"] == {"min": 0, "max": 1}
+
+
+def test_continue_sends_only_deltas_and_matches_stateless_chain(sessions):
+    batches = ["Alimenty.", "Sąd okręgowy orzekł. Sąd okręgowy.", "Alimenty, alimenty, rozwód."]
+    state = gcr._parse_keyword_state(STATE)
+    keyword_lemmas = gcr._lemmatize_keywords(list(state))
+
+    cs.generate_compliance_report_session("art-2", batches[0], STATE)
+    state = gcr._score_batch_lemmas(gcr._lemmatize_text_to_list(batches[0]), state, keyword_lemmas)[1]
+    for text in batches[1:]:
+        result = cs.generate_compliance_report_session("art-2", text)
+        report, new_state = gcr._score_batch_lemmas(gcr._lemmatize_text_to_list(text), state, keyword_lemmas)
+        # Tylko frazy trafione w batchu
+        assert result["compliance_report"] == [entry for entry in report if entry["actual_in_batch"]]
+        for keyword, delta in result["keyword_deltas"].items():
+            assert (delta["min"], delta["max"]) == (new_state[keyword]["min"], new_state[keyword]["max"])
+        state = new_state
+
+    session = cs.get_session("art-2")
+    assert session["keyword_state"] == state
+    assert session["batches"] == 3
+    assert session["counts"] == {"alimenty": 3, "sąd okręgowy": 2, "rozwód": 1}
+
+
+def test_empty_batch_returns_summary_without_writing(sessions):
+    cs.generate_compliance_report_session("art-3", "", STATE)
+    result = cs.generate_compliance_report_session("art-3", "")
+    assert result["keyword_deltas"] == {}
+    assert result["session"]["batches"] == 0
+
+
+def test_missing_session_asks_for_keyword_state(sessions):
+    result = cs.generate_compliance_report_session("nope", "Alimenty.")
+    assert result["session_missing"] is True
+
+
+def test_keyword_state_resets_session(sessions):
+    cs.generate_compliance_report_session("art-4", "Alimenty.", STATE)
+    first = cs.get_session("art-4")
+    result = cs.generate_compliance_report_session("art-4", "Rozwód.", "rozwód: 1-2")
+    assert result["keyword_deltas"] == {"rozwód": {"used": 1, "total": 1, "min": 0, "max": 1}}
+    session = cs.get_session("art-4")
+    assert session["created_at"] > first["created_at"]
+    assert session["counts"] == {"rozwód": 1}
+    assert session["batches"] == 1
+
+
+def test_batch_after_concurrent_reset_is_rejected(sessions, monkeypatch):
+    cs.generate_compliance_report_session("art-5", "", STATE)
+    stale = cs.get_session("art-5")
+    cs.start_session("art-5", STATE)  # reset w innym workerze — nowy created_at
+    reads = iter([stale])
+    real_read = cs._read
+    # Pierwszy odczyt (poza blokadą) widzi starą sesję, odczyt pod blokadą — nową
+    monkeypatch.setattr(cs, "_read", lambda article_id: next(reads, None) or real_read(article_id))
+    result = cs.generate_compliance_report_session("art-5", "Alimenty.")
+    assert result["session_missing"] is True
+    assert cs.get_session("art-5")["batches"] == 0
+
+
+def test_expired_session_is_missing_and_purged_with_its_lock(sessions, monkeypatch):
+    cs.generate_compliance_report_session("old", "Alimenty.", STATE)
+    cs.generate_compliance_report_session("fresh", "", STATE)
+    key = cs._session_key("old")
+    session = cs.get_session("old")
+    session["updated_at"] -= cs.COMPLIANCE_SESSION_TTL + 10
+    cs._write(session)
+    past = time.time() - cs.COMPLIANCE_SESSION_TTL - 10
+    os.utime(os.path.join(sessions, f"{key}.json"), (past, past))
+    orphan_tmp = os.path.join(sessions, "x.json.1.2.tmp")
+    open(orphan_tmp, "w").close()
+    os.utime(orphan_tmp, (past, past))
+
+    assert cs.generate_compliance_report_session("old", "Alimenty.")["session_missing"] is True
+    monkeypatch.setattr(cs, "_last_purge", 0.0)
+    cs._purge_expired()
+    fresh_key = cs._session_key("fresh")
+    assert _files(sessions) == [f"{fresh_key}.json", f"{fresh_key}.lock"]
+
+
+def test_purge_runs_at_most_once_per_interval(sessions, monkeypatch):
+    calls = []
+    monkeypatch.setattr(cs.os, "listdir", lambda path: calls.append(path) or [])
+    cs._purge_expired()
+    cs._purge_expired()
+    assert len(calls) == 1
+
+
+def test_delete_session_removes_json_and_lock(sessions):
+    cs.generate_compliance_report_session("art-6", "Alimenty.", STATE)
+    assert cs.delete_session("art-6") is True
+    assert _files(sessions) == []
+    assert cs.delete_session("art-6") is False
+    assert cs.get_session("art-6") is None
+
+
+@pytest.mark.skipif(fcntl is None, reason="flock niedostępny")
+def test_delete_session_keeps_lock_that_is_in_use(sessions, monkeypatch):
+    cs.generate_compliance_report_session("art-7", "", STATE)
+    lock_path = cs._lock_path(cs._session_key("art-7"))
+    real_remove = cs.remove_lock_if_idle
+
+    def remove_while_held(path, still_needed):
+        # Inny worker zdążył wziąć blokadę po naszym zwolnieniu
+        with open(path, "a") as holder:
+            fcntl.flock(holder, fcntl.LOCK_EX)
+            return real_remove(path, still_needed)
+
+    monkeypatch.setattr(cs, "remove_lock_if_idle", remove_while_held)
+    assert cs.delete_session("art-7") is True
+    assert _files(sessions) == [os.path.basename(lock_path)]
+
+    monkeypatch.setattr(cs, "remove_lock_if_idle", real_remove)
+    assert cs.delete_session("art-7") is False
+    assert _files(sessions) == []
+
+
+def test_delete_session_keeps_lock_of_recreated_session(sessions, monkeypatch):
+    cs.generate_compliance_report_session("art-8", "", STATE)
+    real_remove = cs.remove_lock_if_idle
+
+    def recreate_then_remove(path, still_needed):
+        cs.start_session("art-8", STATE)  # nowa sesja między zwolnieniem a sprzątaniem
+        return real_remove(path, still_needed)
+
+    monkeypatch.setattr(cs, "remove_lock_if_idle", recreate_then_remove)
+    cs.delete_session("art-8")
+    key = cs._session_key("art-8")
+    assert _files(sessions) == [f"{key}.json", f"{key}.lock"]
+    assert cs.generate_compliance_report_session("art-8", "Alimenty.")["keyword_deltas"]["alimenty"]["total"] == 1
@@ -0,0 +1,81 @@
+"""disk_store: zapis atomowy, flock z kontrolą i-węzła, eviction LRU, liczniki."""
+
+import os
+import threading
+import time
+
+import disk_store
+from disk_store import Counters, LruDir, atomic_write, file_lock, read_json, remove_lock_if_idle, write_json
+
+
+def test_atomic_write_creates_dirs_sets_mtime_and_leaves_no_tmp(tmp_path):
+    path = str(tmp_path / "ab" / "entry.json")
+    written = write_json(path, {"fraza": "sąd"}, mtime=1_000_000)
+    assert read_json(path) == {"fraza": "sąd"}
+    assert written == os.path.getsize(path)
+    assert os.path.getmtime(path) == 1_000_000
+    assert os.listdir(tmp_path / "ab") == ["entry.json"]
+
+
+def test_read_json_missing_or_corrupt(tmp_path):
+    assert read_json(str(tmp_path / "missing.json")) is None
+    atomic_write(str(tmp_path / "bad.json"), "{nie json")
+    assert read_json(str(tmp_path / "bad.json")) is None
+
+
+def test_lru_dir_evicts_oldest_to_target_ratio(tmp_path):
+    lru = LruDir(str(tmp_path), max_bytes=1000, suffix=".bin")
+    for i in range(12):
+        path = str(tmp_path / f"{i:02d}.bin")
+        lru.account(atomic_write(path, b"x" * 100, mtime=1_000_000 + i))
+    # 11. zapis przekracza limit → eviction do 900 B; 12. mieści się w limicie
+    assert sorted(os.listdir(tmp_path)) == [f"{i:02d}.bin" for i in range(2, 12)]
+    assert lru.evictions == 2
+    assert lru.size_bytes == 1000
+
+
+def test_file_lock_follows_lock_removed_while_waiting(tmp_path):
+    lock_path = str(tmp_path / "k.lock")
+    acquired = []
+
+    def waiter():
+        with file_lock(lock_path) as lock_file:
+            acquired.append(os.fstat(lock_file.fileno()).st_ino)
+
+    with file_lock(lock_path):
+        thread = threading.Thread(target=waiter)
+        thread.start()
+        time.sleep(0.2)
+        os.remove(lock_path)  # jak sprzątanie pod trzymaną blokadą
+    thread.join(5)
+    assert acquired == [os.stat(lock_path).st_ino]  # blokada na NOWYM pliku
+
+
+def test_remove_lock_if_idle(tmp_path):
+    lock_path = str(tmp_path / "k.lock")
+    with file_lock(lock_path):
+        assert remove_lock_if_idle(lock_path) is False  # w użyciu
+    assert remove_lock_if_idle(lock_path, still_needed=lambda: True) is False
+    assert remove_lock_if_idle(lock_path) is True
+    assert not os.path.exists(lock_path)
+
+
+def test_counters_thread_safe():
+    counters = Counters(("hits", "misses"))
+
+    def hit():
+        for _ in range(1000):
+            counters.count("hits")
+
+    threads = [threading.Thread(target=hit) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert counters.snapshot() == {"hits": 8000, "misses": 0}
+    assert counters.count("misses", 5) == 5
+
+
+def test_pid_alive():
+    assert disk_store.pid_alive(os.getpid())
+    assert not disk_store.pid_alive(2 ** 22 + 12345)
@@ -0,0 +1,128 @@
+"""
+_extract_scraped_page (index.py): FetchedPage → źródło S1. Wymaga pełnego
+środowiska aplikacji (firebase_admin, Flask) — bez niego test jest pomijany.
+"""
+
+import json
+import time
+
+import pytest
+
+index = pytest.importorskip("index")
+
+from async_scraper import FetchedPage, H2Collector
+from page_cache import PageCache
+
+
+def _page(html, status=200, url="https://example.com/a", etag=None, last_modified=None):
+    body = html.encode("utf-8")
+    collector = H2Collector()
+    collector.feed(body)
+    return FetchedPage(url, status, "text/html; charset=utf-8", body, False, time.time(),
+                       collector.headings, etag, last_modified)
+
+
+@pytest.fixture
+def no_trafilatura(monkeypatch):
+    monkeypatch.setattr(index, "TRAFILATURA_AVAILABLE", False)
+    monkeypatch.setattr(index, "get_page_cache", lambda: None)
+
+
+def test_fallback_text_and_h2_from_small_page(no_trafilatura):
+    html = ("<html><head><style>p{color:red}</style></head><body><nav>menu</nav>"
+            "<h2>Pierwszy <b>nagłówek</b></h2><p>" + "treść akapitu " * 60 + "</p>"
+            "<script>var x = 1;</script><h2>Drugi</h2></body></html>")
+    source = index._extract_scraped_page({"title": "T"}, _page(html))
+    assert source["h2_structure"] == ["Pierwszy nagłówek", "Drugi"]
+    assert source["content"] == index.extract_html(html).text[:index.MAX_CONTENT_SIZE]
+    assert "menu" not in source["content"] and "var x" not in source["content"]
+
+
+def test_fallback_on_large_page_uses_truncated_prefix(no_trafilatura):
+    limit = index.MAX_CONTENT_SIZE
+    head = "<script>" + "x" * limit + "</script>"  # wycinane przed przycięciem
+    # Dużo znaczników bez tekstu — OGON zaczyna się za MAX_CONTENT_SIZE * 3
+    prefix = "<p>" + "słowo " * 200 + "<i></i>" * (limit * 3 // 7) + "</p>"
+    tail = "<p>" + "OGON " * 200 + "</p>"
+    html = head + prefix + tail
+    assert len(html) > limit * 2
+
+    source = index._extract_scraped_page({"title": "T"}, _page(html))
+    stripped = index.extract_html(html).html[:limit * 3]
+    assert source["content"] == index.extract_html(stripped).text[:limit]
+    assert "x" * 100 not in source["content"]
+    assert "OGON" not in source["content"]
+
+
+def test_non_200_and_short_pages_are_dropped(no_trafilatura):
+    assert index._extract_scraped_page({}, _page("<p>ok</p>", status=404)) is None
+    assert index._extract_scraped_page({}, _page("<p>za krótko</p>")) is None
+
+
+@pytest.fixture
+def page_cache(tmp_path, monkeypatch):
+    cache = PageCache(str(tmp_path / "pages"), max_bytes=10 * 1024 * 1024, ttl=60)
+    monkeypatch.setattr(index, "TRAFILATURA_AVAILABLE", False)
+    monkeypatch.setattr(index, "get_page_cache", lambda: cache)
+    return cache
+
+
+def _stale(cache, url, etag='"v1"'):
+    """Wpis z treścią, ale walidowany godzinę temu (ttl 60 s)."""
+    cache.put(url, {"url": url, "title": "T", "content": "z cache " * 100,
+                    "h2_structure": ["Z cache"], "word_count": 200}, etag, None)
+    entry = cache.get(url)
+    entry["validated_at"] -= 3600
+    with open(cache._path(url), "w", encoding="utf-8") as f:
+        json.dump(entry, f)
+    stale = cache.lookup(url)
+    assert stale["fresh"] is False
+    return stale
+
+
+def test_304_serves_cached_content_and_revalidates(page_cache):
+    url = "https://example.com/a"
+    stale = _stale(page_cache, url)
+    item = {"title": "Nowy", "link": url, "_page_cache": stale}
+    assert index._request_headers(item)["If-None-Match"] == '"v1"'
+
+    source = index._extract_scraped_page(item, _page("", status=304, url=url, etag='"v2"'))
+    assert source["content"] == "z cache " * 100 and source["title"] == "Nowy"
+    entry = page_cache.lookup(url)
+    assert entry["fresh"] is True and entry["etag"] == '"v2"'
+    assert page_cache.stats()["revalidated_304"] == 1
+
+
+def test_304_without_cached_entry_is_dropped(page_cache):
+    assert index._extract_scraped_page({"title": "T"}, _page("", status=304)) is None
+    assert "If-None-Match" not in index._request_headers({"link": "https://example.com/a"})
+
+
+def test_200_refreshes_the_cache(page_cache):
+    url = "https://example.com/a"
+    stale = _stale(page_cache, url)
+    html = "<h2>Nowy</h2><p>" + "nowa treść " * 80 + "</p>"
+    item = {"title": "T", "link": url, "_page_cache": stale}
+    source = index._extract_scraped_page(item, _page(html, url=url, etag='"v3"'))
+    entry = page_cache.lookup(url)
+    assert entry["fresh"] is True and entry["etag"] == '"v3"'
+    assert entry["content"] == source["content"] and "nowa treść" in entry["content"]
+
+
+def test_scrape_pages_yields_fresh_hits_and_forwards_stale_entries(page_cache, monkeypatch):
+    fresh_url, stale_url = "https://example.com/fresh", "https://example.com/stale"
+    page_cache.put(fresh_url, {"url": fresh_url, "title": "T", "content": "świeże " * 100,
+                               "h2_structure": [], "word_count": 100}, None, None)
+    _stale(page_cache, stale_url)
+    fetched = []
+    monkeypatch.setattr(index, "ASYNC_SCRAPER_ENABLED", False)
+    monkeypatch.setattr(index, "_scrape_one", lambda item: fetched.append(item) or None)
+
+    results = list(index._scrape_pages([{"link": fresh_url, "title": "A"},
+                                        {"link": stale_url, "title": "B"},
+                                        {"link": "https://example.com/new", "title": "C"}]))
+    assert results[0]["url"] == fresh_url and results[0]["title"] == "A"
+    by_link = {item["link"]: item for item in fetched}
+    assert set(by_link) == {stale_url, "https://example.com/new"}  # świeży wpis bez requestu
+    assert by_link[stale_url]["_page_cache"]["etag"] == '"v1"'
+    assert "_page_cache" not in by_link["https://example.com/new"]
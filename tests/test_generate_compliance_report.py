@@ -0,0 +1,193 @@
+"""
+generate_compliance_report z atrapą lematyzatora (bez modelu spaCy):
+wsadowa lematyzacja fraz + memo vs lematyzacja per fraza, prefiltrowany
+fuzzy match vs stara pętla po oknach.
+"""
+
+import random
+
+from rapidfuzz import fuzz
+
+import generate_compliance_report as gcr
+
+
+KEYWORDS = ["Adwokat rozwodowy", "sąd okręgowy", "alimenty", "podział majątku 2024", "alimenty", "!!!"]
+
+
+def test_batched_keyword_lemmas_match_per_keyword(lemmatizer):
+    expected = {kw: gcr._lemmatize_text_to_list(kw) for kw in KEYWORDS}
+    assert gcr._lemmatize_keywords(KEYWORDS) == expected
+    assert expected["!!!"] == []
+
+
+def test_keyword_lemmas_are_memoized_in_one_pipe_call(lemmatizer):
+    gcr._lemmatize_keywords(KEYWORDS)
+    assert lemmatizer.calls == 1
+    assert lemmatizer.texts == len(set(KEYWORDS))  # duplikaty lematyzowane raz
+    gcr._lemmatize_keywords(KEYWORDS[:3])
+    assert lemmatizer.calls == 1
+    gcr._lemmatize_keywords(KEYWORDS + ["nowa fraza"])
+    assert (lemmatizer.calls, lemmatizer.texts) == (2, len(set(KEYWORDS)) + 1)
+
+
+def test_memo_is_bounded(lemmatizer, monkeypatch):
+    monkeypatch.setattr(gcr, "KEYWORD_LEMMA_CACHE_MAX", 3)
+    gcr._lemmatize_keywords(["a", "b"])
+    result = gcr._lemmatize_keywords(["c", "d"])
+    assert result == {"c": ["c"], "d": ["d"]}
+    assert set(gcr._KEYWORD_LEMMA_CACHE) == {"c", "d"}
+
+
+STATE = "adwokat rozwodowy: 1-3\nsąd okręgowy: 2-4\nalimenty: 0-2"
+TEXTS = [
+    "Adwokat rozwodowy pomoże. Sąd okręgowy orzeka rozwód, a adwokat rozwodowy doradzi.",
+    "",
+    "Alimenty, alimenty i jeszcze raz alimenty. Sąd okręgowy ustala alimenty.",
+    "Adwokat rozwodowego postępowania i sądy okręgowe.",
+]
+
+
+def test_chained_batch_equals_consecutive_single_calls(lemmatizer):
+    batch = gcr.generate_compliance_report_batch(TEXTS, STATE, chain=True)
+    state = STATE
+    for idx, text in enumerate(TEXTS):
+        single = gcr.generate_compliance_report(text, state)
+        assert batch["results"][idx]["compliance_report"] == single["compliance_report"]
+        assert batch["results"][idx]["new_keyword_state"] == single["new_keyword_state"]
+        state = single["new_keyword_state"]
+    assert batch["new_keyword_state"] == state
+
+
+def test_unchained_batch_scores_every_text_from_input_state(lemmatizer):
+    batch = gcr.generate_compliance_report_batch(TEXTS, STATE, chain=False)
+    for idx, text in enumerate(TEXTS):
+        single = gcr.generate_compliance_report(text, STATE)
+        assert batch["results"][idx]["compliance_report"] == single["compliance_report"]
+    assert batch["chain"] is False
+    assert batch["new_keyword_state"] == gcr._parse_keyword_state(STATE)
+
+
+def test_batch_rejects_non_string_texts(lemmatizer):
+    assert "error" in gcr.generate_compliance_report_batch(["ok", 3], STATE)
+
+
+# --- Fuzzy: prefiltrowane okna + cdist vs pętla token_set_ratio po każdym oknie ---
+
+
+def _reference_fuzzy(keyword_lemmas, text_lemmas, exact_spans, max_hits,
+                     threshold=gcr.FUZZY_SIMILARITY_THRESHOLD,
+                     max_expansion=gcr.MAX_FUZZY_WINDOW_EXPANSION):
+    """Stare _count_fuzzy_matches (przed prefiltrem)."""
+    if max_hits <= 0:
+        return 0
+    kw_len, text_len = len(keyword_lemmas), len(text_lemmas)
+    if kw_len == 0 or text_len == 0:
+        return 0
+    kw_str = " ".join(keyword_lemmas)
+    used_positions = set()
+    for s, e in exact_spans:
+        used_positions.update(range(s, e))
+    fuzzy_count = 0
+    for start in range(text_len):
+        for extra in range(max_expansion + 1):
+            end = start + kw_len + extra
+            if end > text_len:
+                break
+            window_positions = range(start, end)
+            if any(pos in used_positions for pos in window_positions):
+                continue
+            if fuzz.token_set_ratio(kw_str, " ".join(text_lemmas[start:end])) >= threshold:
+                fuzzy_count += 1
+                used_positions.update(window_positions)
+                if fuzzy_count >= max_hits:
+                    return fuzzy_count
+                break
+    return fuzzy_count
+
+
+def _mutate(rng, word):
+    """Literówka: zamiana / usunięcie / wstawienie znaku, czasem sklejenie lub rozcięcie."""
+    op = rng.randrange(5)
+    i = rng.randrange(len(word) + 1)
+    if op == 0 and word:
+        return word[:i] + word[i + 1:]
+    if op == 1:
+        return word[:i] + rng.choice("aeiouz") + word[i:]
+    if op == 2 and i < len(word):
+        return word[:i] + rng.choice("aeiouz") + word[i + 1:]
+    return word
+
+
+def _random_case(rng):
+    vocab = ["adwokat", "rozwodowy", "warszawa", "sąd", "okręgowy", "alimenty", "dziecko",
+             "ab", "abc", "abcd", "efgh", "ijkl", "x", "dom", "domy", "podział", "majątek"]
+    keyword = [rng.choice(vocab) for _ in range(rng.randint(1, 3))]
+    text = []
+    for _ in range(rng.randint(0, 40)):
+        roll = rng.random()
+        if roll < 0.25:
+            # Fraza (z literówkami / wstawkami) — pozytywne okna
+            for word in keyword:
+                text.append(_mutate(rng, word) if rng.random() < 0.5 else word)
+                if rng.random() < 0.2:
+                    text.append(rng.choice(vocab))
+        elif roll < 0.35:
+            # Fraza pocięta na kawałki — wiele lematów, żaden sam nie jest bliski
+            joined = "".join(keyword)
+            cuts = sorted(rng.sample(range(1, len(joined)), min(3, len(joined) - 1))) if len(joined) > 1 else []
+            text.extend(joined[a:b] for a, b in zip([0] + cuts, cuts + [len(joined)]))
+        else:
+            text.append(rng.choice(vocab))
+    exact_spans = []
+    for _ in range(rng.randint(0, 2)):
+        if text:
+            start = rng.randrange(len(text))
+            exact_spans.append((start, min(len(text), start + len(keyword))))
+    return keyword, text, exact_spans, rng.randint(0, 6)
+
+
+def test_fuzzy_split_keyword_counterexample():
+    keyword, text = ["abcdefghijkl"], ["x", "abcd", "efgh", "ijkl", "x"]
+    assert _reference_fuzzy(keyword, text, [], 5) == 1
+    assert gcr._count_fuzzy_matches(keyword, text, [], 5) == 1
+
+
+def test_fuzzy_adversarial_inputs_match_reference():
+    cases = [
+        (["abcdefghijkl"], ["abcdef", "ghijkl"]),
+        (["abc", "def"], ["abcdef"]),
+        (["ab cd"], ["ab", "cd", "ab cd"]),              # lemat ze spacją
+        (["dom", "dom"], ["dom", "dom", "domy"]),        # powtórzone lematy
+        (["abcd"], ["", "abcd", "", "abce"]),            # puste lematy
+        (["adwokat", "rozwodowy"], ["adwokat", "adwokat", "rozwodowy"]),
+        (["a"], ["a", "b", "a", "aa"]),
+        (["x"], []),
+        ([], ["x"]),
+        (["   "], ["x", "y"]),
+    ]
+    for keyword, text in cases:
+        for max_hits in (0, 1, 3):
+            assert gcr._count_fuzzy_matches(keyword, text, [], max_hits) == \
+                _reference_fuzzy(keyword, text, [], max_hits), (keyword, text, max_hits)
+
+
+def test_fuzzy_random_inputs_match_reference():
+    rng = random.Random(5)
+    for _ in range(1500):
+        keyword, text, spans, max_hits = _random_case(rng)
+        threshold = rng.choice([gcr.FUZZY_SIMILARITY_THRESHOLD, 70, 50])
+        expected = _reference_fuzzy(keyword, text, spans, max_hits, threshold=threshold)
+        got = gcr._count_fuzzy_matches(keyword, text, spans, max_hits, threshold=threshold)
+        assert got == expected, (keyword, text, spans, max_hits, threshold)
+
+
+def test_fuzzy_shared_index_matches_reference():
+    rng = random.Random(9)
+    for _ in range(200):
+        keywords = [_random_case(rng)[0] for _ in range(4)]
+        _keyword, text, _spans, _hits = _random_case(rng)
+        text = text + [w for kw in keywords for w in kw]
+        index = gcr._FuzzyIndex(text, keywords[:2])  # reszta fraz dokładana w locie
+        for keyword in keywords:
+            assert gcr._count_fuzzy_matches(keyword, text, [], 10, fuzzy_index=index) == \
+                _reference_fuzzy(keyword, text, [], 10)
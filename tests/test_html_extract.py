@@ -0,0 +1,79 @@
+"""extract_html (jeden skaner) vs łańcuch re.sub, który zastąpił."""
+
+import re
+
+from html_extract import extract_html
+
+_FLAGS = re.DOTALL | re.IGNORECASE
+
+
+def _old_strip_heavy(html):
+    for tag in ("script", "style", "svg", "noscript"):
+        html = re.sub(rf'<{tag}[^>]*>.*?</{tag}>', '', html, flags=_FLAGS)
+    return re.sub(r'<!--.*?-->', '', html, flags=re.DOTALL)
+
+
+def _old_fallback_text(html):
+    content = html
+    for tag in ("script", "style", "nav", "footer", "header", "aside"):
+        content = re.sub(rf'<{tag}[^>]*>.*?</{tag}>', '', content, flags=_FLAGS)
+    content = re.sub(r'\{[^}]{0,500}\}', ' ', content)
+    content = re.sub(r'<[^>]+>', ' ', content)
+    return re.sub(r'\s+', ' ', content).strip()
+
+
+def _old_h2(html):
+    return [re.sub(r'<[^>]+>', '', h).strip() for h in re.findall(r'<h2[^>]*>(.*?)</h2>', html, _FLAGS)]
+
+
+PAGE = """<!DOCTYPE html>
+<html><head>
+<title>Rozwód — poradnik</title>
+<style>.a { color: red; } h2 { margin: 0 }</style>
+<script type="text/javascript">var x = "<h2>nie nagłówek</h2>";</script>
+</head>
+<body>
+<!-- <h2>zakomentowany</h2> -->
+<header class="top"><nav><a href="/">Start</a></nav><h1>Kancelaria</h1></header>
+<main>
+  <h2 id="a">Jak wygląda <b>rozwód</b>?</h2>
+  <p>Sąd orzeka rozwód, gdy nastąpił <em>zupełny</em> i trwały rozkład pożycia.</p>
+  <svg viewBox="0 0 10 10"><text>ikonka</text></svg>
+  <H2>Alimenty na dziecko</H2>
+  <p>Wysokość alimentów { zależy } od potrzeb dziecka.</p>
+  <noscript>Włącz JavaScript</noscript>
+  <aside><h2>Polecane</h2><p>Reklama</p></aside>
+  <h3>Koszty</h3><p>Opłata od pozwu wynosi 600 zł.</p>
+</main>
+<footer><p>© Kancelaria</p><script>track()</script></footer>
+</body></html>"""
+
+
+def test_html_has_heavy_subtrees_removed():
+    page = extract_html(PAGE)
+    assert page.html == _old_strip_heavy(PAGE)
+    for fragment in ("var x", "color: red", "ikonka", "Włącz JavaScript", "zakomentowany", "track()"):
+        assert fragment not in page.html
+    assert "<nav>" in page.html and "<footer>" in page.html  # layout zostaje dla trafilatury
+
+
+def test_fallback_text_matches_regex_chain():
+    page = extract_html(PAGE)
+    assert page.text == _old_fallback_text(_old_strip_heavy(PAGE))
+    assert "Reklama" not in page.text and "Start" not in page.text
+    assert "Opłata od pozwu wynosi 600 zł." in page.text
+
+
+def test_headings_in_document_order():
+    page = extract_html(PAGE)
+    assert page.headings["h2"] == ["Jak wygląda rozwód?", "Alimenty na dziecko", "Polecane"]
+    assert page.headings["h2"] == _old_h2(_old_strip_heavy(PAGE))
+    assert page.headings["h1"] == ["Kancelaria"]
+    assert page.headings["h3"] == ["Koszty"]
+
+
+def test_plain_text_and_unclosed_tags():
+    assert extract_html("tylko tekst").text == "tylko tekst"
+    page = extract_html("<p>przed</p><script>niezamknięty")
+    assert page.html == _old_strip_heavy("<p>przed</p><script>niezamknięty")
+    assert extract_html("").text == ""
@@ -0,0 +1,64 @@
+"""KeywordMatcher (Aho–Corasick) vs okno przesuwne, które zastąpił."""
+
+import random
+
+from keyword_matcher import KeywordMatcher
+
+
+def _sliding_window(text_lemmas, keyword_lemmas):
+    """Okno z generate_compliance_report (kw_len > 0) — spany pełnych dopasowań."""
+    kw_len = len(keyword_lemmas)
+    if kw_len == 0:
+        return []
+    return [(i, i + kw_len) for i in range(len(text_lemmas) - kw_len + 1)
+            if text_lemmas[i:i + kw_len] == keyword_lemmas]
+
+
+def test_overlapping_and_nested_phrases():
+    patterns = {
+        "aa": ["a", "a"],
+        "aaa": ["a", "a", "a"],
+        "ab": ["a", "b"],
+        "bab": ["b", "a", "b"],
+        "b": ["b"],
+    }
+    text = ["a", "a", "a", "b", "a", "b", "x", "a", "a"]
+    spans = KeywordMatcher(patterns).find_all(text)
+    for key, lemmas in patterns.items():
+        assert spans[key] == _sliding_window(text, lemmas), key
+
+
+def test_random_texts_match_sliding_window():
+    rng = random.Random(1234)
+    vocab = ["adwokat", "rozwodowy", "sąd", "sprawa", "alimenty", "x"]
+    for _ in range(200):
+        patterns = {
+            f"p{i}": [rng.choice(vocab) for _ in range(rng.randint(1, 4))]
+            for i in range(rng.randint(1, 8))
+        }
+        text = [rng.choice(vocab) for _ in range(rng.randint(0, 60))]
+        matcher = KeywordMatcher(patterns)
+        spans = matcher.find_all(text)
+        counts = matcher.count_all(text)
+        for key, lemmas in patterns.items():
+            expected = _sliding_window(text, lemmas)
+            assert spans[key] == expected
+            assert counts[key] == len(expected)
+
+
+def test_duplicate_phrases_counted_independently():
+    matcher = KeywordMatcher({"a": ["sąd", "rejonowy"], "b": ["sąd", "rejonowy"]})
+    counts = matcher.count_all(["sąd", "rejonowy", "sąd", "rejonowy"])
+    assert counts == {"a": 2, "b": 2}
+
+
+def test_empty_phrase_never_matches():
+    matcher = KeywordMatcher({"": [], "sąd": ["sąd"]})
+    assert matcher.count_all(["sąd", "sąd"]) == {"": 0, "sąd": 2}
+
+
+def test_lemma_id():
+    matcher = KeywordMatcher({"k": ["adwokat", "rozwodowy"]})
+    assert matcher.lemma_id("adwokat") == 0
+    assert matcher.lemma_id("rozwodowy") == 1
+    assert matcher.lemma_id("sąd") == -1
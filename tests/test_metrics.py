@@ -0,0 +1,121 @@
+"""
+metrics: scalanie snapshotów workerów, dosumowanie martwego workera do
+dead.json (liczniki monotoniczne, bez podwójnego liczenia) i bind()
+przenoszący kolektor requestu do innego wątku.
+"""
+
+import json
+import os
+import subprocess
+import sys
+import threading
+
+import pytest
+
+import metrics
+
+STAGE = {"stage": "tfidf"}
+KEY = metrics._labels_key(STAGE)
+
+
+@pytest.fixture(autouse=True)
+def metrics_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(metrics, "METRICS_DIR", str(tmp_path))
+    monkeypatch.setattr(metrics, "METRICS_ENABLED", True)
+    monkeypatch.setattr(metrics, "METRICS_FLUSH_INTERVAL", 3600)
+    monkeypatch.setattr(metrics, "_last_flush", 1e18)  # snapshot tylko jawnie (_flush / _merged_series)
+    monkeypatch.setattr(metrics, "_HIST", {})
+    monkeypatch.setattr(metrics, "_HIST_PID", os.getpid())
+    return tmp_path
+
+
+def _dead_pid():
+    proc = subprocess.Popen([sys.executable, "-c", "pass"])
+    proc.wait()
+    assert not metrics.pid_alive(proc.pid)
+    return proc.pid
+
+
+def _write_snapshot(pid, seconds):
+    """Snapshot obcego workera z obserwacjami `seconds` etapu tfidf."""
+    buckets = [sum(1 for s in seconds if s <= bound) for bound in metrics.BUCKETS]
+    series = {KEY: {"labels": STAGE, "buckets": buckets, "sum": float(sum(seconds)), "count": len(seconds)}}
+    metrics.write_json(metrics._snapshot_path(pid), {"pid": pid, "series": series})
+
+
+def _count(series):
+    return series[KEY]["count"] if KEY in series else 0
+
+
+def test_merges_live_worker_snapshots():
+    metrics.observe("tfidf", 0.02)
+    metrics.observe("tfidf", 3.0)
+    _write_snapshot(os.getppid(), [0.02, 0.5, 200.0])  # żywy proces = inny worker
+
+    merged = metrics._merged_series()[KEY]
+    assert merged["count"] == 5
+    assert merged["sum"] == pytest.approx(203.54)
+    index = {bound: i for i, bound in enumerate(metrics.BUCKETS)}
+    assert merged["buckets"][index[0.025]] == 2
+    assert merged["buckets"][index[5]] == 4
+    assert merged["buckets"][-1] == 4  # 200 s tylko w +Inf (= count)
+
+    text = metrics.render_prometheus()
+    assert 's1_stage_duration_seconds_bucket{stage="tfidf",le="+Inf"} 5' in text
+    assert 's1_stage_duration_seconds_count{stage="tfidf"} 5' in text
+
+
+def test_dead_worker_is_folded_once_and_counters_stay_monotonic(metrics_dir):
+    metrics.observe("tfidf", 0.1)
+    first, second = _dead_pid(), _dead_pid()
+    _write_snapshot(first, [0.1, 0.2])
+    assert _count(metrics._merged_series()) == 3
+
+    # Snapshot martwego workera przeniesiony do dead.json i usunięty
+    assert not os.path.exists(metrics._snapshot_path(first))
+    with open(metrics_dir / metrics._DEAD_FILE, encoding="utf-8") as f:
+        assert _count(json.load(f)["series"]) == 2
+
+    # Kolejne scrape'y: bez podwójnego liczenia; następny martwy worker dosumowany
+    assert _count(metrics._merged_series()) == 3
+    metrics._fold_dead([first])  # drugi worker /metrics z nieaktualną listą — no-op
+    _write_snapshot(second, [1.0])
+    assert _count(metrics._merged_series()) == 4
+    metrics.observe("tfidf", 0.1)
+    assert _count(metrics._merged_series()) == 5
+
+
+def test_corrupt_dead_snapshot_is_dropped():
+    pid = _dead_pid()
+    with open(metrics._snapshot_path(pid), "w") as f:
+        f.write("{nie json")
+    metrics._fold_dead([pid])
+    assert not os.path.exists(metrics._snapshot_path(pid))
+    assert metrics._read_series(os.path.join(metrics.METRICS_DIR, metrics._DEAD_FILE)) == {}
+
+
+def test_bind_carries_request_collector_to_other_threads():
+    def work(stage):
+        metrics.observe(stage, 0.01, detail="https://example.com", provider="serpapi")
+
+    with metrics.request_timings() as timings:
+        bound = threading.Thread(target=metrics.bind(work), args=("serp_upstream",))
+        unbound = threading.Thread(target=work, args=("scrape_fetch",))
+        for thread in (bound, unbound):
+            thread.start()
+            thread.join()
+        report = timings.report()
+
+    # Nowy wątek startuje z pustym kontekstem — bez bind() zdarzenie trafia tylko do histogramu
+    assert [e["stage"] for e in report["events"]] == ["serp_upstream"]
+    assert report["events"][0]["detail"] == "https://example.com"
+    assert report["stages"] == {"serp_upstream:serpapi": {"count": 1, "total_s": 0.01, "max_s": 0.01}}
+    assert {s["labels"]["stage"] for s in metrics._snapshot().values()} == {"serp_upstream", "scrape_fetch"}
+    assert metrics._CURRENT.get() is None
+
+
+def test_bind_without_active_request_is_a_no_op():
+    def work():
+        return "ok"
+
+    assert metrics.bind(work) is work
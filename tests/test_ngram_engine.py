@@ -0,0 +1,119 @@
+"""NgramEngine vs pętla Counterów z _build_ngrams_for_source, którą zastąpił."""
+
+import random
+from collections import Counter, defaultdict
+
+import numpy as np
+
+from ngram_engine import NgramEngine, round4
+
+
+def _reference(sources):
+    """Stare liczenie: cztery słowniki aktualizowane per n-gram (n = 2..4)."""
+    freqs = Counter()
+    presence = defaultdict(set)
+    per_source = defaultdict(Counter)
+    surface = defaultdict(Counter)
+    for src_idx, (raw_toks, lem_toks, label) in enumerate(sources):
+        for n in range(2, 5):
+            for i in range(len(lem_toks) - n + 1):
+                lemma_key = " ".join(lem_toks[i:i + n])
+                freqs[lemma_key] += 1
+                presence[lemma_key].add(label)
+                per_source[lemma_key][src_idx] += 1
+                surface[lemma_key][" ".join(raw_toks[i:i + n])] += 1
+    return freqs, presence, per_source, surface
+
+
+def _old_stats(counts):
+    non_zero = sorted(c for c in counts if c > 0)
+    if not non_zero:
+        return 0, 0, 0
+    mid = len(non_zero) // 2
+    median = non_zero[mid] if len(non_zero) % 2 == 1 else (non_zero[mid - 1] + non_zero[mid]) // 2
+    return non_zero[0], median, non_zero[-1]
+
+
+def _random_sources(rng, n_sources, vocab_size):
+    lemmas = [f"lemat{i}" for i in range(vocab_size)]
+    sources = []
+    for idx in range(n_sources):
+        lem = [rng.choice(lemmas) for _ in range(rng.randint(0, 80))]
+        # Kilka form powierzchniowych per lemat — remisy most_common też sprawdzane
+        raw = [f"{l}_{rng.randint(0, 2)}" for l in lem]
+        # Powtórzona etykieta = ten sam URL dwa razy (presence liczy go raz)
+        label = f"https://example.com/{idx % (n_sources - 1) if n_sources > 1 else 0}"
+        sources.append((raw, lem, label))
+    return sources
+
+
+def _build(sources, **kwargs):
+    engine = NgramEngine()
+    for row, (raw, lem, _label) in enumerate(sources):
+        engine.add(raw, lem, row)
+    return engine.build(len(sources), **kwargs)
+
+
+def test_counts_match_reference_loop():
+    rng = random.Random(7)
+    for _ in range(30):
+        sources = _random_sources(rng, rng.randint(1, 6), rng.randint(2, 12))
+        freqs, presence, per_source, surface = _reference(sources)
+        table = _build(sources)
+        rows = len(sources)
+        keys = list(range(table.size))
+
+        # Kolejność kluczy = kolejność wypełniania ngram_freqs
+        assert table.lemma_strings(keys) == list(freqs)
+        assert table.totals.tolist() == list(freqs.values())
+        assert table.presence(rows, [s[2] for s in sources]).tolist() == [len(presence[k]) for k in freqs]
+        assert table.surface_strings(keys) == [surface[k].most_common(1)[0][0] for k in freqs]
+
+        dense = table.dense_columns(keys, rows)
+        for key_idx, lemma_key in enumerate(freqs):
+            assert dense[key_idx].tolist() == [per_source[lemma_key][i] for i in range(rows)]
+
+        freq_min, freq_median, freq_max = table.column_stats(keys, rows)
+        for key_idx, lemma_key in enumerate(freqs):
+            expected = _old_stats([per_source[lemma_key][i] for i in range(rows)])
+            assert (freq_min[key_idx], freq_median[key_idx], freq_max[key_idx]) == expected
+
+
+def test_pruning_keeps_every_key_that_can_pass_the_filter():
+    rng = random.Random(11)
+    for _ in range(20):
+        sources = _random_sources(rng, rng.randint(2, 6), rng.randint(2, 6))
+        page_rows = len(sources) - 1  # ostatni wiersz = high-signal
+        freqs, _presence, per_source, _surface = _reference(sources)
+        survivors = [k for k in freqs
+                     if sum(c for i, c in per_source[k].items() if i < page_rows) >= 2
+                     or any(i >= page_rows for i in per_source[k])]
+        table = _build(sources, page_rows=page_rows, min_page_freq=2)
+        assert table.lemma_strings(range(table.size)) == survivors
+        assert table.pruned == len(freqs) - len(survivors)
+        assert table.row_sums(page_rows).tolist() == [
+            sum(c for i, c in per_source[k].items() if i < page_rows) for k in survivors
+        ]
+
+
+def test_short_and_empty_sources():
+    table = _build([([], [], "a"), (["x"], ["x"], "b")])
+    assert table.size == 0
+    table = _build([(["a", "b"], ["a", "b"], "a")])
+    assert table.lemma_strings([0]) == ["a b"]
+
+
+def test_round4_matches_builtin_round():
+    values = [0.12345, 0.00005, 0.33335, 1 / 3, 0.5, 2.675, 0.123449999]
+    values += [random.Random(3).random() for _ in range(1000)]
+    assert round4(np.array(values)).tolist() == [round(v, 4) for v in values]
+
+
+def test_large_vocab_falls_back_to_row_grouping():
+    # |vocab|+1 ≥ 55 109 → base ** 4 nie mieści się w int64 (np.unique(axis=0))
+    lem = [f"w{i}" for i in range(56000)] + ["w1", "w2", "w3", "w1", "w2"]
+    sources = [(lem, lem, "a"), (["w1", "w2", "w3"], ["w1", "w2", "w3"], "b")]
+    freqs, _presence, _per_source, _surface = _reference(sources)
+    table = _build(sources)
+    assert table.lemma_strings(range(table.size)) == list(freqs)
+    assert table.totals.tolist() == list(freqs.values())
@@ -0,0 +1,106 @@
+"""
+nlp_pool: cykl życia segmentów shared_memory — po udanym parse, po timeoucie
+(zadania kończące się po porzuceniu) i po błędzie w workerze w /dev/shm nie
+zostaje żaden segment. Pula na pustym modelu spaCy (bez pobierania modelu).
+"""
+
+import os
+import time
+from concurrent.futures import wait as futures_wait
+
+import pytest
+
+spacy = pytest.importorskip("spacy")
+
+import nlp_pool
+
+SHM_DIR = "/dev/shm"
+
+pytestmark = pytest.mark.skipif(
+    nlp_pool.shared_memory is None or not os.path.isdir(SHM_DIR), reason="brak POSIX shared_memory"
+)
+
+
+def _segments():
+    return {name for name in os.listdir(SHM_DIR) if name.startswith("psm_")}
+
+
+def _segments_released(before, timeout=10.0):
+    """Callbacki porzuconych zadań biegną po ustawieniu wyniku — chwila na unlink."""
+    deadline = time.time() + timeout
+    while _segments() != before and time.time() < deadline:
+        time.sleep(0.05)
+    return _segments() - before
+
+
+@pytest.fixture
+def abandoned(monkeypatch):
+    """Zadania przekazane do _discard — test czeka, aż się zakończą."""
+    futures = []
+    real_discard = nlp_pool._discard
+
+    def spy(fs):
+        futures.extend(fs)
+        real_discard(fs)
+
+    monkeypatch.setattr(nlp_pool, "_discard", spy)
+    return futures
+
+
+@pytest.fixture
+def pool(tmp_path, monkeypatch):
+    model_dir = tmp_path / "blank_pl"
+    spacy.blank("pl").to_disk(model_dir)
+    monkeypatch.setenv("SPACY_MODEL", str(model_dir))  # procesy puli (spawn) dziedziczą env
+    monkeypatch.setattr(nlp_pool, "NLP_POOL_ENABLED", True)
+    monkeypatch.setattr(nlp_pool, "NLP_POOL_PROCESSES", 2)
+    monkeypatch.setattr(nlp_pool, "NLP_POOL_START_METHOD", "spawn")
+    monkeypatch.setattr(nlp_pool, "NLP_POOL_MIN_CHARS", 0)
+    monkeypatch.setattr(nlp_pool, "_POOL", None)
+    monkeypatch.setattr(nlp_pool, "_POOL_PID", None)
+    before = _segments()
+    yield spacy.load(model_dir), before
+    if nlp_pool._POOL is not None:
+        nlp_pool._POOL.shutdown(wait=True, cancel_futures=True)
+
+
+def test_success_returns_docs_and_unlinks_segments(pool):
+    nlp, before = pool
+    texts = ["Sąd okręgowy orzekł rozwód.", "Alimenty na dziecko . " * 50, ""]
+    docs = nlp_pool.parse_docs(nlp, texts)
+    assert [doc.text for doc in docs] == texts
+    assert all(doc.vocab is nlp.vocab for doc in docs)
+    assert _segments() == before
+
+
+def test_timeout_releases_segments_of_abandoned_tasks(pool, abandoned, monkeypatch):
+    nlp, before = pool
+    assert nlp_pool.parse_docs(nlp, ["rozgrzewka puli"]) is not None  # procesy gotowe
+    restarts = nlp_pool.nlp_pool_stats()["restarts"]
+
+    monkeypatch.setattr(nlp_pool, "NLP_POOL_TIMEOUT", 0.05)
+    texts = ["słowo " * 150000 for _ in range(4)]  # każde zadanie dłużej niż timeout
+    assert nlp_pool.parse_docs(nlp, texts) is None
+    assert nlp_pool._POOL is None
+    assert nlp_pool.nlp_pool_stats()["restarts"] == restarts + 1
+    # Zadania, które już biegły, kończą się po porzuceniu — callback usuwa ich segmenty
+    futures_wait(abandoned, timeout=60)
+    assert any(not f.cancelled() for f in abandoned)  # co najmniej jedno porzucone w trakcie
+    assert _segments_released(before) == set()
+
+
+def test_worker_error_releases_segments_of_other_tasks(pool, abandoned):
+    nlp, before = pool
+    too_long = "x" * (nlp.max_length + 1)  # ValueError w nlp.pipe procesu puli
+    texts = ["pierwszy tekst " * 100, too_long, "trzeci tekst " * 100, "czwarty tekst " * 100]
+    assert nlp_pool.parse_docs(nlp, texts) is None
+    assert nlp_pool.nlp_pool_stats()["fallbacks"] >= 1
+    futures_wait(abandoned, timeout=60)
+    assert _segments_released(before) == set()
+
+
+def test_short_calls_stay_in_process(pool, monkeypatch):
+    nlp, _before = pool
+    monkeypatch.setattr(nlp_pool, "NLP_POOL_MIN_CHARS", 1000)
+    assert nlp_pool.parse_docs(nlp, ["krótki tekst"]) is None
+    assert nlp_pool._POOL is None
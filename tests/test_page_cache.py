@@ -0,0 +1,90 @@
+"""PageCache: świeży vs przeterminowany wpis, nagłówki conditional GET, 304, kolizja hasha."""
+
+import json
+import os
+import time
+
+import pytest
+
+from page_cache import PageCache
+
+URL = "https://kancelaria.pl/rozwod"
+SOURCE = {"url": URL, "title": "Rozwód", "content": "treść " * 200, "h2_structure": ["Koszty"], "word_count": 200}
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return PageCache(str(tmp_path), max_bytes=10 * 1024 * 1024, ttl=60)
+
+
+def _age(cache, url, seconds):
+    """Przesuwa validated_at wpisu w przeszłość."""
+    path = cache._path(url)
+    with open(path, encoding="utf-8") as f:
+        entry = json.load(f)
+    entry["validated_at"] -= seconds
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(entry, f)
+
+
+def test_fresh_entry_is_a_hit(cache):
+    assert cache.lookup(URL) is None
+    cache.put(URL, SOURCE, '"v1"', "Mon, 01 Jan 2024 00:00:00 GMT")
+    entry = cache.lookup(URL)
+    assert entry["fresh"] is True
+    assert PageCache.to_source(entry, URL, "Nowy tytuł") == {**SOURCE, "title": "Nowy tytuł"}
+    stats = cache.stats()
+    assert (stats["fresh_hits"], stats["misses"], stats["writes"]) == (1, 1, 1)
+    assert stats["hit_ratio"] == 0.5
+
+
+def test_stale_entry_needs_revalidation(cache):
+    cache.put(URL, SOURCE, '"v1"', "Mon, 01 Jan 2024 00:00:00 GMT")
+    _age(cache, URL, 61)
+    entry = cache.lookup(URL)
+    assert entry["fresh"] is False
+    assert entry["content"] == SOURCE["content"]  # treść dalej dostępna do 304
+    assert cache.stats()["fresh_hits"] == 0
+    assert PageCache.conditional_headers(entry) == {
+        "If-None-Match": '"v1"', "If-Modified-Since": "Mon, 01 Jan 2024 00:00:00 GMT",
+    }
+
+
+def test_conditional_headers_only_for_known_validators():
+    assert PageCache.conditional_headers(None) == {}
+    assert PageCache.conditional_headers({"etag": None, "last_modified": None}) == {}
+    assert PageCache.conditional_headers({"etag": 'W/"x"', "last_modified": None}) == {"If-None-Match": 'W/"x"'}
+
+
+def test_mark_revalidated_keeps_content_and_refreshes(cache):
+    cache.put(URL, SOURCE, '"v1"', "Mon, 01 Jan 2024 00:00:00 GMT")
+    _age(cache, URL, 61)
+    stale = cache.get(URL)
+    before = time.time()
+
+    cache.mark_revalidated(stale, '"v2"', None)  # 304 bez Last-Modified → stara wartość zostaje
+    entry = cache.lookup(URL)
+    assert entry["fresh"] is True and entry["validated_at"] >= before
+    assert {k: entry[k] for k in ("content", "h2_structure", "word_count")} == \
+        {k: SOURCE[k] for k in ("content", "h2_structure", "word_count")}
+    assert (entry["etag"], entry["last_modified"]) == ('"v2"', "Mon, 01 Jan 2024 00:00:00 GMT")
+    assert cache.stats()["revalidated_304"] == 1
+
+
+def test_hash_collision_is_rejected(cache, monkeypatch):
+    cache.put(URL, SOURCE, None, None)
+    other = "https://inna-strona.pl/"
+    # Ten sam plik dla innego URL-a (kolizja sha256) — wpis nie może zostać zwrócony
+    monkeypatch.setattr(cache, "_path", lambda url: PageCache._path(cache, URL))
+    assert cache.get(other) is None
+    assert cache.lookup(other) is None
+    assert cache.get(URL)["content"] == SOURCE["content"]
+
+
+def test_corrupt_entry_is_removed(cache):
+    cache.put(URL, SOURCE, None, None)
+    with open(cache._path(URL), "w") as f:
+        f.write("{nie json")
+    assert cache.get(URL) is None
+    assert not os.path.exists(cache._path(URL))
+    assert cache.stats()["errors"] == 1
@@ -0,0 +1,99 @@
+"""
+BulkCorpus: deduplikacja URL-i klastra, źródła per keyword, refcount zwalniania.
+Wspólny DocStore klastra: po keywordzie nie zostają Doc-i spoza korpusu.
+"""
+
+from doc_store import DocStore
+from s1_bulk import BulkCorpus, normalize_url
+
+
+def _item(link, title=""):
+    return {"link": link, "title": title}
+
+
+def _source(url, content):
+    return {"url": url, "title": "scraped", "content": content, "h2_structure": ["H2"]}
+
+
+def test_normalize_url():
+    assert normalize_url("https://www.Example.com/a/#frag") == "example.com/a"
+    assert normalize_url("http://example.com/a") == "example.com/a"
+    assert normalize_url("https://example.com/a?x=1") == "example.com/a?x=1"
+    assert normalize_url("") == ""
+
+
+def _corpus():
+    corpus = BulkCorpus()
+    corpus.add_keyword("rozwód", [_item("https://a.pl/x", "A dla rozwodu"), _item("https://b.pl/"),
+                                  _item("https://www.a.pl/x#top")])  # duplikat w jednym SERP-ie
+    corpus.add_keyword("alimenty", [_item("https://c.pl"), _item("http://a.pl/x/", "A dla alimentów")])
+    return corpus
+
+
+def test_targets_are_deduplicated_across_keywords():
+    corpus = _corpus()
+    assert [t["link"] for t in corpus.unique_targets()] == ["https://a.pl/x", "https://b.pl/", "https://c.pl"]
+    assert corpus.stats() == {
+        "keywords": 2, "urls_requested": 4, "urls_unique": 3, "urls_scraped": 0, "dedupe_ratio": 0.25,
+    }
+
+
+def test_sources_follow_keyword_ranking_and_titles():
+    corpus = _corpus()
+    corpus.add_source(_source("https://a.pl/x", "treść A"))
+    corpus.add_source(None)  # odrzucona strona
+    corpus.add_source(_source("https://c.pl", "treść C"))
+
+    rozwod = corpus.sources_for("rozwód", max_total_content=10_000)
+    assert [(s["url"], s["title"]) for s in rozwod] == [("https://a.pl/x", "A dla rozwodu")]
+    alimenty = corpus.sources_for("alimenty", max_total_content=10_000)
+    assert [(s["content"], s["title"]) for s in alimenty] == [("treść C", "scraped"), ("treść A", "A dla alimentów")]
+
+    # Kopie per keyword — dopisanie do h2_structure nie przecieka między keywordami
+    rozwod[0]["h2_structure"].append("dopisane")
+    assert corpus.sources_for("alimenty", 10_000)[1]["h2_structure"] == ["H2"]
+
+
+def test_content_limit_stops_after_budget():
+    corpus = _corpus()
+    corpus.add_source(_source("https://c.pl", "x" * 50))
+    corpus.add_source(_source("https://a.pl/x", "y" * 50))
+    assert len(corpus.sources_for("alimenty", max_total_content=40)) == 1
+
+
+def test_release_returns_content_when_last_keyword_finishes():
+    corpus = _corpus()
+    corpus.add_source(_source("https://a.pl/x", "treść A"))
+    corpus.add_source(_source("https://b.pl", "treść B"))
+    corpus.add_source(_source("https://c.pl", "treść C"))
+
+    # b.pl tylko w "rozwód"; a.pl współdzielony — zostaje do końca "alimenty"
+    assert corpus.release("rozwód") == ["treść B"]
+    assert sorted(corpus.release("alimenty")) == ["treść A", "treść C"]
+    assert all(count == 0 for count in corpus.refcount.values())
+
+
+class _FakeNlp:
+    disable = ()
+
+    def pipe(self, texts):
+        return [text.split() for text in texts]
+
+
+def test_shared_doc_store_keeps_only_corpus_docs_between_keywords():
+    corpus = _corpus()
+    corpus.add_source(_source("https://a.pl/x", "treść A"))
+    corpus.add_source(_source("https://b.pl/", "treść B"))
+    corpus.add_source(_source("https://c.pl", "treść C"))
+    store = DocStore(_FakeNlp(), clean=False, cache=None)
+    store.parse([src["content"] for src in corpus.sources.values()])
+
+    for keyword in ("rozwód", "alimenty"):
+        # Jak run_s1_analysis: tekst high-signal parsowany i zwalniany per keyword
+        signal = f"{keyword} . pytanie PAA . snippet"
+        assert store.get(signal, limit=20000, clean=False) == signal.split()
+        store.release([signal], limit=20000, clean=False)
+        store.release(corpus.release(keyword))
+        assert signal not in store._docs
+
+    assert store._docs == {} and store._prepared == {}
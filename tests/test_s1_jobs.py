@@ -0,0 +1,171 @@
+"""
+s1_jobs: kolejka (JobQueueFull / 429), pliki statusu i wyniku, postęp etapów,
+stan "lost" po śmierci workera, sprzątanie po TTL; parsowanie flagi "async".
+"""
+
+import os
+import subprocess
+import sys
+import threading
+import time
+
+import pytest
+
+import s1_jobs
+
+
+@pytest.fixture
+def jobs(tmp_path, monkeypatch):
+    monkeypatch.setattr(s1_jobs, "S1_JOBS_DIR", str(tmp_path))
+    monkeypatch.setattr(s1_jobs, "S1_JOB_WORKERS", 1)
+    monkeypatch.setattr(s1_jobs, "_EXECUTOR", None)
+    monkeypatch.setattr(s1_jobs, "_EXECUTOR_PID", None)
+    monkeypatch.setattr(s1_jobs, "_last_purge", time.time())
+    yield tmp_path
+    if s1_jobs._EXECUTOR is not None:
+        s1_jobs._EXECUTOR.shutdown(wait=True)
+
+
+def _wait(job_id, states=("done", "failed"), stage=None, timeout=5.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        job = s1_jobs.get_job(job_id)
+        if job and job["state"] in states and stage in (None, job.get("stage")):
+            return job
+        time.sleep(0.01)
+    raise AssertionError(f"job {job_id} not in {states}: {s1_jobs.get_job(job_id)}")
+
+
+def _dead_pid():
+    proc = subprocess.Popen([sys.executable, "-c", "pass"])
+    proc.wait()
+    return proc.pid
+
+
+def test_status_and_result_lifecycle_with_stage_progress(jobs):
+    release = threading.Event()
+
+    def runner(data, progress):
+        progress("serp")
+        progress("scrape", pages=3, scraped=0)
+        progress("scrape", scraped=3)
+        release.wait(5)
+        progress("ngrams")
+        return {"keyword": data["keyword"], "ok": True}, 200
+
+    job = s1_jobs.submit_job(runner, {"keyword": "rozwód"}, label="rozwód")
+    assert job["state"] == "queued" and job["queue_position"] == 1
+    job_id = job["job_id"]
+    assert os.path.exists(os.path.join(jobs, f"{job_id}.json"))
+
+    running = _wait(job_id, states=("running",), stage="scrape")  # runner czeka na release
+    assert "result" not in running
+    assert not os.path.exists(os.path.join(jobs, f"{job_id}.result.json"))
+
+    release.set()
+    done = _wait(job_id)
+    assert done["state"] == "done" and done["http_status"] == 200 and done["error"] is None
+    assert done["result"] == {"keyword": "rozwód", "ok": True}
+    assert [s["stage"] for s in done["stages"]] == ["serp", "scrape", "ngrams", "done"]
+    assert done["stages"][1]["pages"] == 3 and done["stages"][1]["scraped"] == 3
+    assert all(s["seconds"] >= 0 for s in done["stages"])
+    assert done["elapsed_seconds"] >= 0
+    assert "result" not in s1_jobs.get_job(job_id, include_result=False)
+
+
+def test_failed_and_crashed_jobs(jobs):
+    bad = s1_jobs.submit_job(lambda data, progress: ({"error": "brak SERP"}, 400), {})
+    crash = s1_jobs.submit_job(lambda data, progress: 1 / 0, {})
+    bad, crash = _wait(bad["job_id"]), _wait(crash["job_id"])
+    assert (bad["state"], bad["http_status"], bad["error"]) == ("failed", 400, "brak SERP")
+    assert bad["result"] == {"error": "brak SERP"}
+    assert (crash["state"], crash["http_status"]) == ("failed", 500)
+    assert "division by zero" in crash["error"] and crash["result"] is None
+
+
+def test_queue_full_raises(jobs, monkeypatch):
+    monkeypatch.setattr(s1_jobs, "S1_JOB_QUEUE_MAX", 1)
+    started, release = threading.Event(), threading.Event()
+
+    def blocking(data, progress):
+        started.set()
+        release.wait(5)
+        return {}, 200
+
+    first = s1_jobs.submit_job(blocking, {})
+    assert started.wait(5)  # pierwszy job zdjęty z kolejki → running
+    second = s1_jobs.submit_job(blocking, {})
+    with pytest.raises(s1_jobs.JobQueueFull):
+        s1_jobs.submit_job(blocking, {})
+    assert s1_jobs.jobs_stats()["queued"] == 1 and s1_jobs.jobs_stats()["running"] == 1
+    release.set()
+    assert _wait(first["job_id"])["state"] == _wait(second["job_id"])["state"] == "done"
+    assert s1_jobs.jobs_stats()["queued"] == 0
+
+
+def test_job_of_dead_worker_is_lost(jobs):
+    now = time.time()
+    s1_jobs._write_json(s1_jobs._status_path("abc123"), {
+        "job_id": "abc123", "state": "running", "stage": "scrape", "stages": [],
+        "pid": _dead_pid(), "created_at": now, "updated_at": now,
+    })
+    job = s1_jobs.get_job("abc123")
+    assert job["state"] == "lost" and "resubmit" in job["error"]
+
+
+def test_unknown_and_invalid_job_ids(jobs):
+    assert s1_jobs.get_job("deadbeef") is None
+    assert s1_jobs.get_job("../etc/passwd") is None
+
+
+def test_expired_jobs_are_purged(jobs, monkeypatch):
+    past = time.time() - s1_jobs.S1_JOB_TTL - 10
+    for name in ("old.json", "old.result.json"):
+        path = os.path.join(jobs, name)
+        open(path, "w").close()
+        os.utime(path, (past, past))
+    fresh = os.path.join(jobs, "fresh.json")
+    open(fresh, "w").close()
+
+    monkeypatch.setattr(s1_jobs, "_last_purge", 0.0)
+    job = s1_jobs.submit_job(lambda data, progress: ({}, 200), {})
+    _wait(job["job_id"])
+    assert sorted(os.listdir(jobs)) == sorted(
+        ["fresh.json", f"{job['job_id']}.json", f"{job['job_id']}.result.json"])
+
+
+# ── Endpointy (index.py — wymagają pełnego środowiska aplikacji) ────────────
+@pytest.fixture
+def client(monkeypatch):
+    index = pytest.importorskip("index")
+    calls = []
+
+    def fake_submit(runner, data, label=""):
+        calls.append(runner.__name__)
+        if data.get("queue_full"):
+            raise s1_jobs.JobQueueFull("1 jobs already queued")
+        return {"job_id": "abc", "state": "queued", "queue_position": 1}
+
+    monkeypatch.setattr(index, "submit_job", fake_submit)
+    monkeypatch.setattr(index, "run_s1_analysis", lambda data, **kw: ({"sync": True}, 200))
+    monkeypatch.setattr(index, "run_s1_bulk_analysis", lambda data, **kw: ({"sync": True}, 200))
+    return index.app.test_client(), calls
+
+
+@pytest.mark.parametrize("path", ["/api/ngram_entity_analysis", "/api/ngram_entity_analysis/bulk"])
+def test_async_flag_is_parsed_explicitly(client, path):
+    http, calls = client
+    for value in (False, "false", "0", 0, "no", None):
+        response = http.post(path, json={"keyword": "k", "keywords": ["k"], "async": value})
+        assert response.status_code == 200 and response.get_json() == {"sync": True}, value
+    assert calls == []
+    for value in (True, "true", "1", 1):
+        assert http.post(path, json={"keyword": "k", "keywords": ["k"], "async": value}).status_code == 202
+    assert http.post(path + "?async=1", json={"keyword": "k", "keywords": ["k"]}).status_code == 202
+
+
+def test_queue_full_returns_429(client):
+    http, _calls = client
+    response = http.post("/api/ngram_entity_analysis", json={"keyword": "k", "async": True, "queue_full": True})
+    assert response.status_code == 429
+    assert response.get_json()["error"] == "S1 job queue full"
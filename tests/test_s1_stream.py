@@ -0,0 +1,88 @@
+"""s1_stream: ramki NDJSON / SSE, sekcje końcowe, zamykanie generatora analizy."""
+
+import json
+
+import pytest
+
+from s1_stream import encode_section, stream_format, stream_sections
+
+
+@pytest.mark.parametrize("value, expected", [
+    (True, "ndjson"), ("1", "ndjson"), ("true", "ndjson"), ("NDJSON", "ndjson"), ("sse", "sse"),
+    ("SSE", "sse"), (None, None), (False, None), ("0", None), ("xml", None), (1, None),
+])
+def test_stream_format(value, expected):
+    assert stream_format(value) == expected
+
+
+def _parse_ndjson(chunks):
+    lines = "".join(chunks).splitlines()
+    return [json.loads(line) for line in lines]
+
+
+def _parse_sse(chunks):
+    events = []
+    for block in "".join(chunks).split("\n\n"):
+        if not block:
+            continue
+        event_line, data_line = block.split("\n")
+        assert event_line.startswith("event: ") and data_line.startswith("data: ")
+        events.append((event_line[len("event: "):], json.loads(data_line[len("data: "):])))
+    return events
+
+
+def test_ndjson_one_line_per_section():
+    chunk = encode_section("serp", {"paa": ["Ile trwa rozwód?"], "n": 1}, "ndjson")
+    assert chunk.endswith("\n") and chunk.count("\n") == 1
+    assert json.loads(chunk) == {"section": "serp", "data": {"paa": ["Ile trwa rozwód?"], "n": 1}}
+    assert "rozwód" in chunk  # ensure_ascii=False
+
+
+def test_sse_event_frame():
+    chunk = encode_section("ngrams", {"ngrams": [{"ngram": "a\nb"}]}, "sse")
+    assert chunk.startswith("event: ngrams\ndata: ") and chunk.endswith("\n\n")
+    assert _parse_sse([chunk]) == [("ngrams", {"ngrams": [{"ngram": "a\nb"}]})]
+
+
+@pytest.mark.parametrize("fmt, parse", [("ndjson", _parse_ndjson), ("sse", _parse_sse)])
+def test_sections_then_done(fmt, parse):
+    sections = iter([("serp", {"paa": []}), ("ngrams", {"ngrams": []}), ("done", ({"ignored": 1}, 200))])
+    frames = parse(list(stream_sections(sections, fmt)))
+    names = [f["section"] for f in frames] if fmt == "ndjson" else [f[0] for f in frames]
+    assert names == ["serp", "ngrams", "done"]
+    done = frames[-1]["data"] if fmt == "ndjson" else frames[-1][1]
+    assert done["status_code"] == 200 and done["sections"] == 2
+
+
+def test_error_section_carries_status_and_ends_stream():
+    sections = iter([("serp", {}), ("error", ({"error": "Brak main_keyword do analizy"}, 400)), ("ngrams", {})])
+    frames = _parse_ndjson(list(stream_sections(sections, "ndjson")))
+    assert [f["section"] for f in frames] == ["serp", "error"]
+    assert frames[-1]["data"] == {"error": "Brak main_keyword do analizy", "status_code": 400}
+
+
+def test_exception_becomes_error_section():
+    def sections():
+        yield "serp", {}
+        raise RuntimeError("boom")
+
+    frames = _parse_ndjson(list(stream_sections(sections(), "ndjson")))
+    assert frames[-1]["section"] == "error"
+    assert frames[-1]["data"]["status_code"] == 500 and frames[-1]["data"]["details"] == "boom"
+
+
+def test_client_disconnect_closes_analysis_generator():
+    state = {"closed": False, "produced": 0}
+
+    def sections():
+        try:
+            for i in range(10):
+                state["produced"] += 1
+                yield f"s{i}", {}
+        finally:
+            state["closed"] = True
+
+    stream = stream_sections(sections(), "ndjson")
+    next(stream)
+    stream.close()  # WSGI zamyka odpowiedź po rozłączeniu klienta
+    assert state == {"closed": True, "produced": 1}
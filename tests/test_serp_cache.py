@@ -0,0 +1,106 @@
+"""serp_cache: TTL per wywołanie, bypass ttl=0, brak cache'owania pustych odpowiedzi, sweep."""
+
+import os
+import threading
+import time
+
+import pytest
+
+import serp_cache
+
+
+@pytest.fixture(autouse=True)
+def cache_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(serp_cache, "SERP_CACHE_ENABLED", True)
+    monkeypatch.setattr(serp_cache, "SERP_CACHE_DIR", str(tmp_path))
+    monkeypatch.setattr(serp_cache, "SERP_CACHE_TTL", 3600)
+    return tmp_path
+
+
+class Upstream:
+    def __init__(self, result=None, delay=0.0):
+        self.calls = 0
+        self.result = result if result is not None else {"organic_results": [{"link": "https://a.pl"}]}
+        self.delay = delay
+
+    def __call__(self):
+        self.calls += 1
+        time.sleep(self.delay)
+        return {**self.result, "call": self.calls}
+
+
+def _fetch(upstream, keyword="adwokat rozwodowy", **kwargs):
+    return serp_cache.cached_serp_fetch("dataforseo", keyword, upstream, location="PL", language="pl", **kwargs)
+
+
+def test_hit_within_ttl_and_normalized_keyword():
+    upstream = Upstream()
+    assert _fetch(upstream)["call"] == 1
+    assert _fetch(upstream, keyword="  Adwokat   ROZWODOWY ")["call"] == 1
+    assert upstream.calls == 1
+
+
+def test_per_call_ttl_expires_entry():
+    upstream = Upstream()
+    _fetch(upstream, ttl=1)
+    assert _fetch(upstream, ttl=1)["call"] == 1
+    time.sleep(1.1)
+    assert _fetch(upstream, ttl=1)["call"] == 2
+
+
+def test_shorter_ttl_on_read_wins_over_stored_ttl():
+    upstream = Upstream()
+    _fetch(upstream)                 # zapisany z TTL 3600
+    time.sleep(1.1)
+    assert _fetch(upstream, ttl=1)["call"] == 2
+
+
+def test_ttl_zero_bypasses_and_refreshes_entry():
+    upstream = Upstream()
+    _fetch(upstream)
+    assert _fetch(upstream, ttl=0)["call"] == 2
+    assert _fetch(upstream)["call"] == 2  # nadpisany świeżym wynikiem
+
+
+def test_empty_results_are_not_cached():
+    upstream = Upstream(result={"organic_results": [], "paa": []})
+    _fetch(upstream)
+    _fetch(upstream)
+    assert upstream.calls == 2
+
+
+def test_disabled_cache_always_calls_upstream(monkeypatch):
+    monkeypatch.setattr(serp_cache, "SERP_CACHE_ENABLED", False)
+    upstream = Upstream()
+    _fetch(upstream)
+    _fetch(upstream)
+    assert upstream.calls == 2
+
+
+def test_concurrent_identical_requests_coalesce():
+    upstream = Upstream(delay=0.3)
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(_fetch(upstream))) for _ in range(5)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert upstream.calls == 1
+    assert [r["call"] for r in results] == [1] * 5
+
+
+def test_sweep_removes_expired_entries_and_orphaned_locks(cache_dir, monkeypatch):
+    _fetch(Upstream(), ttl=1)
+    key = serp_cache._cache_key("dataforseo", "adwokat rozwodowy", "PL", "pl", 10)
+    entry_path = serp_cache._entry_path(key)
+    lock_path = entry_path[:-len(".json")] + ".lock"
+    assert os.path.exists(entry_path) and os.path.exists(lock_path)
+
+    time.sleep(1.1)
+    serp_cache._sweep()
+    assert not os.path.exists(entry_path)
+    assert os.path.exists(lock_path)  # użyty niedawno — zostaje
+
+    os.utime(lock_path, (0, 0))
+    serp_cache._sweep()
+    assert not os.path.exists(lock_path)
@@ -0,0 +1,134 @@
+"""hedged_fetch na atrapach providerów: tryb parallel i delay, błąd primary, collect_late."""
+
+import threading
+import time
+
+import pytest
+
+from serp_hedge import hedged_fetch
+
+
+def usable(result):
+    return bool(result and result.get("organic"))
+
+
+class StubProvider:
+    """Provider sterowany zdarzeniem: odpowiada dopiero po release() (albo od razu)."""
+
+    def __init__(self, name, result=None, error=None, blocked=False):
+        self.name = name
+        self.result = result if result is not None else {"organic": [name]}
+        self.error = error
+        self.calls = 0
+        self.gate = threading.Event()
+        if not blocked:
+            self.gate.set()
+
+    def release(self):
+        self.gate.set()
+
+    def __call__(self):
+        self.calls += 1
+        assert self.gate.wait(5), f"{self.name} never released"
+        if self.error:
+            raise self.error
+        return self.result
+
+    @property
+    def provider(self):
+        return self.name, self
+
+
+@pytest.fixture
+def providers():
+    created = []
+
+    def make(*args, **kwargs):
+        stub = StubProvider(*args, **kwargs)
+        created.append(stub)
+        return stub
+
+    yield make
+    for stub in created:  # żaden wątek puli nie zostaje zablokowany
+        stub.release()
+
+
+def test_parallel_fires_both_and_first_usable_wins(providers):
+    primary = providers("dataforseo", blocked=True)
+    secondary = providers("serpapi", result={"organic": ["s"], "paa": ["q"]})
+    outcome = hedged_fetch(primary.provider, secondary.provider, usable, mode="parallel")
+    assert outcome.fired == ["dataforseo", "serpapi"]
+    assert (outcome.provider, outcome.result) == ("serpapi", {"organic": ["s"], "paa": ["q"]})
+    assert list(outcome.pending) == ["dataforseo"]
+    assert outcome.others() == {}
+
+    primary.release()
+    assert list(outcome.collect_late(grace=5)) == [("dataforseo", {"organic": ["dataforseo"]})]
+    assert outcome.pending == {}
+    assert outcome.others() == {"dataforseo": {"organic": ["dataforseo"]}}
+
+
+def test_parallel_primary_error_falls_to_secondary(providers):
+    primary = providers("dataforseo", error=RuntimeError("401"))
+    secondary = providers("serpapi")
+    outcome = hedged_fetch(primary.provider, secondary.provider, usable, mode="parallel")
+    assert outcome.provider == "serpapi"
+    assert outcome.results["dataforseo"] is None
+    assert outcome.pending == {}
+
+
+def test_parallel_nothing_usable(providers):
+    primary = providers("dataforseo", result={"organic": []})
+    secondary = providers("serpapi", error=TimeoutError("slow"))
+    outcome = hedged_fetch(primary.provider, secondary.provider, usable, mode="parallel")
+    assert outcome.provider is None and outcome.result is None
+    assert outcome.results == {"dataforseo": {"organic": []}, "serpapi": None}
+    assert outcome.pending == {}
+
+
+def test_delay_fast_usable_primary_never_fires_secondary(providers):
+    primary = providers("dataforseo")
+    secondary = providers("serpapi")
+    outcome = hedged_fetch(primary.provider, secondary.provider, usable, mode="delay", delay=5)
+    assert outcome.fired == ["dataforseo"]
+    assert outcome.provider == "dataforseo"
+    assert secondary.calls == 0
+
+
+def test_delay_slow_primary_fires_secondary_after_delay(providers):
+    primary = providers("dataforseo", blocked=True)
+    secondary = providers("serpapi")
+    t0 = time.time()
+    outcome = hedged_fetch(primary.provider, secondary.provider, usable, mode="delay", delay=0.1)
+    assert time.time() - t0 >= 0.1
+    assert outcome.fired == ["dataforseo", "serpapi"]
+    assert outcome.provider == "serpapi"
+    assert list(outcome.pending) == ["dataforseo"]
+
+    # Grace minął, primary wciąż liczy — pominięty, zostaje w pending
+    assert list(outcome.collect_late(grace=0.05)) == []
+    assert list(outcome.pending) == ["dataforseo"]
+    primary.release()
+    assert [name for name, _ in outcome.collect_late(grace=5)] == ["dataforseo"]
+    assert outcome.pending == {}
+
+
+def test_delay_failed_or_unusable_primary_fires_secondary_at_once(providers):
+    for primary in (providers("dataforseo", error=RuntimeError("500")),
+                    providers("dataforseo", result={"organic": []})):
+        secondary = providers("serpapi")
+        t0 = time.time()
+        outcome = hedged_fetch(primary.provider, secondary.provider, usable, mode="delay", delay=5)
+        assert time.time() - t0 < 2  # nie czekamy pełnego delay
+        assert outcome.fired == ["dataforseo", "serpapi"]
+        assert outcome.provider == "serpapi"
+        assert "dataforseo" in outcome.results and outcome.pending == {}
+
+
+def test_collect_late_reports_late_failure_as_none(providers):
+    primary = providers("dataforseo", blocked=True, error=RuntimeError("boom"))
+    secondary = providers("serpapi")
+    outcome = hedged_fetch(primary.provider, secondary.provider, usable, mode="parallel")
+    primary.release()
+    assert list(outcome.collect_late(grace=5)) == [("dataforseo", None)]
+    assert outcome.results["dataforseo"] is None